@@ -3,22 +3,22 @@ Authentication API routes
 """
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import timedelta
+from typing import Optional, Tuple
 
-from ..core.database import get_db
+from ..core.database import get_async_db, AsyncSessionLocal
 from ..core.security import create_access_token, decode_access_token
 from ..core.config import settings
-from ..schemas.user import UserCreate, UserLogin, UserResponse, Token
+from ..schemas.user import UserCreate, UserLogin, UserResponse, Token, CurrentUser
 from ..services.auth import auth_service
-from ..models.user import User
 
 router = APIRouter(prefix="/auth", tags=["Authentication"])
 security = HTTPBearer()
 
 
 @router.post("/register", response_model=UserResponse, status_code=status.HTTP_201_CREATED)
-async def register(user: UserCreate, db: Session = Depends(get_db)):
+async def register(user: UserCreate, db: AsyncSession = Depends(get_async_db)):
     """
     Register a new user
     
@@ -29,11 +29,11 @@ async def register(user: UserCreate, db: Session = Depends(get_db)):
     Returns:
         Created user data
     """
-    return auth_service.create_user(db, user)
+    return await auth_service.create_user(db, user)
 
 
 @router.post("/login", response_model=Token)
-async def login(user: UserLogin, db: Session = Depends(get_db)):
+async def login(user: UserLogin, db: AsyncSession = Depends(get_async_db)):
     """
     Login user and return JWT token
     
@@ -44,7 +44,7 @@ async def login(user: UserLogin, db: Session = Depends(get_db)):
     Returns:
         JWT access token
     """
-    db_user = auth_service.authenticate_user(db, user.username, user.password)
+    db_user = await auth_service.authenticate_user(db, user.username, user.password)
     
     # Create access token
     access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
@@ -56,62 +56,59 @@ async def login(user: UserLogin, db: Session = Depends(get_db)):
     return {"access_token": access_token, "token_type": "bearer"}
 
 
-@router.get("/me", response_model=UserResponse)
-async def get_current_user(
-    credentials: HTTPAuthorizationCredentials = Depends(security),
-    db: Session = Depends(get_db)
-):
-    """
-    Get current authenticated user
-    
-    Args:
-        credentials: HTTP authorization credentials with JWT token
-        db: Database session
-        
-    Returns:
-        Current user data
-    """
-    token = credentials.credentials
+def _token_subject(token: str) -> dict:
+    """Decode a bearer token and make sure it names a user"""
     payload = decode_access_token(token)
     
-    if payload is None:
+    if payload is None or payload.get("sub") is None:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid authentication credentials"
         )
+    return payload
+
+
+async def authenticate_token(token: str) -> Tuple[CurrentUser, Optional[float]]:
+    """
+    Resolve the user behind a bearer token
     
-    username = payload.get("sub")
-    if username is None:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid authentication credentials"
-        )
+    Verified tokens are cached, so the database is only queried on a miss.
     
-    return auth_service.get_user_by_username(db, username)
+    Returns:
+        The authenticated user and the token's expiry as a UNIX timestamp
+    """
+    payload = _token_subject(token)
+    user = await auth_service.get_current_user(
+        AsyncSessionLocal,
+        token,
+        payload["sub"],
+        expires_at=payload.get("exp")
+    )
+    return user, payload.get("exp")
 
 
 async def get_current_user_dependency(
-    credentials: HTTPAuthorizationCredentials = Depends(security),
-    db: Session = Depends(get_db)
-) -> User:
+    credentials: HTTPAuthorizationCredentials = Depends(security)
+) -> CurrentUser:
     """
     Dependency to get current authenticated user
     Used in other routes that require authentication
     """
-    token = credentials.credentials
-    payload = decode_access_token(token)
-    
-    if payload is None:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid authentication credentials"
-        )
-    
-    username = payload.get("sub")
-    if username is None:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid authentication credentials"
-        )
+    user, _ = await authenticate_token(credentials.credentials)
+    return user
+
+
+@router.get("/me", response_model=UserResponse)
+async def get_current_user(
+    current_user: CurrentUser = Depends(get_current_user_dependency)
+):
+    """
+    Get current authenticated user
     
-    return auth_service.get_user_by_username(db, username)
+    Args:
+        current_user: Authenticated user resolved from the JWT token
+        
+    Returns:
+        Current user data
+    """
+    return current_user
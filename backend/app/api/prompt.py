@@ -1,13 +1,14 @@
 """
 Prompt testing API routes
 """
-from fastapi import APIRouter, Depends, UploadFile, File, HTTPException, status
-from fastapi.responses import JSONResponse, StreamingResponse
-from typing import List
-import json
-import io
-import csv
+from fastapi import APIRouter, Depends, UploadFile, File, HTTPException, Query, Request, Response, WebSocket, WebSocketDisconnect, status
+from fastapi.responses import StreamingResponse
+from typing import Dict, List, Optional, Set
+import orjson
+import hashlib
+import math
 import time
+import asyncio
 import uuid
 from datetime import datetime
 
@@ -15,29 +16,115 @@ from ..schemas.prompt import (
     PromptTestRequest, 
     PromptTestResponse, 
     FileUploadResponse,
-    ModelResponse
+    ModelResponse,
+    BatchJobRequest,
+    BatchJobStatus
 )
 from ..services.openrouter import openrouter_service
 from ..services.file_handler import file_handler_service
-from ..api.auth import get_current_user_dependency
-from ..models.user import User
+from ..services.batch import batch_job_service
+from ..services.results_store import results_store
+from ..services.exporter import EXPORT_FORMATS, run_from_result, stream_export
+from ..services.live_session import LiveSession
+from ..services.scheduler import QuotaExceeded
+from ..services.admission import Overloaded
+from ..api.auth import authenticate_token, get_current_user_dependency
+from ..core.config import settings
+from ..core.responses import FastJSONResponse
+from ..schemas.user import CurrentUser
 
 router = APIRouter(prefix="/prompt", tags=["Prompt Testing"])
 
-# Store recent test results in memory (in production, use Redis or database)
-test_results_cache = {}
+# Straggler tasks of deadline-bounded tests, referenced until they finish
+_background_tasks: Set[asyncio.Task] = set()
+
+# Batch results loaded per round trip while exporting a job
+BATCH_EXPORT_PAGE_SIZE = 500
+
+
+def _validate_export_format(format: str) -> str:
+    format = format.lower()
+    if format not in EXPORT_FORMATS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid format. Use 'json', 'ndjson' or 'csv'"
+        )
+    return format
+
+
+async def _check_quota(user_id: int) -> None:
+    """Refuse new work with 429 once the user's token or cost quota is used up"""
+    try:
+        await openrouter_service.quotas.check(user_id)
+    except QuotaExceeded as e:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail=f"Quota exceeded: {e}",
+            headers={"Retry-After": str(math.ceil(e.retry_after))}
+        )
+
+
+def _check_admission() -> None:
+    """Shed new interactive work with 503 while the upstream queue is full"""
+    try:
+        openrouter_service.admission.check()
+    except Overloaded as e:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=str(e),
+            headers={"Retry-After": str(math.ceil(e.retry_after))}
+        )
+
+
+def _deadline_response(model: str, deadline: float) -> ModelResponse:
+    return ModelResponse(
+        model=model,
+        response="",
+        tokens_used=0,
+        prompt_tokens=0,
+        completion_tokens=0,
+        time_taken=deadline,
+        finish_reason="deadline",
+        error=f"Deadline of {deadline:g}s exceeded"
+    )
+
+
+async def _attach_stragglers(request_id: str, user_id: int, tasks: Dict[str, asyncio.Task]) -> None:
+    """Wait for models that missed the deadline and add them to the stored result"""
+    responses = await asyncio.gather(*tasks.values(), return_exceptions=True)
+    await results_store.attach(request_id, user_id, [
+        response if isinstance(response, ModelResponse) else ModelResponse(
+            model=model,
+            response="",
+            tokens_used=0,
+            prompt_tokens=0,
+            completion_tokens=0,
+            time_taken=0,
+            error=f"Exception: {str(response)}"
+        )
+        for model, response in zip(tasks, responses)
+    ])
+
+
+def _export_response(content, format: str, basename: str) -> StreamingResponse:
+    filename = f"{basename}.{format}"
+    return StreamingResponse(
+        content,
+        media_type=EXPORT_FORMATS[format],
+        headers={"Content-Disposition": f"attachment; filename={filename}"}
+    )
 
 
 @router.post("/upload", response_model=FileUploadResponse)
 async def upload_questions_file(
     file: UploadFile = File(...),
-    current_user: User = Depends(get_current_user_dependency)
+    current_user: CurrentUser = Depends(get_current_user_dependency)
 ):
     """
     Upload a file containing test questions
     
     Args:
-        file: JSON or TXT file with questions
+        file: JSON, JSONL, CSV or TXT file with questions
         current_user: Authenticated user
         
     Returns:
@@ -61,11 +148,16 @@ async def upload_questions_file(
 @router.post("/test", response_model=PromptTestResponse)
 async def test_prompt(
     request: PromptTestRequest,
-    current_user: User = Depends(get_current_user_dependency)
+    current_user: CurrentUser = Depends(get_current_user_dependency)
 ):
     """
     Test a prompt with selected question across multiple models
     
+    With deadline_seconds set, only models that answer in time are returned.
+    The others are cancelled (on_deadline="cancel", reported as deadline
+    errors) or keep running (on_deadline="background", listed in
+    pending_models) and are attached to the stored result when they finish.
+    
     Args:
         request: Prompt test request with system prompt, question, and models
         current_user: Authenticated user
@@ -73,17 +165,41 @@ async def test_prompt(
     Returns:
         Responses from all selected models with metadata
     """
+    _check_admission()
+    await _check_quota(current_user.id)
     start_time = time.time()
+    request_id = str(uuid.uuid4())
+    stragglers: Dict[str, asyncio.Task] = {}
     
     # Call models in parallel
-    responses = await openrouter_service.call_models_parallel(
-        models=request.models,
-        system_prompt=request.system_prompt,
-        user_message=request.question
-    )
+    if request.deadline_seconds is None:
+        responses = await openrouter_service.call_models_parallel(
+            models=request.models,
+            system_prompt=request.system_prompt,
+            user_message=request.question,
+            cache_mode=request.cache_mode,
+            hedge=request.hedge,
+            fallback_models=request.fallback_models,
+            user_id=current_user.id
+        )
+    else:
+        responses, stragglers = await openrouter_service.call_models_until(
+            models=request.models,
+            system_prompt=request.system_prompt,
+            user_message=request.question,
+            deadline=request.deadline_seconds,
+            cache_mode=request.cache_mode,
+            hedge=request.hedge,
+            fallback_models=request.fallback_models,
+            user_id=current_user.id
+        )
+        if request.on_deadline == "cancel":
+            for task in stragglers.values():
+                task.cancel()
+            responses += [_deadline_response(model, request.deadline_seconds) for model in stragglers]
+            stragglers = {}
     
     total_time = time.time() - start_time
-    request_id = str(uuid.uuid4())
     
     # Create response
     result = PromptTestResponse(
@@ -92,20 +208,108 @@ async def test_prompt(
         question=request.question,
         responses=responses,
         total_time=total_time,
-        timestamp=datetime.utcnow()
+        timestamp=datetime.utcnow(),
+        pending_models=list(stragglers)
     )
     
-    # Cache result for later download
-    test_results_cache[request_id] = result
+    # Store result for later download
+    await results_store.save(result, current_user.id)
+    
+    if stragglers:
+        task = asyncio.create_task(_attach_stragglers(request_id, current_user.id, stragglers))
+        _background_tasks.add(task)
+        task.add_done_callback(_background_tasks.discard)
     
     return result
 
 
+@router.post("/test/stream")
+async def test_prompt_stream(
+    request: PromptTestRequest,
+    current_user: CurrentUser = Depends(get_current_user_dependency)
+):
+    """
+    Test a prompt across multiple models, streaming tokens as they arrive
+    
+    The response is newline-delimited JSON. Each line is one event:
+    "start" (with the request_id), "token" (tagged by model), "done" (one per
+    model, with its full ModelResponse including time_to_first_token) and a
+    final "summary" with the assembled PromptTestResponse.
+    
+    Args:
+        request: Prompt test request with system prompt, question, and models
+        current_user: Authenticated user
+        
+    Returns:
+        NDJSON streaming response
+    """
+    _check_admission()
+    await _check_quota(current_user.id)
+    request_id = str(uuid.uuid4())
+    
+    async def event_stream():
+        start_time = time.time()
+        queue: asyncio.Queue = asyncio.Queue()
+        
+        async def pump(model: str):
+            try:
+                async for event in openrouter_service.stream_model(
+                    model=model,
+                    system_prompt=request.system_prompt,
+                    user_message=request.question,
+                    cache_mode=request.cache_mode,
+                    user_id=current_user.id
+                ):
+                    await queue.put(event)
+            finally:
+                await queue.put(None)
+        
+        tasks = [asyncio.create_task(pump(model)) for model in request.models]
+        responses = {}
+        remaining = len(tasks)
+        
+        try:
+            yield orjson.dumps({"type": "start", "request_id": request_id, "models": request.models}) + b"\n"
+            
+            while remaining:
+                event = await queue.get()
+                if event is None:
+                    remaining -= 1
+                    continue
+                if event["type"] == "done":
+                    responses[event["model"]] = event["response"]
+                    event = {**event, "response": event["response"].model_dump()}
+                yield orjson.dumps(event) + b"\n"
+            
+            result = PromptTestResponse(
+                request_id=request_id,
+                system_prompt=request.system_prompt,
+                question=request.question,
+                responses=[responses[m] for m in request.models if m in responses],
+                total_time=time.time() - start_time,
+                timestamp=datetime.utcnow()
+            )
+            
+            # Store result for later download
+            await results_store.save(result, current_user.id)
+            
+            yield orjson.dumps({"type": "summary", **result.model_dump(mode="json")}) + b"\n"
+        finally:
+            for task in tasks:
+                task.cancel()
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="application/x-ndjson",
+        headers={"Cache-Control": "no-cache", "X-Request-ID": request_id}
+    )
+
+
 @router.post("/test/{model}", response_model=ModelResponse)
 async def test_single_model(
     model: str,
     request: PromptTestRequest,
-    current_user: User = Depends(get_current_user_dependency)
+    current_user: CurrentUser = Depends(get_current_user_dependency)
 ):
     """
     Test a single model (for retry/regenerate functionality)
@@ -118,132 +322,329 @@ async def test_single_model(
     Returns:
         Response from the specified model
     """
+    _check_admission()
+    await _check_quota(current_user.id)
     response = await openrouter_service.call_model(
         model=model,
         system_prompt=request.system_prompt,
-        user_message=request.question
+        user_message=request.question,
+        cache_mode=request.cache_mode,
+        hedge=request.hedge,
+        fallback_model=request.fallback_models.get(model),
+        user_id=current_user.id
     )
     
     return response
 
 
+@router.websocket("/ws")
+async def live_session(websocket: WebSocket):
+    """
+    Live session: one connection multiplexing streamed test runs
+    
+    Browsers can't set an Authorization header on a WebSocket, so the first
+    message must be {"type": "auth", "token": "<JWT>"}; the connection is
+    closed with 1008 if it doesn't arrive within LIVE_AUTH_TIMEOUT_SECONDS
+    or the token is invalid. See LiveSession for the message protocol.
+    
+    Args:
+        websocket: Client connection
+    """
+    await websocket.accept()
+    try:
+        message = await asyncio.wait_for(websocket.receive_json(), timeout=settings.LIVE_AUTH_TIMEOUT_SECONDS)
+        if not isinstance(message, dict) or message.get("type") != "auth" or not message.get("token"):
+            raise ValueError("Expected an auth message")
+        user, expires_at = await authenticate_token(message["token"])
+    except WebSocketDisconnect:
+        return
+    except (asyncio.TimeoutError, ValueError, HTTPException) as e:
+        reason = e.detail if isinstance(e, HTTPException) else str(e) or "Authentication timed out"
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION, reason=reason)
+        return
+    
+    await LiveSession(websocket, user, expires_at).serve()
+
+
+@router.post("/batch", response_model=BatchJobStatus, status_code=status.HTTP_202_ACCEPTED)
+async def submit_batch_job(
+    request: BatchJobRequest,
+    current_user: CurrentUser = Depends(get_current_user_dependency)
+):
+    """
+    Submit a batch job that runs every question against every model
+    
+    Args:
+        request: Batch job request with questions, system prompt, and models
+        current_user: Authenticated user
+        
+    Returns:
+        Initial job status including the job_id to poll
+    """
+    await _check_quota(current_user.id)
+    job = await batch_job_service.submit(request, current_user.id)
+    return batch_job_service.to_status(job, limit=0)
+
+
+@router.get("/batch/{job_id}", response_model=BatchJobStatus)
+async def get_batch_job(
+    job_id: str,
+    offset: int = Query(0, ge=0),
+    limit: int = Query(100, ge=0, le=1000),
+    current_user: CurrentUser = Depends(get_current_user_dependency)
+):
+    """
+    Get batch job progress and the results collected so far
+    
+    Args:
+        job_id: ID of the batch job
+        offset: Index of the first result to return
+        limit: Maximum number of results to return (at most 1000)
+        current_user: Authenticated user
+        
+    Returns:
+        Job status with a page of (partial) results
+    """
+    return await batch_job_service.get_status(job_id, current_user.id, offset=offset, limit=limit)
+
+
+@router.delete("/batch/{job_id}", response_model=BatchJobStatus)
+async def cancel_batch_job(
+    job_id: str,
+    current_user: CurrentUser = Depends(get_current_user_dependency)
+):
+    """
+    Cancel a batch job; results gathered so far are kept
+    
+    Args:
+        job_id: ID of the batch job
+        current_user: Authenticated user
+        
+    Returns:
+        Job status after cancellation was requested
+    """
+    return await batch_job_service.cancel(job_id, current_user.id)
+
+
 @router.get("/models")
 async def get_available_models(
-    current_user: User = Depends(get_current_user_dependency)
+    request: Request,
+    search: Optional[str] = None,
+    provider: Optional[str] = None,
+    min_context: Optional[int] = Query(None, ge=0),
+    max_context: Optional[int] = Query(None, ge=0),
+    offset: int = Query(0, ge=0),
+    limit: Optional[int] = Query(None, ge=1),
+    include_description: bool = True,
+    current_user: CurrentUser = Depends(get_current_user_dependency)
 ):
     """
-    Get list of available models from OpenRouter
+    Get list of available models from the cached OpenRouter catalog
     
     Args:
+        request: Incoming request (for If-None-Match)
+        search: Case-insensitive substring match on model id or name
+        provider: Provider prefix of the model id (e.g. "openai")
+        min_context: Minimum context length
+        max_context: Maximum context length
+        offset: Index of the first model to return
+        limit: Maximum number of models to return (all if omitted)
+        include_description: Set to false to drop descriptions from the payload
         current_user: Authenticated user
         
     Returns:
-        List of available models
+        Page of matching models with their circuit breaker state, or 304
+        if the client's ETag is current
     """
-    models = await openrouter_service.get_available_models()
+    catalog = await openrouter_service.get_model_catalog()
+    if catalog is None:
+        return {"models": [], "total": 0, "offset": offset, "providers": [], "circuits": {}}
+    
+    # The ETag covers the catalog version, the query and circuit states
+    query = request.url.query
+    circuits = openrouter_service.circuit_breakers.unhealthy()
+    circuit_key = ",".join(f"{model}={info['state']}" for model, info in circuits.items())
+    etag = '"' + hashlib.sha1(f"{catalog.etag}?{query}#{circuit_key}".encode("utf-8")).hexdigest() + '"'
+    headers = {"ETag": etag, "Cache-Control": "private, max-age=60"}
+    if etag in request.headers.get("if-none-match", ""):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    
+    models = catalog.query(
+        search=search,
+        provider=provider,
+        min_context=min_context,
+        max_context=max_context
+    )
+    total = len(models)
+    end = None if limit is None else offset + limit
+    page = models[offset:end]
+    page = [
+        {
+            **{k: v for k, v in model.items() if include_description or k != "description"},
+            "circuit_state": openrouter_service.circuit_breakers.state(model["id"])
+        }
+        for model in page
+    ]
     
-    # Return simplified model list
-    return {
-        "models": [
-            {
-                "id": model.get("id"),
-                "name": model.get("name", model.get("id")),
-                "description": model.get("description", ""),
-                "context_length": model.get("context_length", 0),
-                "pricing": model.get("pricing", {})
-            }
-            for model in models
-        ]
-    }
+    return FastJSONResponse(
+        content={
+            "models": page,
+            "total": total,
+            "offset": offset,
+            "providers": catalog.providers,
+            "circuits": circuits
+        },
+        headers=headers
+    )
 
 
-@router.get("/download/{request_id}")
-async def download_results(
-    request_id: str,
+@router.get("/history", response_model=List[PromptTestResponse])
+async def get_test_history(
+    offset: int = Query(0, ge=0),
+    limit: int = Query(20, ge=1, le=100),
+    current_user: CurrentUser = Depends(get_current_user_dependency)
+):
+    """
+    Get the current user's stored test results, newest first
+    
+    Args:
+        offset: Number of results to skip
+        limit: Maximum number of results to return
+        current_user: Authenticated user
+        
+    Returns:
+        List of stored test results
+    """
+    return await results_store.list_for_user(current_user.id, offset=offset, limit=limit)
+
+
+@router.get("/download")
+async def download_multiple_results(
+    request_ids: List[str] = Query(..., min_length=1),
     format: str = "json",
     model: str = None,
-    current_user: User = Depends(get_current_user_dependency)
+    current_user: CurrentUser = Depends(get_current_user_dependency)
 ):
     """
-    Download test results
+    Download several test runs in one streamed file
     
     Args:
-        request_id: ID of the test request
-        format: Download format (json or csv)
+        request_ids: IDs of the test requests (repeat the query parameter)
+        format: Download format (json, ndjson or csv)
         model: Optional model filter (if None, download all)
         current_user: Authenticated user
         
     Returns:
-        File download response
+        Streamed file download response
     """
-    # Get cached result
-    if request_id not in test_results_cache:
+    format = _validate_export_format(format)
+    
+    request_ids = list(dict.fromkeys(request_ids))
+    owned = await results_store.owned_ids(request_ids, current_user.id)
+    missing = [request_id for request_id in request_ids if request_id not in owned]
+    if missing:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
-            detail="Test results not found"
+            detail=f"Test results not found: {', '.join(missing)}"
         )
     
-    result = test_results_cache[request_id]
+    async def runs():
+        # Load one run at a time so memory stays flat however many are exported
+        for request_id in owned:
+            result = await results_store.get(request_id, current_user.id)
+            if result is not None:
+                yield run_from_result(result, model)
     
-    # Filter by model if specified
-    responses = result.responses
-    if model:
-        responses = [r for r in responses if r.model == model]
-        if not responses:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail=f"No results found for model: {model}"
-            )
+    return _export_response(stream_export(runs(), format), format, "prompt_tests")
+
+
+@router.get("/batch/{job_id}/download")
+async def download_batch_results(
+    job_id: str,
+    format: str = "json",
+    model: str = None,
+    current_user: CurrentUser = Depends(get_current_user_dependency)
+):
+    """
+    Download the results of a batch job as a streamed file
     
-    if format.lower() == "json":
-        # JSON download
-        data = {
-            "request_id": result.request_id,
-            "system_prompt": result.system_prompt,
-            "question": result.question,
-            "responses": [r.dict() for r in responses],
-            "total_time": result.total_time,
-            "timestamp": result.timestamp.isoformat()
-        }
-        
-        json_str = json.dumps(data, indent=2)
-        filename = f"prompt_test_{request_id}.json"
+    Args:
+        job_id: ID of the batch job
+        format: Download format (json, ndjson or csv)
+        model: Optional model filter (if None, download all)
+        current_user: Authenticated user
         
-        return StreamingResponse(
-            io.BytesIO(json_str.encode()),
-            media_type="application/json",
-            headers={"Content-Disposition": f"attachment; filename={filename}"}
-        )
+    Returns:
+        Streamed file download response
+    """
+    format = _validate_export_format(format)
+    job = await batch_job_service.get_status(job_id, current_user.id, limit=0)
     
-    elif format.lower() == "csv":
-        # CSV download
-        output = io.StringIO()
-        writer = csv.writer(output)
-        
-        # Write headers
-        writer.writerow([
-            "Model", "Response", "Tokens Used", "Prompt Tokens", 
-            "Completion Tokens", "Time Taken (s)", "Cost", "Finish Reason", "Error"
-        ])
-        
-        # Write data
-        for r in responses:
-            writer.writerow([
-                r.model, r.response, r.tokens_used, r.prompt_tokens,
-                r.completion_tokens, f"{r.time_taken:.2f}", r.cost or "", 
-                r.finish_reason or "", r.error or ""
-            ])
-        
-        filename = f"prompt_test_{request_id}.csv"
+    async def runs():
+        # Load one page of result slots at a time so memory stays flat however
+        # large the job; rows come out in question order (a running job
+        # exports the results finished by the time each page is read)
+        for offset in range(0, job.total, BATCH_EXPORT_PAGE_SIZE):
+            page = await batch_job_service.get_status(
+                job_id,
+                current_user.id,
+                offset=offset,
+                limit=BATCH_EXPORT_PAGE_SIZE
+            )
+            for item in page.results:
+                if model and item.response.model != model:
+                    continue
+                meta = {
+                    "job_id": job.job_id,
+                    "question_index": item.question_index,
+                    "question": item.question,
+                    "system_prompt": job.system_prompt
+                }
+                yield meta, [item.response]
+    
+    return _export_response(stream_export(runs(), format), format, f"batch_{job_id}")
+
+
+@router.get("/download/{request_id}")
+async def download_results(
+    request_id: str,
+    format: str = "json",
+    model: str = None,
+    current_user: CurrentUser = Depends(get_current_user_dependency)
+):
+    """
+    Download test results
+    
+    Args:
+        request_id: ID of the test request
+        format: Download format (json, ndjson or csv)
+        model: Optional model filter (if None, download all)
+        current_user: Authenticated user
         
-        return StreamingResponse(
-            io.BytesIO(output.getvalue().encode()),
-            media_type="text/csv",
-            headers={"Content-Disposition": f"attachment; filename={filename}"}
+    Returns:
+        Streamed file download response
+    """
+    format = _validate_export_format(format)
+    
+    result = await results_store.get(request_id, current_user.id)
+    if result is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Test results not found"
         )
     
-    else:
+    meta, responses = run_from_result(result, model)
+    if model and not responses:
         raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Invalid format. Use 'json' or 'csv'"
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"No results found for model: {model}"
         )
+    
+    async def runs():
+        yield meta, responses
+    
+    return _export_response(
+        stream_export(runs(), format, single=True),
+        format,
+        f"prompt_test_{request_id}"
+    )
@@ -0,0 +1,67 @@
+"""
+Small in-memory caching primitives
+"""
+import time
+from collections import OrderedDict
+from typing import Any, Generic, Hashable, Optional, Tuple, TypeVar
+
+V = TypeVar("V")
+
+
+class TTLCache(Generic[V]):
+    """
+    LRU cache with a per-entry time-to-live
+    
+    Not thread-safe; meant to be used from the event loop thread.
+    A ttl of 0 or less means entries never expire on their own.
+    """
+    
+    def __init__(self, max_entries: int, ttl: float = 0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._data: "OrderedDict[Hashable, Tuple[float, V]]" = OrderedDict()
+    
+    def get(self, key: Hashable, default: Any = None) -> Optional[V]:
+        """Return a live entry and mark it most recently used"""
+        item = self._data.get(key)
+        if item is None:
+            return default
+        
+        expires_at, value = item
+        if expires_at and expires_at <= time.monotonic():
+            del self._data[key]
+            return default
+        
+        self._data.move_to_end(key)
+        return value
+    
+    def set(self, key: Hashable, value: V, ttl: Optional[float] = None) -> None:
+        """Store an entry, evicting the least recently used ones if full"""
+        ttl = self.ttl if ttl is None else ttl
+        expires_at = time.monotonic() + ttl if ttl > 0 else 0.0
+        self._data[key] = (expires_at, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_entries:
+            self._data.popitem(last=False)
+    
+    def replace(self, key: Hashable, value: V) -> bool:
+        """Replace the value of a live entry, keeping its expiry"""
+        item = self._data.get(key)
+        if item is None:
+            return False
+        self._data[key] = (item[0], value)
+        return True
+    
+    def pop(self, key: Hashable, default: Any = None) -> Optional[V]:
+        """Remove an entry and return its value"""
+        item = self._data.pop(key, None)
+        return default if item is None else item[1]
+    
+    def clear(self) -> None:
+        self._data.clear()
+    
+    def __contains__(self, key: Hashable) -> bool:
+        return self.get(key, None) is not None
+    
+    def __len__(self) -> int:
+        return len(self._data)
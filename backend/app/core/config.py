@@ -28,27 +28,136 @@ class Settings(BaseSettings):
     
     # Database
     DATABASE_URL: str = "sqlite:///./prompt_optimizer.db"
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: float = 30.0
+    DB_POOL_RECYCLE: int = 1800
+    SQLITE_BUSY_TIMEOUT_MS: int = 5000
     
     # OpenRouter API
     OPENROUTER_API_KEY: str
     OPENROUTER_BASE_URL: str = "https://openrouter.ai/api/v1"
     
+    # OpenRouter HTTP connection pool
+    OPENROUTER_MAX_CONNECTIONS: int = 100
+    OPENROUTER_MAX_KEEPALIVE_CONNECTIONS: int = 20
+    OPENROUTER_KEEPALIVE_EXPIRY: float = 30.0
+    OPENROUTER_HTTP2: bool = False
+    OPENROUTER_CONNECT_TIMEOUT: float = 10.0
+    OPENROUTER_READ_TIMEOUT: float = 120.0
+    OPENROUTER_WRITE_TIMEOUT: float = 30.0
+    OPENROUTER_POOL_TIMEOUT: float = 10.0
+    
+    # OpenRouter rate limiting and retries (requests/second, 0 disables)
+    OPENROUTER_RATE_LIMIT_RPS: float = 0.0
+    OPENROUTER_RATE_LIMIT_BURST: float = 0.0
+    OPENROUTER_MODEL_RATE_LIMIT_RPS: float = 0.0
+    OPENROUTER_MODEL_RATE_LIMIT_BURST: float = 0.0
+    OPENROUTER_MAX_RETRIES: int = 3
+    OPENROUTER_RETRY_BASE_DELAY: float = 0.5
+    OPENROUTER_RETRY_MAX_DELAY: float = 30.0
+    
+    # Hedged requests (opt-in per request)
+    HEDGE_QUANTILE: float = 0.95
+    HEDGE_MIN_SAMPLES: int = 20
+    HEDGE_DEFAULT_DELAY_SECONDS: float = 10.0
+    HEDGE_MIN_DELAY_SECONDS: float = 0.5
+    HEDGE_FALLBACK_MODELS: str = ""  # "model=fallback,model2=fallback2"
+    
+    # Provider prompt caching (cache_control breakpoint on the system prompt)
+    PROMPT_CACHE_ENABLED: bool = True
+    PROMPT_CACHE_MODELS: str = "anthropic/,google/gemini"  # model id prefixes that accept breakpoints
+    PROMPT_CACHE_MIN_CHARS: int = 4000  # ~1024 tokens, the smallest prefix providers will cache
+    
+    # Fair-share upstream scheduling and per-user quotas (0 = unlimited)
+    SCHEDULER_MAX_CONCURRENCY: int = 64  # upstream calls in flight per worker
+    SCHEDULER_INTERACTIVE_WEIGHT: float = 4.0
+    SCHEDULER_BATCH_WEIGHT: float = 1.0
+    USER_MAX_CONCURRENCY: int = 16
+    USER_TOKEN_QUOTA: int = 0  # tokens per user per window
+    USER_COST_QUOTA: float = 0.0  # dollars per user per window
+    USER_QUOTA_WINDOW_SECONDS: int = 86400
+    
+    # Admission control (adaptive scheduler limit, 503 once the queue is full)
+    ADMISSION_ADAPTIVE: bool = True  # SCHEDULER_MAX_CONCURRENCY becomes the ceiling
+    ADMISSION_MIN_CONCURRENCY: int = 4
+    ADMISSION_MAX_QUEUE: int = 256  # interactive calls waiting for a slot (0 = unlimited)
+    ADMISSION_LATENCY_TOLERANCE: float = 2.0  # latency vs a model's usual before shrinking
+    ADMISSION_BACKOFF: float = 0.9  # limit factor on timeouts, 429s and 5xx
+    
+    # Per-model circuit breakers (threshold 0 disables)
+    CIRCUIT_BREAKER_FAILURE_THRESHOLD: int = 5
+    CIRCUIT_BREAKER_RECOVERY_SECONDS: float = 30.0
+    CIRCUIT_BREAKER_HALF_OPEN_MAX_CALLS: int = 1
+    
+    # Model catalog cache
+    MODEL_CATALOG_TTL_SECONDS: int = 300
+    MODEL_CATALOG_MAX_STALE_SECONDS: int = 3600
+    
+    # Model response cache
+    RESPONSE_CACHE_ENABLED: bool = True
+    RESPONSE_CACHE_TTL_SECONDS: int = 86400
+    RESPONSE_CACHE_MAX_ENTRIES: int = 1000
+    
+    # Test results store
+    RESULTS_CACHE_MAX_ENTRIES: int = 500
+    RESULTS_RETENTION_DAYS: int = 7
+    
+    # Batch Jobs
+    BATCH_MAX_CONCURRENCY: int = 8
+    BATCH_MAX_QUESTIONS: int = 5000
+    BATCH_CANCEL_POLL_SECONDS: float = 0.5  # cancel flag polling with a shared state backend
+    
     # JWT Settings
     JWT_SECRET_KEY: str
     JWT_ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
+    AUTH_CACHE_TTL_SECONDS: int = 60
+    AUTH_CACHE_MAX_ENTRIES: int = 10000
+    
+    # Password hashing (bcrypt cost factor and worker pool)
+    BCRYPT_ROUNDS: int = 12
+    PASSWORD_HASH_WORKERS: int = 4
+    PASSWORD_HASH_MAX_PENDING: int = 64
+    
+    # Shared state across worker processes: memory (one worker), sqlite or redis
+    STATE_BACKEND: str = "memory"
+    STATE_SQLITE_PATH: str = "./shared_state.db"
+    STATE_REDIS_URL: str = "redis://localhost:6379/0"
+    STATE_REDIS_POOL_SIZE: int = 10
+    STATE_MEMORY_MAX_ENTRIES: int = 100000
+    STATE_CACHE_TTL_SECONDS: int = 3600  # hot copies of results and responses
+    STATE_JOB_TTL_SECONDS: int = 86400  # batch job progress and results
+    
+    # Live WebSocket sessions (/api/prompt/ws)
+    LIVE_AUTH_TIMEOUT_SECONDS: float = 10.0
+    LIVE_MAX_ACTIVE_RUNS: int = 8  # runs streaming at once per connection
+    LIVE_MAX_RUNS: int = 100  # finished runs kept per connection for regenerating
+    
+    # Startup warmup (gates GET /ready)
+    WARMUP_ENABLED: bool = True
+    WARMUP_UPSTREAM_CONNECTIONS: int = 4
+    WARMUP_TIMEOUT_SECONDS: float = 20.0
+    WARMUP_REQUIRE_UPSTREAM: bool = False  # unready while OpenRouter is unreachable
+    
+    # Response compression (bodies below the minimum size are sent as is; -1 disables)
+    COMPRESSION_MINIMUM_SIZE: int = 1024
+    COMPRESSION_GZIP_LEVEL: int = 6
+    COMPRESSION_BROTLI_QUALITY: int = 4
+    COMPRESSION_ZSTD_LEVEL: int = 3
     
     # CORS
     ALLOWED_ORIGINS: str = "http://localhost:3000,http://localhost:8000"
     
     # File Upload
     MAX_UPLOAD_SIZE_MB: int = 10
-    ALLOWED_EXTENSIONS: str = "json,txt"
+    ALLOWED_EXTENSIONS: str = "json,jsonl,csv,txt"
     UPLOAD_DIR: str = "uploads"
     
     # Server
     HOST: str = "0.0.0.0"
     PORT: int = 8000
+    WORKERS: int = 1  # >1 needs a shared STATE_BACKEND
     
     @property
     def allowed_origins_list(self) -> List[str]:
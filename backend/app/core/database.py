@@ -1,20 +1,88 @@
 """
 Database configuration and session management
 """
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.engine import make_url, URL
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from .config import settings
 
-# Create SQLAlchemy engine
-engine = create_engine(
-    settings.DATABASE_URL,
-    connect_args={"check_same_thread": False} if "sqlite" in settings.DATABASE_URL else {}
-)
+# Async drivers used for URLs that don't name one explicitly
+ASYNC_DRIVERS = {
+    "sqlite": "aiosqlite",
+    "postgresql": "asyncpg",
+    "mysql": "aiomysql"
+}
+
+
+def _is_sqlite(url: URL) -> bool:
+    return url.get_backend_name() == "sqlite"
+
+
+def _is_memory_sqlite(url: URL) -> bool:
+    return _is_sqlite(url) and url.database in (None, "", ":memory:")
+
+
+def to_async_url(database_url: str) -> URL:
+    """Map a sync database URL onto its async driver (sqlite -> sqlite+aiosqlite)"""
+    url = make_url(database_url)
+    backend = url.get_backend_name()
+    if url.drivername == backend and backend in ASYNC_DRIVERS:
+        url = url.set(drivername=f"{backend}+{ASYNC_DRIVERS[backend]}")
+    return url
+
+
+def _engine_options(url: URL) -> dict:
+    """Pool and connect options shared by the sync and async engines"""
+    options = {"pool_pre_ping": True}
+    if _is_sqlite(url):
+        options["connect_args"] = {"check_same_thread": False}
+    if not _is_memory_sqlite(url):
+        options.update(
+            pool_size=settings.DB_POOL_SIZE,
+            max_overflow=settings.DB_MAX_OVERFLOW,
+            pool_timeout=settings.DB_POOL_TIMEOUT,
+            pool_recycle=settings.DB_POOL_RECYCLE
+        )
+    return options
+
+
+def _tune_sqlite(dbapi_connection, connection_record) -> None:
+    """WAL lets readers run alongside a writer; NORMAL sync is safe with WAL"""
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute(f"PRAGMA busy_timeout={int(settings.SQLITE_BUSY_TIMEOUT_MS)}")
+    cursor.execute("PRAGMA foreign_keys=ON")
+    cursor.close()
+
+
+_sync_url = make_url(settings.DATABASE_URL)
+_async_url = to_async_url(settings.DATABASE_URL)
+
+# Create SQLAlchemy engine (used for table creation and sync tooling)
+engine = create_engine(_sync_url, **_engine_options(_sync_url))
+
+# Async engine used by request handlers and services
+async_engine = create_async_engine(_async_url, **_engine_options(_async_url))
+
+if _is_sqlite(_sync_url) and not _is_memory_sqlite(_sync_url):
+    event.listen(engine, "connect", _tune_sqlite)
+    event.listen(async_engine.sync_engine, "connect", _tune_sqlite)
 
 # Create SessionLocal class
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Create AsyncSessionLocal class
+AsyncSessionLocal = async_sessionmaker(
+    async_engine,
+    class_=AsyncSession,
+    autoflush=False,
+    expire_on_commit=False
+)
+
 # Create Base class for models
 Base = declarative_base()
 
@@ -28,6 +96,28 @@ def get_db():
         db.close()
 
 
+async def get_async_db():
+    """Dependency for getting an async database session"""
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
 def init_db():
     """Initialize database - create all tables"""
-    Base.metadata.create_all(bind=engine)
+    try:
+        Base.metadata.create_all(bind=engine)
+    except OperationalError:
+        # Another worker process created the tables at the same moment
+        Base.metadata.create_all(bind=engine)
+
+
+async def ping_db():
+    """Open a pooled async connection and run a trivial query"""
+    async with async_engine.connect() as conn:
+        await conn.execute(text("SELECT 1"))
+
+
+async def close_db():
+    """Dispose of pooled database connections"""
+    await async_engine.dispose()
+    engine.dispose()
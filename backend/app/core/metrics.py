@@ -0,0 +1,283 @@
+"""
+Minimal Prometheus-style metrics registry
+
+Implements counters, gauges and histograms with labels and renders them in
+the Prometheus text exposition format, without external dependencies.
+Metrics are per process; with several workers each exposes its own.
+"""
+import bisect
+import math
+from typing import Dict, List, Optional, Sequence, Tuple
+
+LabelValues = Tuple[str, ...]
+
+# Seconds; covers fast cached hits up to the upstream read timeout
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2, 5, 10, 20, 30, 60, 120)
+TTFT_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2, 5, 10, 30)
+TOKENS_PER_SECOND_BUCKETS = (1, 5, 10, 25, 50, 100, 200, 400)
+QUEUE_WAIT_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2, 5, 10, 30, 60)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    type_name = ""
+    
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+    
+    def _key(self, labels: Dict[str, str]) -> LabelValues:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+    
+    def render(self) -> List[str]:
+        return [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.type_name}"
+        ] + self._samples()
+    
+    def _samples(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    """Monotonically increasing value"""
+    type_name = "counter"
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[LabelValues, float] = {}
+    
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0) + amount
+    
+    def value(self, **labels: str) -> float:
+        return self._values.get(self._key(labels), 0)
+    
+    def _samples(self) -> List[str]:
+        return [
+            f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+            for key, value in sorted(self._values.items())
+        ]
+
+
+class Gauge(_Metric):
+    """Value that can go up and down"""
+    type_name = "gauge"
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[LabelValues, float] = {}
+    
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0) + amount
+    
+    def dec(self, amount: float = 1, **labels: str) -> None:
+        self.inc(-amount, **labels)
+    
+    def set(self, value: float, **labels: str) -> None:
+        self._values[self._key(labels)] = value
+    
+    def value(self, **labels: str) -> float:
+        return self._values.get(self._key(labels), 0)
+    
+    def _samples(self) -> List[str]:
+        return [
+            f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+            for key, value in sorted(self._values.items())
+        ]
+
+
+class Histogram(_Metric):
+    """Distribution of observations in cumulative buckets"""
+    type_name = "histogram"
+    
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # label values -> (per-bucket counts incl. +Inf, sum, count)
+        self._series: Dict[LabelValues, List] = {}
+    
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        series = self._series.get(key)
+        if series is None:
+            series = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            self._series[key] = series
+        series[0][bisect.bisect_left(self.buckets, value)] += 1
+        series[1] += value
+        series[2] += 1
+    
+    def count(self, **labels: str) -> int:
+        series = self._series.get(self._key(labels))
+        return series[2] if series else 0
+    
+    def quantile(self, q: float, **labels: str) -> Optional[float]:
+        """Approximate quantile (upper bound of the bucket that contains it)"""
+        series = self._series.get(self._key(labels))
+        if not series or not series[2]:
+            return None
+        rank = q * series[2]
+        cumulative = 0
+        for bound, bucket_count in zip(self.buckets + (math.inf,), series[0]):
+            cumulative += bucket_count
+            if cumulative >= rank:
+                return bound
+        return math.inf
+    
+    def _samples(self) -> List[str]:
+        lines = []
+        for key, (counts, total, count) in sorted(self._series.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (math.inf,), counts):
+                cumulative += bucket_count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {count}")
+        return lines
+
+
+class MetricsRegistry:
+    """Collection of metrics rendered together"""
+    
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+    
+    def _register(self, metric: _Metric) -> _Metric:
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric already registered: {metric.name}")
+        self._metrics[metric.name] = metric
+        return metric
+    
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+    
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self._register(Gauge(name, documentation, labelnames))
+    
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+    
+    def render(self) -> str:
+        """Render all metrics in Prometheus text format"""
+        lines: List[str] = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+# Process-wide registry
+registry = MetricsRegistry()
+
+MODEL_REQUESTS = registry.counter(
+    "prompt_optimizer_model_requests_total",
+    "Upstream model calls, by model",
+    ["model"]
+)
+MODEL_ERRORS = registry.counter(
+    "prompt_optimizer_model_errors_total",
+    "Failed upstream model calls, by model and error category",
+    ["model", "category"]
+)
+MODEL_RETRIES = registry.counter(
+    "prompt_optimizer_model_retries_total",
+    "Retries of upstream model calls, by model",
+    ["model"]
+)
+MODEL_CACHE_HITS = registry.counter(
+    "prompt_optimizer_model_cache_hits_total",
+    "Model calls answered from the response cache, by model",
+    ["model"]
+)
+MODEL_LATENCY = registry.histogram(
+    "prompt_optimizer_model_latency_seconds",
+    "End-to-end upstream model call latency",
+    ["model"],
+    LATENCY_BUCKETS
+)
+MODEL_PROMPT_TOKENS = registry.counter(
+    "prompt_optimizer_model_prompt_tokens_total",
+    "Prompt tokens of upstream model calls, by model and provider prompt cache status (cached/uncached)",
+    ["model", "cache"]
+)
+MODEL_TTFT = registry.histogram(
+    "prompt_optimizer_model_time_to_first_token_seconds",
+    "Time to first streamed token",
+    ["model"],
+    TTFT_BUCKETS
+)
+MODEL_TOKENS_PER_SECOND = registry.histogram(
+    "prompt_optimizer_model_tokens_per_second",
+    "Completion tokens per second of generation",
+    ["model"],
+    TOKENS_PER_SECOND_BUCKETS
+)
+MODEL_INFLIGHT = registry.gauge(
+    "prompt_optimizer_model_inflight_requests",
+    "Upstream model calls currently in flight",
+    ["model"]
+)
+MODEL_HEDGES = registry.counter(
+    "prompt_optimizer_model_hedges_total",
+    "Hedged model calls: backups sent (attempt=hedge/fallback) and winners (attempt=*_won)",
+    ["model", "attempt"]
+)
+MODEL_CIRCUIT_STATE = registry.gauge(
+    "prompt_optimizer_model_circuit_state",
+    "Circuit breaker state per model (0 closed, 1 half-open, 2 open)",
+    ["model"]
+)
+LIVE_SESSIONS = registry.gauge(
+    "prompt_optimizer_live_sessions",
+    "Open WebSocket live sessions"
+)
+SCHEDULER_QUEUE_DEPTH = registry.gauge(
+    "prompt_optimizer_scheduler_queue_depth",
+    "Upstream calls waiting for a scheduler slot, by priority class",
+    ["priority"]
+)
+SCHEDULER_ACTIVE = registry.gauge(
+    "prompt_optimizer_scheduler_active_calls",
+    "Upstream calls holding a scheduler slot, by priority class",
+    ["priority"]
+)
+SCHEDULER_WAIT = registry.histogram(
+    "prompt_optimizer_scheduler_wait_seconds",
+    "Time upstream calls waited for a scheduler slot, by priority class",
+    ["priority"],
+    QUEUE_WAIT_BUCKETS
+)
+QUOTA_REJECTIONS = registry.counter(
+    "prompt_optimizer_quota_rejections_total",
+    "Model calls refused because a user's quota was used up, by quota kind",
+    ["kind"]
+)
+ADMISSION_LIMIT = registry.gauge(
+    "prompt_optimizer_admission_limit",
+    "Adaptive limit on upstream calls in flight (the scheduler's slot count)"
+)
+ADMISSION_REJECTIONS = registry.counter(
+    "prompt_optimizer_admission_rejections_total",
+    "Requests refused with 503 because the upstream queue was full"
+)
@@ -0,0 +1,283 @@
+"""
+ASGI middleware
+"""
+import json
+import zlib
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+try:
+    import brotli
+except ImportError:  # optional: brotli encoding is skipped
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # optional: zstd encoding is skipped
+    zstandard = None
+
+
+class BodySizeLimitMiddleware:
+    """
+    Reject request bodies larger than max_bytes on the given path prefixes
+    
+    Checks Content-Length up front and counts bytes as they arrive, so an
+    oversized upload is cut off with 413 instead of being spooled first.
+    """
+    
+    def __init__(self, app, max_bytes: int, paths: Iterable[str]):
+        self.app = app
+        self.max_bytes = max_bytes
+        self.paths = tuple(paths)
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not scope["path"].startswith(self.paths):
+            await self.app(scope, receive, send)
+            return
+        
+        headers = dict(scope.get("headers") or [])
+        content_length = headers.get(b"content-length")
+        if content_length is not None and content_length.isdigit() and int(content_length) > self.max_bytes:
+            await self._reject(send)
+            return
+        
+        received = 0
+        response_started = False
+        rejected = False
+        
+        async def limited_receive():
+            nonlocal received, rejected
+            if rejected:
+                return {"type": "http.disconnect"}
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_bytes:
+                    # Answer 413 here: an exception raised from receive() would
+                    # be turned into a 400 by the app's body parser
+                    rejected = True
+                    if not response_started:
+                        await self._reject(send)
+                    return {"type": "http.disconnect"}
+            return message
+        
+        async def tracking_send(message):
+            nonlocal response_started
+            if rejected:
+                # The 413 has been sent; drop whatever the app answers
+                return
+            if message["type"] == "http.response.start":
+                response_started = True
+            await send(message)
+        
+        try:
+            await self.app(scope, limited_receive, tracking_send)
+        except Exception:
+            if not rejected:
+                raise
+    
+    async def _reject(self, send) -> None:
+        body = json.dumps({
+            "detail": f"File too large. Maximum size is {self.max_bytes // (1024 * 1024)} MB"
+        }).encode("utf-8")
+        await send({
+            "type": "http.response.start",
+            "status": 413,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"connection", b"close")
+            ]
+        })
+        await send({"type": "http.response.body", "body": body})
+
+
+# Content types worth compressing (prefix match)
+COMPRESSIBLE_TYPES = (
+    "application/json",
+    "application/x-ndjson",
+    "application/javascript",
+    "application/xml",
+    "text/"
+)
+
+
+class _Encoder:
+    """Streaming compressor with a common compress/flush/finish interface"""
+    
+    def __init__(self, compress: Callable[[bytes], bytes], flush: Callable[[], bytes], finish: Callable[[], bytes]):
+        self.compress = compress
+        self.flush = flush
+        self.finish = finish
+
+
+def _gzip_encoder(level: int) -> _Encoder:
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    return _Encoder(
+        compressor.compress,
+        lambda: compressor.flush(zlib.Z_SYNC_FLUSH),
+        compressor.flush
+    )
+
+
+def _brotli_encoder(quality: int) -> _Encoder:
+    compressor = brotli.Compressor(quality=quality)
+    return _Encoder(compressor.process, compressor.flush, compressor.finish)
+
+
+def _zstd_encoder(level: int) -> _Encoder:
+    compressor = zstandard.ZstdCompressor(level=level).compressobj()
+    return _Encoder(
+        compressor.compress,
+        lambda: compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK),
+        compressor.flush
+    )
+
+
+def parse_accept_encoding(header: str) -> Dict[str, float]:
+    """Map of coding -> q-value from an Accept-Encoding header"""
+    codings = {}
+    for part in header.split(","):
+        coding, _, params = part.strip().partition(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        q = 1.0
+        for param in params.split(";"):
+            name, _, value = param.strip().partition("=")
+            if name.strip() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        codings[coding] = q
+    return codings
+
+
+class CompressionMiddleware:
+    """
+    Compress responses with zstd, brotli or gzip as negotiated by Accept-Encoding
+    
+    Among the codings the client accepts (q > 0) and that are installed, the
+    one with the highest q wins, ties going to zstd, then br, then gzip.
+    Complete bodies smaller than minimum_size are sent as is. Streaming
+    bodies (NDJSON, exports) are compressed incrementally and flushed per
+    chunk so events are not held back.
+    """
+    
+    def __init__(
+        self,
+        app,
+        minimum_size: int = 1024,
+        gzip_level: int = 6,
+        brotli_quality: int = 4,
+        zstd_level: int = 3
+    ):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.encoders: List[Tuple[str, Callable[[], _Encoder]]] = []
+        if zstandard is not None:
+            self.encoders.append(("zstd", lambda: _zstd_encoder(zstd_level)))
+        if brotli is not None:
+            self.encoders.append(("br", lambda: _brotli_encoder(brotli_quality)))
+        self.encoders.append(("gzip", lambda: _gzip_encoder(gzip_level)))
+    
+    def negotiate(self, accept_encoding: str) -> Optional[Tuple[str, Callable[[], _Encoder]]]:
+        accepted = parse_accept_encoding(accept_encoding)
+        best = None
+        best_q = 0.0
+        for name, factory in self.encoders:
+            q = accepted.get(name, accepted.get("*", 0.0))
+            if q > best_q:
+                best, best_q = (name, factory), q
+        return best
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] == "HEAD":
+            await self.app(scope, receive, send)
+            return
+        
+        headers = dict(scope.get("headers") or [])
+        choice = self.negotiate(headers.get(b"accept-encoding", b"").decode("latin-1"))
+        if choice is None:
+            await self.app(scope, receive, send)
+            return
+        
+        coding, factory = choice
+        start_message = None
+        encoder: Optional[_Encoder] = None
+        passthrough = False
+        
+        async def compressing_send(message):
+            nonlocal start_message, encoder, passthrough
+            
+            if message["type"] == "http.response.start":
+                start_message = message
+                return
+            if message["type"] != "http.response.body" or passthrough:
+                await send(message)
+                return
+            
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            
+            if encoder is None:
+                response_headers = _Headers(start_message["headers"])
+                if (
+                    start_message["status"] < 200
+                    or start_message["status"] in (204, 304)
+                    or response_headers.get("content-encoding")
+                    or not response_headers.get("content-type", "").startswith(COMPRESSIBLE_TYPES)
+                    or (not more_body and len(body) < self.minimum_size)
+                ):
+                    passthrough = True
+                    await send(start_message)
+                    await send(message)
+                    return
+                
+                encoder = factory()
+                response_headers.remove("content-length")
+                response_headers.set("content-encoding", coding)
+                response_headers.add_vary("Accept-Encoding")
+                
+                if not more_body:
+                    compressed = encoder.compress(body) + encoder.finish()
+                    response_headers.set("content-length", str(len(compressed)))
+                    await send({**start_message, "headers": response_headers.raw})
+                    await send({"type": "http.response.body", "body": compressed})
+                    return
+                await send({**start_message, "headers": response_headers.raw})
+            
+            if more_body:
+                chunk = encoder.compress(body) + encoder.flush()
+            else:
+                chunk = encoder.compress(body) + encoder.finish()
+            await send({"type": "http.response.body", "body": chunk, "more_body": more_body})
+        
+        await self.app(scope, receive, compressing_send)
+
+
+class _Headers:
+    """Minimal mutable view over raw ASGI header pairs"""
+    
+    def __init__(self, raw):
+        self.raw = list(raw)
+    
+    def get(self, name: str, default: str = "") -> str:
+        key = name.encode("latin-1")
+        for header, value in self.raw:
+            if header.lower() == key:
+                return value.decode("latin-1")
+        return default
+    
+    def remove(self, name: str) -> None:
+        key = name.encode("latin-1")
+        self.raw = [(header, value) for header, value in self.raw if header.lower() != key]
+    
+    def set(self, name: str, value: str) -> None:
+        self.remove(name)
+        self.raw.append((name.encode("latin-1"), value.encode("latin-1")))
+    
+    def add_vary(self, value: str) -> None:
+        vary = self.get("vary")
+        if value.lower() not in vary.lower():
+            self.set("vary", f"{vary}, {value}" if vary else value)
@@ -0,0 +1,20 @@
+"""
+Response classes
+"""
+from typing import Any
+
+import orjson
+from fastapi.responses import JSONResponse
+
+
+class FastJSONResponse(JSONResponse):
+    """
+    JSONResponse rendered with orjson
+    
+    Used as the app's default response class. Routes with a response_model
+    hand it data already converted by Pydantic; routes returning plain dicts
+    (e.g. the model catalog) are serialized by orjson directly.
+    """
+    
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
@@ -0,0 +1,399 @@
+"""
+Shared state backends
+
+Results, batch job progress, cache hot tiers and rate-limit counters go
+through a StateBackend so they can be shared by several worker processes:
+
+- "memory": in-process (single worker only), bounded LRU with TTLs
+- "sqlite": a SQLite file on local disk, shared by workers on one host
+- "redis": any server speaking the Redis protocol (RESP), shared by hosts
+
+Values are bytes; callers do their own serialization.
+"""
+import asyncio
+import sqlite3
+import threading
+import time
+from typing import Callable, Dict, Generic, List, Optional, Sequence, Tuple, TypeVar
+from urllib.parse import unquote, urlparse
+from .cache import TTLCache
+from .config import settings
+
+
+class StateBackendError(Exception):
+    """Raised when a state backend operation fails"""
+
+
+class _ReplyError(StateBackendError):
+    """Error reply to a single command from a Redis-protocol server"""
+
+
+class StateBackend:
+    """
+    Interface of a shared key-value store with TTLs and atomic counters
+    
+    A ttl of None or 0 means the key does not expire.
+    """
+    
+    # Whether other worker processes see the same state
+    shared = False
+    
+    async def get(self, key: str) -> Optional[bytes]:
+        raise NotImplementedError
+    
+    async def get_many(self, keys: Sequence[str]) -> List[Optional[bytes]]:
+        return [await self.get(key) for key in keys]
+    
+    async def set(self, key: str, value: bytes, ttl: Optional[float] = None) -> None:
+        raise NotImplementedError
+    
+    async def delete(self, key: str) -> None:
+        raise NotImplementedError
+    
+    async def incr(self, key: str, amount: int = 1, ttl: Optional[float] = None) -> int:
+        """Atomically add to a counter; ttl applies when the counter is created"""
+        raise NotImplementedError
+    
+    async def close(self) -> None:
+        pass
+
+
+class MemoryStateBackend(StateBackend):
+    """In-process state: a bounded LRU with per-key TTLs"""
+    
+    def __init__(self, max_entries: int = 100000):
+        self._data: TTLCache[object] = TTLCache(max_entries=max_entries)
+    
+    async def get(self, key: str) -> Optional[bytes]:
+        value = self._data.get(key)
+        if isinstance(value, int):
+            return str(value).encode()
+        return value
+    
+    async def set(self, key: str, value: bytes, ttl: Optional[float] = None) -> None:
+        self._data.set(key, value, ttl=ttl or 0)
+    
+    async def delete(self, key: str) -> None:
+        self._data.pop(key)
+    
+    async def incr(self, key: str, amount: int = 1, ttl: Optional[float] = None) -> int:
+        current = self._data.get(key)
+        if current is None:
+            self._data.set(key, amount, ttl=ttl or 0)
+            return amount
+        
+        value = int(current) + amount
+        self._data.replace(key, value)
+        return value
+
+
+class SQLiteStateBackend(StateBackend):
+    """
+    State in a SQLite file, shared by all workers on the same host
+    
+    Runs queries in a worker thread. WAL mode lets readers proceed while
+    another process writes; counters use an immediate transaction so
+    increments from different processes don't race.
+    """
+    
+    shared = True
+    
+    def __init__(self, path: str, busy_timeout_ms: int = 5000):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=busy_timeout_ms / 1000, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS state ("
+            "key TEXT PRIMARY KEY, value BLOB NOT NULL, expires_at REAL)"
+        )
+        self._writes = 0
+    
+    async def _run(self, fn, *args):
+        def locked():
+            with self._lock:
+                try:
+                    return fn(*args)
+                except sqlite3.Error as e:
+                    raise StateBackendError(str(e)) from e
+        return await asyncio.to_thread(locked)
+    
+    @staticmethod
+    def _expires_at(ttl: Optional[float]) -> Optional[float]:
+        return time.time() + ttl if ttl else None
+    
+    def _get_many(self, keys: Sequence[str]) -> List[Optional[bytes]]:
+        found: Dict[str, bytes] = {}
+        now = time.time()
+        # Stay below SQLite's bound parameter limit
+        for start in range(0, len(keys), 500):
+            chunk = list(keys[start:start + 500])
+            rows = self._conn.execute(
+                f"SELECT key, value FROM state WHERE key IN ({','.join('?' * len(chunk))}) "
+                "AND (expires_at IS NULL OR expires_at > ?)",
+                chunk + [now]
+            )
+            found.update(rows)
+        return [found.get(key) for key in keys]
+    
+    def _set(self, key: str, value: bytes, ttl: Optional[float]) -> None:
+        self._conn.execute(
+            "INSERT OR REPLACE INTO state (key, value, expires_at) VALUES (?, ?, ?)",
+            (key, value, self._expires_at(ttl))
+        )
+        self._writes += 1
+        if self._writes % 1000 == 0:
+            self._conn.execute("DELETE FROM state WHERE expires_at <= ?", (time.time(),))
+    
+    def _incr(self, key: str, amount: int, ttl: Optional[float]) -> int:
+        now = time.time()
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = self._conn.execute(
+                "SELECT value, expires_at FROM state WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or (row[1] is not None and row[1] <= now):
+                value, expires_at = amount, self._expires_at(ttl)
+            else:
+                value, expires_at = int(row[0]) + amount, row[1]
+            self._conn.execute(
+                "INSERT OR REPLACE INTO state (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, str(value).encode(), expires_at)
+            )
+            self._conn.execute("COMMIT")
+        except BaseException:
+            self._conn.execute("ROLLBACK")
+            raise
+        return value
+    
+    async def get(self, key: str) -> Optional[bytes]:
+        return (await self.get_many([key]))[0]
+    
+    async def get_many(self, keys: Sequence[str]) -> List[Optional[bytes]]:
+        if not keys:
+            return []
+        return await self._run(self._get_many, keys)
+    
+    async def set(self, key: str, value: bytes, ttl: Optional[float] = None) -> None:
+        await self._run(self._set, key, value, ttl)
+    
+    async def delete(self, key: str) -> None:
+        await self._run(self._conn.execute, "DELETE FROM state WHERE key = ?", (key,))
+    
+    async def incr(self, key: str, amount: int = 1, ttl: Optional[float] = None) -> int:
+        return await self._run(self._incr, key, amount, ttl)
+    
+    async def close(self) -> None:
+        await self._run(self._conn.close)
+
+
+class RedisStateBackend(StateBackend):
+    """
+    State on a Redis-protocol server (Redis, Valkey, KeyDB, ...)
+    
+    Speaks RESP directly over a small pool of asyncio connections, so no
+    client library is needed. Commands used: GET, MGET, SET (PX/NX), DEL,
+    INCRBY, plus AUTH/SELECT from the URL
+    (redis://[:password@]host[:port][/db]).
+    """
+    
+    shared = True
+    
+    def __init__(self, url: str, pool_size: int = 10, timeout: float = 5.0):
+        parsed = urlparse(url)
+        self.host = parsed.hostname or "localhost"
+        self.port = parsed.port or 6379
+        self.password = unquote(parsed.password) if parsed.password else None
+        self.db = int(parsed.path.lstrip("/") or 0)
+        self.timeout = timeout
+        self._pool: "asyncio.Queue[Tuple[asyncio.StreamReader, asyncio.StreamWriter]]" = asyncio.Queue()
+        self._slots = asyncio.Semaphore(pool_size)
+    
+    @staticmethod
+    def _encode(*args) -> bytes:
+        parts = [f"*{len(args)}\r\n".encode()]
+        for arg in args:
+            if not isinstance(arg, bytes):
+                arg = str(arg).encode()
+            parts.append(b"$%d\r\n%s\r\n" % (len(arg), arg))
+        return b"".join(parts)
+    
+    async def _read_reply(self, reader: asyncio.StreamReader):
+        line = await reader.readline()
+        if not line:
+            raise StateBackendError("Connection closed by state server")
+        kind, payload = line[:1], line[1:-2]
+        if kind == b"+":
+            return payload.decode()
+        if kind == b"-":
+            raise _ReplyError(payload.decode())
+        if kind == b":":
+            return int(payload)
+        if kind == b"$":
+            length = int(payload)
+            if length < 0:
+                return None
+            data = await reader.readexactly(length + 2)
+            return data[:-2]
+        if kind == b"*":
+            count = int(payload)
+            if count < 0:
+                return None
+            return [await self._read_reply(reader) for _ in range(count)]
+        raise StateBackendError(f"Unexpected reply from state server: {line!r}")
+    
+    async def _connect(self) -> Tuple[asyncio.StreamReader, asyncio.StreamWriter]:
+        reader, writer = await asyncio.open_connection(self.host, self.port)
+        setup = []
+        if self.password:
+            setup.append(("AUTH", self.password))
+        if self.db:
+            setup.append(("SELECT", self.db))
+        for command in setup:
+            writer.write(self._encode(*command))
+            await writer.drain()
+            await self._read_reply(reader)
+        return reader, writer
+    
+    async def _execute(self, *commands: Tuple) -> List:
+        """Send commands as one pipeline and return their replies"""
+        async with self._slots:
+            try:
+                conn = self._pool.get_nowait()
+            except asyncio.QueueEmpty:
+                conn = None
+            
+            try:
+                if conn is None:
+                    conn = await asyncio.wait_for(self._connect(), self.timeout)
+                reader, writer = conn
+                writer.write(b"".join(self._encode(*command) for command in commands))
+                await writer.drain()
+                replies = []
+                errors = []
+                for _ in commands:
+                    try:
+                        replies.append(await asyncio.wait_for(self._read_reply(reader), self.timeout))
+                    except _ReplyError as e:
+                        # Server-side error for one command; the connection is still usable
+                        errors.append(e)
+                        replies.append(None)
+            except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError, StateBackendError) as e:
+                if conn is not None:
+                    conn[1].close()
+                raise StateBackendError(f"State server error: {e}") from e
+            except BaseException:
+                # Cancelled mid-command: the connection state is unknown
+                if conn is not None:
+                    conn[1].close()
+                raise
+            
+            self._pool.put_nowait(conn)
+            if errors:
+                raise errors[0]
+            return replies
+    
+    async def get(self, key: str) -> Optional[bytes]:
+        return (await self._execute(("GET", key)))[0]
+    
+    async def get_many(self, keys: Sequence[str]) -> List[Optional[bytes]]:
+        if not keys:
+            return []
+        return (await self._execute(("MGET", *keys)))[0]
+    
+    async def set(self, key: str, value: bytes, ttl: Optional[float] = None) -> None:
+        if ttl:
+            await self._execute(("SET", key, value, "PX", max(1, int(ttl * 1000))))
+        else:
+            await self._execute(("SET", key, value))
+    
+    async def delete(self, key: str) -> None:
+        await self._execute(("DEL", key))
+    
+    async def incr(self, key: str, amount: int = 1, ttl: Optional[float] = None) -> int:
+        if not ttl:
+            return (await self._execute(("INCRBY", key, amount)))[0]
+        # Create the key with its expiry first (NX keeps an existing one)
+        replies = await self._execute(
+            ("SET", key, 0, "PX", max(1, int(ttl * 1000)), "NX"),
+            ("INCRBY", key, amount)
+        )
+        return replies[1]
+    
+    async def close(self) -> None:
+        while not self._pool.empty():
+            _, writer = self._pool.get_nowait()
+            writer.close()
+
+
+V = TypeVar("V")
+
+
+class StateCache(Generic[V]):
+    """
+    Hot cache tier in front of a durable store
+    
+    Keeps objects in a local LRU when the backend is not shared (no
+    serialization cost), otherwise stores them encoded in the shared backend
+    so every worker sees the same, current entries. Backend errors are
+    treated as misses: the durable store stays the source of truth.
+    """
+    
+    def __init__(
+        self,
+        backend: StateBackend,
+        namespace: str,
+        encode: Callable[[V], bytes],
+        decode: Callable[[bytes], V],
+        max_entries: int,
+        ttl: float
+    ):
+        self.backend = backend
+        self.namespace = namespace
+        self.encode = encode
+        self.decode = decode
+        self.ttl = ttl
+        self.local: Optional[TTLCache[V]] = None if backend.shared else TTLCache(max_entries=max_entries, ttl=ttl)
+    
+    def _key(self, key: str) -> str:
+        return f"{self.namespace}:{key}"
+    
+    async def get(self, key: str) -> Optional[V]:
+        if self.local is not None:
+            return self.local.get(key)
+        try:
+            raw = await self.backend.get(self._key(key))
+        except StateBackendError as e:
+            print(f"State backend unavailable for {self.namespace}: {e}")
+            return None
+        return None if raw is None else self.decode(raw)
+    
+    async def set(self, key: str, value: V) -> None:
+        if self.local is not None:
+            self.local.set(key, value)
+            return
+        try:
+            await self.backend.set(self._key(key), self.encode(value), ttl=self.ttl)
+        except StateBackendError as e:
+            print(f"State backend unavailable for {self.namespace}: {e}")
+
+
+# STATE_BACKEND values and how to build each from the settings
+STATE_BACKENDS: Dict[str, Callable[[], StateBackend]] = {
+    "memory": lambda: MemoryStateBackend(max_entries=settings.STATE_MEMORY_MAX_ENTRIES),
+    "sqlite": lambda: SQLiteStateBackend(settings.STATE_SQLITE_PATH, busy_timeout_ms=settings.SQLITE_BUSY_TIMEOUT_MS),
+    "redis": lambda: RedisStateBackend(settings.STATE_REDIS_URL, pool_size=settings.STATE_REDIS_POOL_SIZE)
+}
+
+
+def create_state_backend(name: str) -> StateBackend:
+    """Build the backend selected by STATE_BACKEND"""
+    factory = STATE_BACKENDS.get(name.lower())
+    if factory is None:
+        raise ValueError(f"Unknown STATE_BACKEND {name!r}; use one of {', '.join(STATE_BACKENDS)}")
+    return factory()
+
+
+# Process-wide backend
+state_backend = create_state_backend(settings.STATE_BACKEND)
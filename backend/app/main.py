@@ -4,18 +4,28 @@ Main FastAPI application
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, PlainTextResponse
 import os
 
 from .core.config import settings
-from .core.database import init_db
+from .core.database import init_db, close_db
+from .core.middleware import BodySizeLimitMiddleware, CompressionMiddleware
+from .core.responses import FastJSONResponse
+from .core.security import password_hasher
+from .core.state import state_backend
+from .core.metrics import registry as metrics_registry
+from .services.openrouter import openrouter_service
+from .services.response_cache import response_cache_service
+from .services.results_store import results_store
+from .services.warmup import warmup_service
 from .api import auth, prompt
 
 # Initialize FastAPI app
 app = FastAPI(
     title=settings.APP_NAME,
     description="A web application for optimizing prompts across multiple LLM models",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=FastJSONResponse
 )
 
 # Configure CORS
@@ -27,6 +37,26 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Cut off oversized uploads while they arrive. Allows some headroom over
+# MAX_UPLOAD_SIZE_MB for multipart framing; the exact file size limit is
+# enforced by the file handler.
+app.add_middleware(
+    BodySizeLimitMiddleware,
+    max_bytes=settings.MAX_UPLOAD_SIZE_MB * 1024 * 1024 + 64 * 1024,
+    paths=["/api/prompt/upload"]
+)
+
+# Compress responses as negotiated by Accept-Encoding (outermost, so it
+# also covers error responses from the middleware above)
+if settings.COMPRESSION_MINIMUM_SIZE >= 0:
+    app.add_middleware(
+        CompressionMiddleware,
+        minimum_size=settings.COMPRESSION_MINIMUM_SIZE,
+        gzip_level=settings.COMPRESSION_GZIP_LEVEL,
+        brotli_quality=settings.COMPRESSION_BROTLI_QUALITY,
+        zstd_level=settings.COMPRESSION_ZSTD_LEVEL
+    )
+
 # Include routers
 app.include_router(auth.router, prefix="/api")
 app.include_router(prompt.router, prefix="/api")
@@ -41,13 +71,30 @@ if os.path.exists(static_path):
 
 @app.on_event("startup")
 async def startup_event():
-    """Initialize database on startup"""
+    """Initialize database and upstream HTTP client on startup"""
     init_db()
+    response_cache_service.purge_expired()
+    results_store.purge_expired()
+    await openrouter_service.startup()
+    warmup_service.start()
     print(f"🚀 {settings.APP_NAME} is starting...")
     print(f"📊 Database: {settings.DATABASE_URL}")
+    print(f"🗄️  State backend: {settings.STATE_BACKEND}")
+    if settings.WORKERS > 1 and not state_backend.shared:
+        print("⚠️  WORKERS > 1 with STATE_BACKEND=memory: batch jobs, caches and rate limits are per worker")
     print(f"🌐 CORS Origins: {settings.allowed_origins_list}")
 
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Close pooled upstream connections and worker pools on shutdown"""
+    warmup_service.stop()
+    await openrouter_service.shutdown()
+    password_hasher.shutdown()
+    await state_backend.close()
+    await close_db()
+
+
 @app.get("/")
 async def root():
     """Serve the main application page"""
@@ -76,11 +123,30 @@ async def health_check():
     }
 
 
+@app.get("/ready")
+async def readiness_check():
+    """Readiness probe: 200 once startup warmup has finished, 503 before"""
+    return FastJSONResponse(
+        warmup_service.status(),
+        status_code=200 if warmup_service.ready else 503
+    )
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Prometheus metrics for upstream model calls"""
+    return PlainTextResponse(
+        metrics_registry.render(),
+        media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
+
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(
         "app.main:app",
         host=settings.HOST,
         port=settings.PORT,
-        reload=settings.DEBUG
+        reload=settings.DEBUG and settings.WORKERS == 1,
+        workers=settings.WORKERS
     )
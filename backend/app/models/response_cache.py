@@ -0,0 +1,17 @@
+"""
+Cached model responses keyed by request content
+"""
+from sqlalchemy import Column, String, Text, DateTime
+from datetime import datetime
+from ..core.database import Base
+
+
+class CachedResponse(Base):
+    """Durable tier of the model response cache"""
+    __tablename__ = "response_cache"
+    
+    key = Column(String(64), primary_key=True)
+    model = Column(String, index=True, nullable=False)
+    response_json = Column(Text, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    expires_at = Column(DateTime, index=True, nullable=False)
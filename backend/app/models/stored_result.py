@@ -0,0 +1,17 @@
+"""
+Stored prompt test results
+"""
+from sqlalchemy import Column, Integer, String, Text, DateTime
+from datetime import datetime
+from ..core.database import Base
+
+
+class StoredResult(Base):
+    """Durable tier of the prompt test results store"""
+    __tablename__ = "test_results"
+    
+    request_id = Column(String(36), primary_key=True)
+    user_id = Column(Integer, index=True, nullable=False)
+    result_json = Column(Text, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
+    expires_at = Column(DateTime, index=True, nullable=False)
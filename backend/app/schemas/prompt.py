@@ -2,7 +2,7 @@
 Pydantic schemas for prompt testing requests and responses
 """
 from pydantic import BaseModel, Field
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Literal
 from datetime import datetime
 
 
@@ -17,6 +17,11 @@ class PromptTestRequest(BaseModel):
     system_prompt: str = Field(..., min_length=1)
     question: str = Field(..., min_length=1)
     models: List[str] = Field(..., min_items=1, max_items=3)
+    cache_mode: Literal["use", "refresh", "bypass"] = "use"
+    hedge: bool = False  # back up calls slower than the model's p95
+    fallback_models: Dict[str, str] = {}  # model -> fallback model for hedged calls
+    deadline_seconds: Optional[float] = Field(None, gt=0)  # return what finished by then
+    on_deadline: Literal["cancel", "background"] = "cancel"  # what to do with stragglers
 
 
 class ModelResponse(BaseModel):
@@ -26,7 +31,12 @@ class ModelResponse(BaseModel):
     tokens_used: int
     prompt_tokens: int
     completion_tokens: int
+    cached_prompt_tokens: int = 0  # prompt tokens read from the provider's prompt cache
     time_taken: float
+    time_to_first_token: Optional[float] = None
+    retries: int = 0
+    cached: bool = False
+    attempt: Optional[str] = None  # winner of a hedged call: primary, hedge or fallback
     cost: Optional[float] = None
     finish_reason: Optional[str] = None
     error: Optional[str] = None
@@ -40,6 +50,7 @@ class PromptTestResponse(BaseModel):
     responses: List[ModelResponse]
     total_time: float
     timestamp: datetime
+    pending_models: List[str] = []  # still running; attached to the stored result later
 
 
 class FileUploadResponse(BaseModel):
@@ -49,6 +60,37 @@ class FileUploadResponse(BaseModel):
     question_count: int
 
 
+class BatchJobRequest(BaseModel):
+    """Schema for submitting a batch evaluation job"""
+    system_prompt: str = Field(..., min_length=1)
+    questions: List[str] = Field(..., min_items=1)
+    models: List[str] = Field(..., min_items=1, max_items=3)
+    concurrency: Optional[int] = Field(None, ge=1)
+    cache_mode: Literal["use", "refresh", "bypass"] = "use"
+
+
+class BatchResultItem(BaseModel):
+    """Schema for one (question, model) result in a batch job"""
+    question_index: int
+    question: str
+    response: ModelResponse
+
+
+class BatchJobStatus(BaseModel):
+    """Schema for batch job progress and (partial) results"""
+    job_id: str
+    status: str  # pending, running, completed, cancelled, failed
+    system_prompt: str
+    models: List[str]
+    question_count: int
+    total: int
+    completed: int
+    failed: int
+    created_at: datetime
+    finished_at: Optional[datetime] = None
+    results: List[BatchResultItem] = []
+
+
 class DownloadRequest(BaseModel):
     """Schema for download request"""
     model: Optional[str] = None  # If None, download all models
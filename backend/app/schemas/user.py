@@ -1,7 +1,7 @@
 """
 Pydantic schemas for user-related requests and responses
 """
-from pydantic import BaseModel, EmailStr, Field
+from pydantic import BaseModel, ConfigDict, EmailStr, Field
 from datetime import datetime
 from typing import Optional
 
@@ -31,6 +31,12 @@ class UserResponse(BaseModel):
         from_attributes = True
 
 
+class CurrentUser(UserResponse):
+    """Snapshot of the authenticated user, safe to cache across requests"""
+    
+    model_config = ConfigDict(from_attributes=True, frozen=True)
+
+
 class Token(BaseModel):
     """Schema for JWT token response"""
     access_token: str
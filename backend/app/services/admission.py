@@ -0,0 +1,154 @@
+"""
+Adaptive admission control for upstream model calls
+
+The scheduler's global slot count is not fixed: it follows how upstream is
+coping. Latency well above each model's usual level shrinks it
+(gradient), timeouts, 429s and 5xx cut it multiplicatively, and it grows
+back additively while calls return at normal speed (AIMD). New interactive
+requests are refused up front once the queue for those slots is full, so a
+provider incident produces quick 503s instead of requests piling up until
+they time out.
+"""
+import math
+import time
+from typing import Dict, Optional
+from ..core.metrics import ADMISSION_LIMIT, ADMISSION_REJECTIONS
+from .scheduler import PRIORITY_INTERACTIVE, FairScheduler
+
+# Upstream outcomes that mean the provider is overloaded
+OVERLOAD_CATEGORIES = {"timeout", "connection", "rate_limited", "upstream_5xx"}
+
+# Smoothing of the per-model baseline latency and of the recent latency ratio
+BASELINE_ALPHA = 0.02
+RATIO_ALPHA = 0.2
+
+# Successful calls per model before its latency counts towards the gradient
+BASELINE_MIN_SAMPLES = 10
+
+
+class Overloaded(Exception):
+    """Raised when a request is refused because the upstream queue is full"""
+    
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class _Baseline:
+    """Long-term average latency of one model"""
+    
+    def __init__(self):
+        self.latency = 0.0
+        self.samples = 0
+    
+    def update(self, latency: float) -> None:
+        self.samples += 1
+        if self.samples == 1:
+            self.latency = latency
+        else:
+            self.latency += BASELINE_ALPHA * (latency - self.latency)
+
+
+class AdmissionController:
+    """
+    Adapts the scheduler's concurrency limit and sheds excess requests
+    
+    Each successful call's latency is divided by its model's long-term
+    average, and the ratio is smoothed. While the smoothed ratio is above
+    `tolerance` the limit is scaled down by tolerance/ratio (at most halved
+    per step). Overload errors multiply it by `backoff`, at most once per
+    typical call latency so one burst of timeouts counts once. Otherwise the
+    limit grows by 1/limit per successful call while at least half of it is
+    in use, about one slot per round trip. It stays within
+    [min_limit, max_limit].
+    """
+    
+    def __init__(
+        self,
+        scheduler: FairScheduler,
+        adaptive: bool,
+        min_limit: int,
+        max_limit: int,
+        max_queue: int,
+        tolerance: float = 2.0,
+        backoff: float = 0.9
+    ):
+        """
+        Args:
+            scheduler: Scheduler whose global limit is adjusted
+            adaptive: Adjust the limit from observed calls (else keep max_limit)
+            min_limit: Lowest limit adaptation may reach
+            max_limit: Highest limit (the configured scheduler concurrency)
+            max_queue: Interactive calls allowed to wait for a slot (0 = unlimited)
+            tolerance: Latency ratio to the baseline that still counts as normal
+            backoff: Factor applied to the limit on overload errors
+        """
+        self.scheduler = scheduler
+        self.adaptive = adaptive and max_limit > 0
+        self.min_limit = max(1, min(min_limit, max_limit)) if max_limit > 0 else 0
+        self.max_limit = max_limit
+        self.max_queue = max_queue
+        self.tolerance = tolerance
+        self.backoff = backoff
+        self.limit = float(max_limit)
+        self.ratio = 1.0
+        self.latency = 0.0
+        self._baselines: Dict[str, _Baseline] = {}
+        self._last_decrease = 0.0
+        ADMISSION_LIMIT.set(self.limit)
+    
+    def check(self) -> None:
+        """Raise Overloaded if the interactive queue is full"""
+        if self.max_queue <= 0:
+            return
+        depth = self.scheduler.queue_depth(PRIORITY_INTERACTIVE)
+        if depth < self.max_queue:
+            return
+        ADMISSION_REJECTIONS.inc()
+        raise Overloaded(
+            f"Server is overloaded ({depth} model calls queued), please retry shortly",
+            self.retry_after(depth)
+        )
+    
+    def retry_after(self, depth: int) -> float:
+        """Rough time for the current queue to drain"""
+        slots = max(1, self.scheduler.limit)
+        return min(30.0, max(1.0, self.latency * (depth + 1) / slots))
+    
+    def record(self, model: str, latency: float, error_category: Optional[str]) -> None:
+        """Feed one finished upstream call into the limit"""
+        if error_category in OVERLOAD_CATEGORIES:
+            self._decrease(self.backoff)
+            return
+        if error_category is not None:
+            return
+        
+        self.latency = latency if not self.latency else self.latency + RATIO_ALPHA * (latency - self.latency)
+        baseline = self._baselines.get(model)
+        if baseline is None:
+            baseline = self._baselines[model] = _Baseline()
+        warm = baseline.samples >= BASELINE_MIN_SAMPLES
+        if warm and baseline.latency > 0:
+            self.ratio += RATIO_ALPHA * (latency / baseline.latency - self.ratio)
+        baseline.update(latency)
+        if not warm:
+            return
+        
+        if self.ratio > self.tolerance:
+            self._decrease(max(0.5, self.tolerance / self.ratio))
+        elif self.scheduler.active >= self.limit / 2:
+            self._set_limit(self.limit + 1 / self.limit)
+    
+    def _decrease(self, factor: float) -> None:
+        now = time.monotonic()
+        if now - self._last_decrease < max(1.0, self.latency):
+            return
+        self._last_decrease = now
+        self._set_limit(self.limit * factor)
+    
+    def _set_limit(self, limit: float) -> None:
+        if not self.adaptive:
+            return
+        self.limit = min(float(self.max_limit), max(float(self.min_limit), limit))
+        ADMISSION_LIMIT.set(self.limit)
+        self.scheduler.set_limit(math.floor(self.limit))
@@ -1,28 +1,112 @@
 """
 Authentication service for user operations
 """
-from sqlalchemy.orm import Session
+import time
+from typing import Dict, Optional, Set
+from sqlalchemy import event, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from fastapi import HTTPException, status
 from ..models.user import User
-from ..schemas.user import UserCreate
-from ..core.security import get_password_hash, verify_password
+from ..schemas.user import UserCreate, CurrentUser
+from ..core.cache import TTLCache
+from ..core.config import settings
+from ..core.security import password_hasher, PasswordHasherBusy
+
+
+class AuthenticatedUserCache:
+    """
+    Cache of verified JWT -> CurrentUser snapshot
+    
+    Entries live for AUTH_CACHE_TTL_SECONDS, never past the token's own
+    expiry, and are dropped as soon as the user row is changed or deleted
+    in this process. Other workers pick changes up when the TTL runs out.
+    """
+    
+    def __init__(self, max_entries: int, ttl: float):
+        self.ttl = ttl
+        self._cache: TTLCache[CurrentUser] = TTLCache(max_entries=max_entries, ttl=ttl)
+        self._tokens_by_user: Dict[int, Set[str]] = {}
+    
+    @property
+    def enabled(self) -> bool:
+        return self.ttl > 0
+    
+    def get(self, token: str) -> Optional[CurrentUser]:
+        if not self.enabled:
+            return None
+        return self._cache.get(token)
+    
+    def set(self, token: str, user: CurrentUser, expires_at: Optional[float] = None) -> None:
+        if not self.enabled:
+            return
+        ttl = self.ttl
+        if expires_at is not None:
+            ttl = min(ttl, expires_at - time.time())
+            if ttl <= 0:
+                return
+        self._cache.set(token, user, ttl=ttl)
+        
+        tokens = self._tokens_by_user.setdefault(user.id, set())
+        # Forget tokens the LRU already evicted so the index stays bounded
+        tokens.intersection_update(t for t in list(tokens) if t in self._cache)
+        tokens.add(token)
+    
+    def invalidate_user(self, user_id: int) -> None:
+        """Drop every cached token of a user"""
+        for token in self._tokens_by_user.pop(user_id, set()):
+            self._cache.pop(token)
+    
+    def clear(self) -> None:
+        self._cache.clear()
+        self._tokens_by_user.clear()
+
+
+authenticated_user_cache = AuthenticatedUserCache(
+    max_entries=settings.AUTH_CACHE_MAX_ENTRIES,
+    ttl=settings.AUTH_CACHE_TTL_SECONDS
+)
+
+
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _invalidate_cached_user(mapper, connection, target: User) -> None:
+    """Keep the auth cache in line with user changes (e.g. deactivation)"""
+    authenticated_user_cache.invalidate_user(target.id)
 
 
 class AuthService:
     """Service for authentication operations"""
     
     @staticmethod
-    def create_user(db: Session, user: UserCreate) -> User:
+    async def _hash_or_busy(operation, *args):
+        """Run a password hasher operation, mapping overload to 503"""
+        try:
+            return await operation(*args)
+        except PasswordHasherBusy:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Server is busy, please retry shortly",
+                headers={"Retry-After": "1"}
+            )
+    
+    @staticmethod
+    async def _first_user(db: AsyncSession, *criteria) -> Optional[User]:
+        """First user matching the given criteria, or None"""
+        result = await db.execute(select(User).where(*criteria).limit(1))
+        return result.scalars().first()
+    
+    @staticmethod
+    async def create_user(db: AsyncSession, user: UserCreate) -> User:
         """Create a new user"""
         # Check if username exists
-        if db.query(User).filter(User.username == user.username).first():
+        if await AuthService._first_user(db, User.username == user.username):
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Username already registered"
             )
         
         # Check if email exists
-        if db.query(User).filter(User.email == user.email).first():
+        if await AuthService._first_user(db, User.email == user.email):
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Email already registered"
@@ -32,17 +116,17 @@ class AuthService:
         db_user = User(
             username=user.username,
             email=user.email,
-            hashed_password=get_password_hash(user.password)
+            hashed_password=await AuthService._hash_or_busy(password_hasher.hash, user.password)
         )
         db.add(db_user)
-        db.commit()
-        db.refresh(db_user)
+        await db.commit()
+        await db.refresh(db_user)
         return db_user
     
     @staticmethod
-    def authenticate_user(db: Session, username: str, password: str) -> User:
+    async def authenticate_user(db: AsyncSession, username: str, password: str) -> User:
         """Authenticate user with username and password"""
-        user = db.query(User).filter(User.username == username).first()
+        user = await AuthService._first_user(db, User.username == username)
         
         if not user:
             raise HTTPException(
@@ -50,7 +134,7 @@ class AuthService:
                 detail="Incorrect username or password"
             )
         
-        if not verify_password(password, user.hashed_password):
+        if not await AuthService._hash_or_busy(password_hasher.verify, password, user.hashed_password):
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Incorrect username or password"
@@ -65,9 +149,36 @@ class AuthService:
         return user
     
     @staticmethod
-    def get_user_by_username(db: Session, username: str) -> User:
+    async def get_current_user(db_factory, token: str, username: str, expires_at: Optional[float] = None) -> CurrentUser:
+        """
+        Resolve the user behind a verified token, using the auth cache
+        
+        Args:
+            db_factory: Async session factory (only used on a miss)
+            token: The raw JWT, used as cache key
+            username: Subject of the token
+            expires_at: Token expiry as a UNIX timestamp
+            
+        Returns:
+            Snapshot of the active user
+        """
+        user = authenticated_user_cache.get(token)
+        if user is None:
+            async with db_factory() as db:
+                user = CurrentUser.model_validate(await AuthService.get_user_by_username(db, username))
+            authenticated_user_cache.set(token, user, expires_at)
+        
+        if not user.is_active:
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="User account is inactive"
+            )
+        return user
+    
+    @staticmethod
+    async def get_user_by_username(db: AsyncSession, username: str) -> User:
         """Get user by username"""
-        user = db.query(User).filter(User.username == username).first()
+        user = await AuthService._first_user(db, User.username == username)
         if not user:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
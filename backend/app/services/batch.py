@@ -0,0 +1,323 @@
+"""
+Batch evaluation service for running question sets across models
+"""
+import asyncio
+import uuid
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+import orjson
+from fastapi import HTTPException, status
+from ..core.config import settings
+from ..core.state import StateBackendError, state_backend
+from ..schemas.prompt import BatchJobRequest, BatchJobStatus, BatchResultItem
+from .openrouter import openrouter_service
+from .scheduler import PRIORITY_BATCH
+
+# Terminal job states
+FINISHED_STATES = ("completed", "cancelled", "failed")
+
+
+@dataclass
+class BatchJob:
+    """In-memory state of a batch job"""
+    job_id: str
+    user_id: int
+    system_prompt: str
+    questions: List[str]
+    models: List[str]
+    concurrency: int
+    cache_mode: str = "use"
+    status: str = "pending"
+    completed: int = 0
+    failed: int = 0
+    # One slot per (question, model) in question order, filled as calls finish
+    results: List[Optional[BatchResultItem]] = field(default_factory=list)
+    created_at: datetime = field(default_factory=datetime.utcnow)
+    finished_at: Optional[datetime] = None
+    task: Optional[asyncio.Task] = None
+    watcher: Optional[asyncio.Task] = None
+    
+    @property
+    def total(self) -> int:
+        return len(self.questions) * len(self.models)
+
+
+class BatchJobService:
+    """
+    Service for scheduling (question x model) batch evaluations
+    
+    A job runs on the worker that accepted it. With a shared state backend
+    its progress and results are published there, so any worker can report
+    status, serve downloads and request cancellation (via a flag the owning
+    worker polls). Finished jobs are dropped from memory after
+    STATE_JOB_TTL_SECONDS, when their shared copy expires too.
+    """
+    
+    def __init__(self):
+        self.jobs: Dict[str, BatchJob] = {}
+        self.backend = state_backend if state_backend.shared else None
+        self.ttl = settings.STATE_JOB_TTL_SECONDS
+    
+    async def submit(self, request: BatchJobRequest, user_id: int) -> BatchJob:
+        """
+        Create a batch job and start it in the background
+        
+        Args:
+            request: Batch job request with questions, system prompt and models
+            user_id: ID of the user owning the job
+            
+        Returns:
+            The created BatchJob
+        """
+        if len(request.questions) > settings.BATCH_MAX_QUESTIONS:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Too many questions. Maximum is {settings.BATCH_MAX_QUESTIONS}"
+            )
+        
+        concurrency = min(
+            request.concurrency or settings.BATCH_MAX_CONCURRENCY,
+            settings.BATCH_MAX_CONCURRENCY
+        )
+        job = BatchJob(
+            job_id=str(uuid.uuid4()),
+            user_id=user_id,
+            system_prompt=request.system_prompt,
+            questions=list(request.questions),
+            models=list(request.models),
+            concurrency=concurrency,
+            cache_mode=request.cache_mode
+        )
+        job.results = [None] * job.total
+        self.jobs[job.job_id] = job
+        await self._publish(job)
+        job.task = asyncio.create_task(self._run(job))
+        if self.backend is not None:
+            job.watcher = asyncio.create_task(self._watch_cancel(job))
+        return job
+    
+    async def _run(self, job: BatchJob) -> None:
+        """Run all (question, model) pairs with at most job.concurrency in flight"""
+        job.status = "running"
+        queue: asyncio.Queue = asyncio.Queue()
+        for index, question in enumerate(job.questions):
+            for position, model in enumerate(job.models):
+                queue.put_nowait((index * len(job.models) + position, index, question, model))
+        
+        # Where the system prompt is a provider cache breakpoint, the first
+        # question warms the cache before the rest are sent to that model
+        primed = {
+            model: asyncio.Event()
+            for model in job.models
+            if openrouter_service.prompt_cache_applies(model, job.system_prompt)
+        }
+        
+        async def worker():
+            while True:
+                try:
+                    slot, index, question, model = queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                event = primed.get(model)
+                if event is not None and index > 0:
+                    await event.wait()
+                try:
+                    response = await openrouter_service.call_model(
+                        model=model,
+                        system_prompt=job.system_prompt,
+                        user_message=question,
+                        cache_mode=job.cache_mode,
+                        user_id=job.user_id,
+                        priority=PRIORITY_BATCH
+                    )
+                finally:
+                    if event is not None and index == 0:
+                        event.set()
+                item = BatchResultItem(
+                    question_index=index,
+                    question=question,
+                    response=response
+                )
+                job.results[slot] = item
+                job.completed += 1
+                if response.error:
+                    job.failed += 1
+                await self._publish(job, item, slot)
+        
+        workers = [
+            asyncio.create_task(worker())
+            for _ in range(min(job.concurrency, job.total))
+        ]
+        try:
+            await asyncio.gather(*workers)
+            job.status = "completed"
+        except asyncio.CancelledError:
+            for w in workers:
+                w.cancel()
+            job.status = "cancelled"
+        except Exception as e:
+            for w in workers:
+                w.cancel()
+            print(f"Batch job {job.job_id} failed: {e}")
+            job.status = "failed"
+        finally:
+            job.finished_at = datetime.utcnow()
+            if job.watcher is not None:
+                job.watcher.cancel()
+            asyncio.get_running_loop().call_later(self.ttl, self.jobs.pop, job.job_id, None)
+            await asyncio.shield(self._publish(job))
+    
+    @staticmethod
+    def _key(job_id: str, suffix: str = "") -> str:
+        return f"batch:{job_id}{suffix}"
+    
+    async def _publish(self, job: BatchJob, item: Optional[BatchResultItem] = None, slot: int = 0) -> None:
+        """Write job progress (and a new result) to the shared backend"""
+        if self.backend is None:
+            return
+        meta = {
+            **self.to_status(job, limit=0).model_dump(mode="json", exclude={"results"}),
+            "user_id": job.user_id
+        }
+        try:
+            if item is not None:
+                await self.backend.set(self._key(job.job_id, f":result:{slot}"), item.model_dump_json().encode("utf-8"), ttl=self.ttl)
+            await self.backend.set(self._key(job.job_id), orjson.dumps(meta), ttl=self.ttl)
+        except StateBackendError as e:
+            print(f"Could not publish batch job {job.job_id}: {e}")
+    
+    async def _watch_cancel(self, job: BatchJob) -> None:
+        """Cancel the job when another worker sets its cancel flag"""
+        while job.task is not None and not job.task.done():
+            await asyncio.wait({job.task}, timeout=settings.BATCH_CANCEL_POLL_SECONDS)
+            if job.task.done():
+                return
+            try:
+                if await self.backend.get(self._key(job.job_id, ":cancel")) is not None:
+                    self._cancel_local(job)
+                    return
+            except StateBackendError as e:
+                print(f"Could not check cancellation of batch job {job.job_id}: {e}")
+    
+    def _local_job(self, job_id: str, user_id: int) -> Optional[BatchJob]:
+        job = self.jobs.get(job_id)
+        if job is not None and job.user_id != user_id:
+            self._not_found()
+        return job
+    
+    @staticmethod
+    def _not_found():
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Batch job not found"
+        )
+    
+    async def _shared_meta(self, job_id: str, user_id: int) -> Dict[str, Any]:
+        raw = None
+        if self.backend is not None:
+            try:
+                raw = await self.backend.get(self._key(job_id))
+            except StateBackendError as e:
+                raise HTTPException(
+                    status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                    detail=f"Batch job state unavailable: {e}"
+                )
+        if raw is None:
+            self._not_found()
+        meta = orjson.loads(raw)
+        if meta["user_id"] != user_id:
+            self._not_found()
+        return meta
+    
+    async def get_status(self, job_id: str, user_id: int, offset: int = 0, limit: Optional[int] = None) -> BatchJobStatus:
+        """
+        Status of a job owned by the given user, with a page of its results
+        
+        Jobs running on this worker are read directly; others come from the
+        shared backend.
+        """
+        job = self._local_job(job_id, user_id)
+        if job is not None:
+            return self.to_status(job, offset=offset, limit=limit)
+        
+        meta = await self._shared_meta(job_id, user_id)
+        count = meta["total"]
+        end = count if limit is None else min(count, offset + limit)
+        keys = [self._key(job_id, f":result:{i}") for i in range(offset, end)]
+        try:
+            raw_items = await self.backend.get_many(keys)
+        except StateBackendError as e:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail=f"Batch job state unavailable: {e}"
+            )
+        return BatchJobStatus(
+            **meta,
+            results=[BatchResultItem.model_validate_json(raw) for raw in raw_items if raw is not None]
+        )
+    
+    @staticmethod
+    def _cancel_local(job: BatchJob) -> None:
+        if job.task is not None and not job.task.done():
+            job.task.cancel()
+            if job.status == "pending":
+                # Task never got to run, so _run() won't record the cancellation
+                job.status = "cancelled"
+                job.finished_at = datetime.utcnow()
+    
+    async def cancel(self, job_id: str, user_id: int) -> BatchJobStatus:
+        """Cancel a running job, keeping the results gathered so far"""
+        job = self._local_job(job_id, user_id)
+        if job is not None:
+            self._cancel_local(job)
+            if job.task is not None:
+                # Let _run() record the cancellation so the reply matches other workers'
+                await asyncio.wait({job.task}, timeout=settings.BATCH_CANCEL_POLL_SECONDS)
+            await self._publish(job)
+            return self.to_status(job, limit=0)
+        
+        # Running on another worker: flag it and wait briefly for it to stop
+        meta = await self._shared_meta(job_id, user_id)
+        if meta["status"] not in FINISHED_STATES:
+            try:
+                await self.backend.set(self._key(job_id, ":cancel"), b"1", ttl=self.ttl)
+            except StateBackendError as e:
+                raise HTTPException(
+                    status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                    detail=f"Batch job state unavailable: {e}"
+                )
+            for _ in range(int(4 / settings.BATCH_CANCEL_POLL_SECONDS)):
+                await asyncio.sleep(settings.BATCH_CANCEL_POLL_SECONDS / 2)
+                meta = await self._shared_meta(job_id, user_id)
+                if meta["status"] in FINISHED_STATES:
+                    break
+        return BatchJobStatus(**meta)
+    
+    @staticmethod
+    def to_status(job: BatchJob, offset: int = 0, limit: Optional[int] = None) -> BatchJobStatus:
+        """
+        Build a status snapshot with a page of the results collected so far
+        
+        offset and limit select result slots in question order (all models
+        of question 0, then question 1, ...); slots still running are
+        skipped, so a page of a running job may hold fewer results.
+        """
+        end = None if limit is None else offset + limit
+        return BatchJobStatus(
+            job_id=job.job_id,
+            status=job.status,
+            system_prompt=job.system_prompt,
+            models=job.models,
+            question_count=len(job.questions),
+            total=job.total,
+            completed=job.completed,
+            failed=job.failed,
+            created_at=job.created_at,
+            finished_at=job.finished_at,
+            results=[item for item in job.results[offset:end] if item is not None]
+        )
+
+
+# Create service instance
+batch_job_service = BatchJobService()
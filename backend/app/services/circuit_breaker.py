@@ -0,0 +1,137 @@
+"""
+Per-model circuit breakers for upstream calls
+"""
+import time
+from typing import Any, Callable, Dict, Optional
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """
+    Closed / open / half-open circuit breaker
+    
+    Closed: calls go through; `failure_threshold` consecutive failures open
+    the circuit. Open: calls are rejected until `recovery_timeout` has passed,
+    then the circuit turns half-open. Half-open: up to `half_open_max_calls`
+    probe calls go through; a success closes the circuit, a failure opens it
+    again. A failure threshold of 0 or less disables the breaker.
+    """
+    
+    def __init__(
+        self,
+        failure_threshold: int = 5,
+        recovery_timeout: float = 30.0,
+        half_open_max_calls: int = 1,
+        on_change: Optional[Callable[[str], None]] = None
+    ):
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.half_open_max_calls = max(1, half_open_max_calls)
+        self.on_change = on_change
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probes = 0
+    
+    @property
+    def enabled(self) -> bool:
+        return self.failure_threshold > 0
+    
+    def _transition(self, state: str) -> None:
+        if state == OPEN:
+            self.opened_at = time.monotonic()
+        self.state = state
+        self._probes = 0
+        if self.on_change:
+            self.on_change(state)
+    
+    def retry_after(self) -> float:
+        """Seconds until an open circuit lets a probe through"""
+        if self.state != OPEN:
+            return 0.0
+        return max(0.0, self.opened_at + self.recovery_timeout - time.monotonic())
+    
+    def allow(self) -> bool:
+        """Whether a call may go upstream now (counts half-open probes)"""
+        if not self.enabled:
+            return True
+        if self.state == OPEN:
+            if self.retry_after() > 0:
+                return False
+            self._transition(HALF_OPEN)
+        if self.state == HALF_OPEN:
+            if self._probes >= self.half_open_max_calls:
+                return False
+            self._probes += 1
+        return True
+    
+    def record_success(self) -> None:
+        self.failures = 0
+        if self.state != CLOSED:
+            self._transition(CLOSED)
+    
+    def record_failure(self) -> None:
+        self.failures += 1
+        if self.state == HALF_OPEN or (self.state == CLOSED and self.enabled and self.failures >= self.failure_threshold):
+            self._transition(OPEN)
+    
+    def release(self) -> None:
+        """Give back a half-open probe slot of a call that ended without an outcome"""
+        if self.state == HALF_OPEN and self._probes > 0:
+            self._probes -= 1
+    
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "state": self.state,
+            "failures": self.failures,
+            "retry_after": round(self.retry_after(), 1)
+        }
+
+
+class CircuitBreakerRegistry:
+    """Lazily created circuit breakers, one per model"""
+    
+    def __init__(
+        self,
+        failure_threshold: int = 5,
+        recovery_timeout: float = 30.0,
+        half_open_max_calls: int = 1,
+        on_change: Optional[Callable[[str, str], None]] = None
+    ):
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.half_open_max_calls = half_open_max_calls
+        self.on_change = on_change
+        self._breakers: Dict[str, CircuitBreaker] = {}
+    
+    def get(self, model: str) -> CircuitBreaker:
+        breaker = self._breakers.get(model)
+        if breaker is None:
+            breaker = CircuitBreaker(
+                self.failure_threshold,
+                self.recovery_timeout,
+                self.half_open_max_calls,
+                on_change=(lambda state: self.on_change(model, state)) if self.on_change else None
+            )
+            self._breakers[model] = breaker
+        return breaker
+    
+    def state(self, model: str) -> str:
+        breaker = self._breakers.get(model)
+        if breaker is None:
+            return CLOSED
+        # An open circuit past its recovery timeout will admit a probe
+        if breaker.state == OPEN and breaker.retry_after() == 0:
+            return HALF_OPEN
+        return breaker.state
+    
+    def unhealthy(self) -> Dict[str, Dict[str, Any]]:
+        """Snapshots of all circuits that are not closed"""
+        return {
+            model: {**breaker.snapshot(), "state": self.state(model)}
+            for model, breaker in sorted(self._breakers.items())
+            if breaker.state != CLOSED
+        }
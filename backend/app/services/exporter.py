@@ -0,0 +1,118 @@
+"""
+Streaming serializers for downloading test results
+"""
+import csv
+import io
+import json
+import orjson
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+from ..schemas.prompt import ModelResponse, PromptTestResponse
+
+
+# One exported run: metadata about the prompt/question plus its model responses
+ExportRun = Tuple[Dict[str, Any], List[ModelResponse]]
+
+EXPORT_FORMATS = {
+    "json": "application/json",
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv"
+}
+
+CSV_HEADERS = [
+    "Model", "Response", "Tokens Used", "Prompt Tokens", "Cached Prompt Tokens",
+    "Completion Tokens", "Time Taken (s)", "Cost", "Finish Reason", "Error"
+]
+
+
+def run_from_result(result: PromptTestResponse, model: Optional[str] = None) -> ExportRun:
+    """Turn a stored test result into an export run, optionally for one model"""
+    responses = result.responses
+    if model:
+        responses = [r for r in responses if r.model == model]
+    meta = {
+        "request_id": result.request_id,
+        "system_prompt": result.system_prompt,
+        "question": result.question,
+        "total_time": result.total_time,
+        "timestamp": result.timestamp.isoformat()
+    }
+    return meta, responses
+
+
+def _csv_row(values: List[Any]) -> str:
+    buffer = io.StringIO()
+    csv.writer(buffer).writerow(values)
+    return buffer.getvalue()
+
+
+async def stream_json(runs: AsyncIterator[ExportRun], single: bool = False) -> AsyncIterator[str]:
+    """
+    Serialize runs as JSON one run at a time
+    
+    A single run is written as one object with a "responses" array (the
+    original download shape); several runs are wrapped in {"runs": [...]}.
+    """
+    if not single:
+        yield '{"runs": ['
+    
+    first_run = True
+    async for meta, responses in runs:
+        if not first_run:
+            yield ", "
+        first_run = False
+        
+        head = json.dumps(meta)
+        yield head[:-1] + ', "responses": ['
+        for i, response in enumerate(responses):
+            yield (", " if i else "") + response.model_dump_json()
+        yield "]}"
+    
+    if not single:
+        yield "]}"
+    yield "\n"
+
+
+async def stream_ndjson(runs: AsyncIterator[ExportRun]) -> AsyncIterator[str]:
+    """Serialize one line per model response, carrying its run metadata"""
+    async for meta, responses in runs:
+        for response in responses:
+            yield orjson.dumps({**meta, **response.model_dump()}).decode("utf-8") + "\n"
+
+
+async def stream_csv(runs: AsyncIterator[ExportRun], run_columns: bool = False) -> AsyncIterator[str]:
+    """
+    Serialize one CSV row per model response
+    
+    With run_columns, each row is prefixed by its run metadata (request ID,
+    question), which is needed to tell rows apart in multi-run exports.
+    """
+    prefix_keys: Optional[List[str]] = None
+    header_sent = False
+    
+    async for meta, responses in runs:
+        if not header_sent:
+            if run_columns:
+                prefix_keys = [k for k in meta if k != "system_prompt"]
+            headers = [k.replace("_", " ").title() for k in prefix_keys or []] + CSV_HEADERS
+            yield _csv_row(headers)
+            header_sent = True
+        
+        prefix = [meta.get(k, "") for k in prefix_keys or []]
+        for r in responses:
+            yield _csv_row(prefix + [
+                r.model, r.response, r.tokens_used, r.prompt_tokens,
+                r.cached_prompt_tokens, r.completion_tokens, f"{r.time_taken:.2f}", r.cost or "",
+                r.finish_reason or "", r.error or ""
+            ])
+    
+    if not header_sent:
+        yield _csv_row(CSV_HEADERS)
+
+
+def stream_export(runs: AsyncIterator[ExportRun], format: str, single: bool = False) -> AsyncIterator[str]:
+    """Pick the serializer for a format (one of EXPORT_FORMATS)"""
+    if format == "json":
+        return stream_json(runs, single=single)
+    if format == "ndjson":
+        return stream_ndjson(runs)
+    return stream_csv(runs, run_columns=not single)
@@ -1,13 +1,23 @@
 """
 File handling service for uploading and parsing question files
 """
+import codecs
+import csv
 import json
 import os
-from typing import List
+from typing import Any, AsyncIterator, List, Optional
 from fastapi import UploadFile, HTTPException, status
 from ..core.config import settings
 
 
+# Bytes read from the upload per step; parsing never holds more than this
+# plus one unfinished line/item in memory
+CHUNK_SIZE = 64 * 1024
+
+# Object keys that may hold the question text, in order of preference
+QUESTION_KEYS = ("question", "text", "prompt", "content")
+
+
 class FileHandlerService:
     """Service for handling file uploads and parsing"""
     
@@ -27,62 +37,47 @@ class FileHandlerService:
         """
         Parse questions from uploaded file
         
+        The file is read in chunks and parsed incrementally, and the
+        MAX_UPLOAD_SIZE_MB limit is enforced as the data is read.
+        
         Args:
-            file: Uploaded file (JSON or TXT)
+            file: Uploaded file (JSON, JSONL, CSV or TXT)
             
         Returns:
             List of questions
         """
         FileHandlerService.validate_file(file)
         
-        content = await file.read()
         file_ext = file.filename.split(".")[-1].lower()
         
         try:
             if file_ext == "json":
-                # Parse JSON file
-                data = json.loads(content.decode("utf-8"))
-                
-                # Handle different JSON structures
-                if isinstance(data, list):
-                    # List of strings or objects
-                    questions = []
-                    for item in data:
-                        if isinstance(item, str):
-                            questions.append(item)
-                        elif isinstance(item, dict):
-                            # Try to find question field
-                            question = (
-                                item.get("question") or 
-                                item.get("text") or 
-                                item.get("prompt") or
-                                item.get("content") or
-                                str(item)
-                            )
+                return await FileHandlerService._parse_json(file)
+            
+            elif file_ext == "jsonl":
+                questions = []
+                async for line in FileHandlerService._iter_lines(file):
+                    if line.strip():
+                        question = FileHandlerService._question_from_item(json.loads(line))
+                        if question:
                             questions.append(question)
-                    return questions
-                    
-                elif isinstance(data, dict):
-                    # Dictionary with questions array
-                    if "questions" in data:
-                        return FileHandlerService._extract_questions(data["questions"])
-                    else:
-                        # Convert dict values to questions
-                        return [str(v) for v in data.values()]
-                        
-                else:
-                    raise ValueError("Invalid JSON structure")
-                    
+                return questions
+            
+            elif file_ext == "csv":
+                return await FileHandlerService._parse_csv(file)
+            
             elif file_ext == "txt":
                 # Parse text file - one question per line
-                text = content.decode("utf-8")
-                questions = [
-                    line.strip() 
-                    for line in text.split("\n") 
+                return [
+                    line.strip()
+                    async for line in FileHandlerService._iter_lines(file)
                     if line.strip()
                 ]
-                return questions
+            
+            return []
                 
+        except HTTPException:
+            raise
         except json.JSONDecodeError:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
@@ -94,21 +89,193 @@ class FileHandlerService:
                 detail=f"Error parsing file: {str(e)}"
             )
     
+    @staticmethod
+    async def _iter_chunks(file: UploadFile) -> AsyncIterator[bytes]:
+        """Read the upload in chunks, enforcing the size limit"""
+        max_bytes = settings.MAX_UPLOAD_SIZE_MB * 1024 * 1024
+        total = 0
+        while True:
+            chunk = await file.read(CHUNK_SIZE)
+            if not chunk:
+                return
+            total += len(chunk)
+            if total > max_bytes:
+                raise HTTPException(
+                    status_code=status.HTTP_413_CONTENT_TOO_LARGE,
+                    detail=f"File too large. Maximum size is {settings.MAX_UPLOAD_SIZE_MB} MB"
+                )
+            yield chunk
+    
+    @staticmethod
+    async def _iter_text(file: UploadFile) -> AsyncIterator[str]:
+        """Decode the upload as UTF-8 (BOM tolerated) chunk by chunk"""
+        decoder = codecs.getincrementaldecoder("utf-8-sig")()
+        async for chunk in FileHandlerService._iter_chunks(file):
+            text = decoder.decode(chunk)
+            if text:
+                yield text
+        tail = decoder.decode(b"", final=True)
+        if tail:
+            yield tail
+    
+    @staticmethod
+    async def _iter_lines(file: UploadFile) -> AsyncIterator[str]:
+        """Yield the upload line by line without line endings"""
+        buffer = ""
+        async for text in FileHandlerService._iter_text(file):
+            buffer += text
+            lines = buffer.split("\n")
+            buffer = lines.pop()
+            for line in lines:
+                yield line.rstrip("\r")
+        if buffer:
+            yield buffer.rstrip("\r")
+    
+    @staticmethod
+    async def _parse_csv(file: UploadFile) -> List[str]:
+        """
+        Parse a CSV file record by record
+        
+        Uses the first column whose header is a known question key, or the
+        first column if no header matches (in which case row one is data).
+        """
+        questions = []
+        column: Optional[int] = None
+        record = ""
+        
+        async for line in FileHandlerService._iter_lines(file):
+            record = f"{record}\n{line}" if record else line
+            # A quoted field spanning lines leaves an odd number of quotes
+            if record.count('"') % 2:
+                continue
+            
+            row = next(csv.reader([record]), [])
+            record = ""
+            
+            if column is None:
+                header = [cell.strip().lower() for cell in row]
+                matches = [header.index(key) for key in QUESTION_KEYS if key in header]
+                if matches:
+                    column = matches[0]
+                    continue
+                column = 0
+            
+            if len(row) > column and row[column].strip():
+                questions.append(row[column].strip())
+        
+        return questions
+    
+    @staticmethod
+    async def _parse_json(file: UploadFile) -> List[str]:
+        """
+        Parse a JSON file
+        
+        Top-level arrays are decoded one item at a time. Other documents
+        (e.g. {"questions": [...]}) are read whole, within the size limit.
+        """
+        decoder = json.JSONDecoder()
+        chunks = FileHandlerService._iter_text(file)
+        buffer = ""
+        pos = 0
+        eof = False
+        
+        async def fill() -> bool:
+            nonlocal buffer, pos, eof
+            try:
+                text = await chunks.__anext__()
+            except StopAsyncIteration:
+                eof = True
+                return False
+            # Drop what has been consumed before growing the buffer
+            buffer = buffer[pos:] + text
+            pos = 0
+            return True
+        
+        def skip(chars: str) -> None:
+            nonlocal pos
+            while pos < len(buffer) and buffer[pos] in chars:
+                pos += 1
+        
+        # Find the first significant character
+        while True:
+            skip(" \t\r\n")
+            if pos < len(buffer) or not await fill():
+                break
+        
+        if pos >= len(buffer):
+            raise ValueError("Invalid JSON structure")
+        
+        if buffer[pos] != "[":
+            while await fill():
+                pass
+            data = json.loads(buffer[pos:])
+            if isinstance(data, dict):
+                # Dictionary with questions array
+                if "questions" in data:
+                    return FileHandlerService._extract_questions(data["questions"])
+                # Convert dict values to questions
+                return [str(v) for v in data.values()]
+            raise ValueError("Invalid JSON structure")
+        
+        # Top-level array: decode one item at a time
+        pos += 1
+        questions = []
+        expect_item = True
+        while True:
+            skip(" \t\r\n")
+            if pos >= len(buffer):
+                if not await fill():
+                    raise json.JSONDecodeError("Unterminated array", buffer, pos)
+                continue
+            
+            char = buffer[pos]
+            if char == "]":
+                return questions
+            if char == ",":
+                if expect_item:
+                    raise json.JSONDecodeError("Unexpected ','", buffer, pos)
+                pos += 1
+                expect_item = True
+                continue
+            if not expect_item:
+                raise json.JSONDecodeError("Expecting ',' delimiter", buffer, pos)
+            
+            try:
+                item, end = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                if eof or not await fill():
+                    raise
+                continue
+            if end >= len(buffer) and not eof:
+                # A number could continue in the next chunk; read more first
+                if await fill():
+                    continue
+            
+            pos = end
+            expect_item = False
+            question = FileHandlerService._question_from_item(item)
+            if question:
+                questions.append(question)
+    
+    @staticmethod
+    def _question_from_item(item: Any) -> Optional[str]:
+        """Extract the question text from a string or object item"""
+        if isinstance(item, str):
+            return item
+        if isinstance(item, dict):
+            for key in QUESTION_KEYS:
+                if item.get(key):
+                    return item[key]
+            return str(item)
+        return None
+    
     @staticmethod
     def _extract_questions(items: list) -> List[str]:
         """Helper to extract questions from list items"""
         questions = []
         for item in items:
-            if isinstance(item, str):
-                questions.append(item)
-            elif isinstance(item, dict):
-                question = (
-                    item.get("question") or 
-                    item.get("text") or 
-                    item.get("prompt") or
-                    item.get("content") or
-                    str(item)
-                )
+            question = FileHandlerService._question_from_item(item)
+            if question:
                 questions.append(question)
         return questions
     
@@ -131,10 +298,14 @@ class FileHandlerService:
         unique_filename = f"{uuid.uuid4()}.{file_ext}"
         filepath = os.path.join(settings.UPLOAD_DIR, unique_filename)
         
-        # Save file
-        content = await file.read()
-        with open(filepath, "wb") as f:
-            f.write(content)
+        # Save file in chunks, enforcing the size limit
+        try:
+            with open(filepath, "wb") as f:
+                async for chunk in FileHandlerService._iter_chunks(file):
+                    f.write(chunk)
+        except HTTPException:
+            os.remove(filepath)
+            raise
         
         # Reset file pointer
         await file.seek(0)
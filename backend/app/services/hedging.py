@@ -0,0 +1,64 @@
+"""
+Latency tracking for hedged upstream requests
+"""
+from collections import deque
+from typing import Deque, Dict, Optional
+
+
+class LatencyTracker:
+    """
+    Rolling window of recent successful call latencies per model
+    
+    Used to decide when a call is slow enough to be worth hedging: once a
+    model has `min_samples` observations its hedge delay is the configured
+    quantile of the window, otherwise `default_delay`.
+    """
+    
+    def __init__(
+        self,
+        window: int = 200,
+        min_samples: int = 20,
+        quantile: float = 0.95,
+        default_delay: float = 10.0,
+        min_delay: float = 0.5
+    ):
+        self.window = window
+        self.min_samples = min_samples
+        self.quantile = quantile
+        self.default_delay = default_delay
+        self.min_delay = min_delay
+        self._samples: Dict[str, Deque[float]] = {}
+    
+    def record(self, model: str, latency: float) -> None:
+        samples = self._samples.get(model)
+        if samples is None:
+            samples = deque(maxlen=self.window)
+            self._samples[model] = samples
+        samples.append(latency)
+    
+    def percentile(self, model: str, quantile: Optional[float] = None) -> Optional[float]:
+        """Latency quantile for a model, or None without enough samples"""
+        samples = self._samples.get(model)
+        if not samples or len(samples) < self.min_samples:
+            return None
+        ordered = sorted(samples)
+        q = self.quantile if quantile is None else quantile
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+    
+    def hedge_delay(self, model: str) -> float:
+        """How long to wait for a model before sending a backup request"""
+        observed = self.percentile(model)
+        if observed is None:
+            return self.default_delay
+        return max(self.min_delay, observed)
+
+
+def parse_model_map(value: str) -> Dict[str, str]:
+    """Parse "a/model=b/model,c/model=d/model" into a dict"""
+    mapping = {}
+    for pair in value.split(","):
+        if "=" in pair:
+            source, target = pair.split("=", 1)
+            if source.strip() and target.strip():
+                mapping[source.strip()] = target.strip()
+    return mapping
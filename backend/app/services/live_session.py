@@ -0,0 +1,315 @@
+"""
+Live WebSocket sessions for interactive multi-model comparison
+
+One authenticated connection carries any number of test runs. Each run
+streams every model's tokens as they arrive, and single models can be
+cancelled or regenerated while the others keep going.
+"""
+import asyncio
+import math
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Dict, Optional
+import orjson
+from fastapi import WebSocket, WebSocketDisconnect, status
+from pydantic import ValidationError
+from ..core.config import settings
+from ..core.metrics import LIVE_SESSIONS
+from ..schemas.prompt import ModelResponse, PromptTestRequest, PromptTestResponse
+from ..schemas.user import CurrentUser
+from .admission import Overloaded
+from .openrouter import openrouter_service
+from .response_cache import CACHE_BYPASS, CACHE_REFRESH
+from .results_store import results_store
+
+# Serialized events waiting for the socket; streams pause when it is full
+OUTBOX_SIZE = 1000
+
+# How long queued events may take to reach the client before a policy close
+CLOSE_FLUSH_SECONDS = 5.0
+
+
+@dataclass
+class LiveRun:
+    """One test run within a session"""
+    request_id: str
+    request: PromptTestRequest
+    ref: Any = None  # client-chosen correlation id, echoed in "start"
+    started: float = field(default_factory=time.time)
+    responses: Dict[str, ModelResponse] = field(default_factory=dict)
+    streams: Dict[str, asyncio.Task] = field(default_factory=dict)
+    saved: bool = False
+
+
+def _cancelled_response(model: str, elapsed: float) -> ModelResponse:
+    return ModelResponse(
+        model=model,
+        response="",
+        tokens_used=0,
+        prompt_tokens=0,
+        completion_tokens=0,
+        time_taken=elapsed,
+        finish_reason="cancelled",
+        error="Cancelled by client"
+    )
+
+
+class LiveSession:
+    """
+    Message loop of one authenticated WebSocket connection
+    
+    Client messages are JSON objects with a "type": "test" (the
+    PromptTestRequest fields plus an optional "ref"), "cancel" (request_id
+    and optionally model), "regenerate" (request_id and model) or "ping".
+    The server answers with "start", "token", "done", "regenerate",
+    "summary", "pong" and "error" events, each tagged with its request_id.
+    """
+    
+    def __init__(self, websocket: WebSocket, user: CurrentUser, expires_at: Optional[float] = None):
+        self.websocket = websocket
+        self.user = user
+        self.expires_at = expires_at
+        self.runs: "OrderedDict[str, LiveRun]" = OrderedDict()
+        self.outbox: asyncio.Queue = asyncio.Queue(maxsize=OUTBOX_SIZE)
+        self.closed = False
+    
+    async def serve(self) -> None:
+        """Handle client messages until the connection closes"""
+        LIVE_SESSIONS.inc()
+        sender = asyncio.create_task(self._send_loop())
+        try:
+            await self.emit({"type": "ready", "user": self.user.username})
+            while True:
+                raw = await self.websocket.receive_text()
+                if self.expires_at is not None and time.time() >= self.expires_at:
+                    await self.emit({"type": "error", "detail": "Token expired"})
+                    try:
+                        await asyncio.wait_for(self.outbox.join(), timeout=CLOSE_FLUSH_SECONDS)
+                    except asyncio.TimeoutError:
+                        pass
+                    await self._close(status.WS_1008_POLICY_VIOLATION)
+                    return
+                await self._dispatch(raw)
+        except WebSocketDisconnect:
+            pass
+        finally:
+            for run in self.runs.values():
+                for task in run.streams.values():
+                    task.cancel()
+            sender.cancel()
+            LIVE_SESSIONS.dec()
+    
+    async def emit(self, event: Dict[str, Any]) -> None:
+        if self.closed:
+            return
+        await self.outbox.put(orjson.dumps(event).decode("utf-8"))
+    
+    async def _send_loop(self) -> None:
+        # The only writer, so frames from concurrent streams never interleave
+        while True:
+            message = await self.outbox.get()
+            try:
+                if not self.closed:
+                    await self.websocket.send_text(message)
+            except Exception as e:
+                # Client gone: keep draining (and dropping) events so emit()
+                # and outbox.join() never block, and end the session
+                print(f"Live session of {self.user.username} lost its connection: {e}")
+                await self._close(status.WS_1011_INTERNAL_ERROR)
+            finally:
+                self.outbox.task_done()
+    
+    async def _close(self, code: int) -> None:
+        self.closed = True
+        try:
+            await self.websocket.close(code=code)
+        except Exception:
+            pass  # already closed by the client
+    
+    async def _dispatch(self, raw: str) -> None:
+        try:
+            message = orjson.loads(raw)
+        except orjson.JSONDecodeError:
+            await self.emit({"type": "error", "detail": "Invalid JSON"})
+            return
+        if not isinstance(message, dict):
+            await self.emit({"type": "error", "detail": "Messages must be JSON objects"})
+            return
+        
+        handlers = {
+            "test": self._start_run,
+            "cancel": self._cancel,
+            "regenerate": self._regenerate,
+            "ping": self._ping
+        }
+        handler = handlers.get(message.get("type"))
+        if handler is None:
+            await self.emit({"type": "error", "detail": f"Unknown message type: {message.get('type')}"})
+            return
+        await handler(message)
+    
+    async def _ping(self, message: Dict[str, Any]) -> None:
+        await self.emit({"type": "pong"})
+    
+    def _active_runs(self) -> int:
+        return sum(1 for run in self.runs.values() if run.streams)
+    
+    async def _find_run(self, message: Dict[str, Any]) -> Optional[LiveRun]:
+        run = self.runs.get(message.get("request_id"))
+        if run is None:
+            await self.emit({
+                "type": "error",
+                "request_id": message.get("request_id"),
+                "detail": "Unknown request_id"
+            })
+        return run
+    
+    async def _start_run(self, message: Dict[str, Any]) -> None:
+        ref = message.get("ref")
+        fields = {key: value for key, value in message.items() if key not in ("type", "ref")}
+        try:
+            request = PromptTestRequest.model_validate(fields)
+        except ValidationError as e:
+            await self.emit({
+                "type": "error",
+                "ref": ref,
+                "detail": e.errors(include_url=False, include_context=False)
+            })
+            return
+        if self._active_runs() >= settings.LIVE_MAX_ACTIVE_RUNS:
+            await self.emit({
+                "type": "error",
+                "ref": ref,
+                "detail": f"Too many active runs. Maximum is {settings.LIVE_MAX_ACTIVE_RUNS}"
+            })
+            return
+        try:
+            openrouter_service.admission.check()
+        except Overloaded as e:
+            await self.emit({"type": "error", "ref": ref, "detail": str(e), "retry_after": math.ceil(e.retry_after)})
+            return
+        
+        # Finished runs are kept for regenerating; drop the oldest idle ones
+        for request_id in list(self.runs):
+            if len(self.runs) < settings.LIVE_MAX_RUNS:
+                break
+            if not self.runs[request_id].streams:
+                del self.runs[request_id]
+        
+        run = LiveRun(request_id=str(uuid.uuid4()), request=request, ref=ref)
+        self.runs[run.request_id] = run
+        await self.emit({"type": "start", "request_id": run.request_id, "ref": ref, "models": request.models})
+        for model in request.models:
+            self._launch(run, model, request.cache_mode)
+    
+    def _launch(self, run: LiveRun, model: str, cache_mode: str) -> None:
+        run.streams[model] = asyncio.create_task(self._stream(run, model, cache_mode))
+    
+    async def _stream(self, run: LiveRun, model: str, cache_mode: str) -> None:
+        """Forward one model's tokens, then record its response"""
+        response: Optional[ModelResponse] = None
+        try:
+            async for event in openrouter_service.stream_model(
+                model=model,
+                system_prompt=run.request.system_prompt,
+                user_message=run.request.question,
+                cache_mode=cache_mode,
+                user_id=self.user.id
+            ):
+                if event["type"] == "token":
+                    await self.emit({
+                        "type": "token",
+                        "request_id": run.request_id,
+                        "model": model,
+                        "content": event["content"]
+                    })
+                else:
+                    response = event["response"]
+        finally:
+            # A regenerate may already have replaced this task
+            if run.streams.get(model) is asyncio.current_task():
+                del run.streams[model]
+        if response is not None:
+            await self._finish_model(run, response)
+    
+    async def _finish_model(self, run: LiveRun, response: ModelResponse) -> None:
+        run.responses[response.model] = response
+        await self.emit({
+            "type": "done",
+            "request_id": run.request_id,
+            "model": response.model,
+            "response": response.model_dump(mode="json")
+        })
+        
+        if run.saved:
+            # Regenerated after the run completed: update the stored result
+            await results_store.attach(run.request_id, self.user.id, [response])
+        elif not run.streams and all(model in run.responses for model in run.request.models):
+            await self._complete(run)
+    
+    async def _complete(self, run: LiveRun) -> None:
+        """Store the finished run for history and downloads, then summarize it"""
+        result = PromptTestResponse(
+            request_id=run.request_id,
+            system_prompt=run.request.system_prompt,
+            question=run.request.question,
+            responses=[run.responses[model] for model in run.request.models],
+            total_time=time.time() - run.started,
+            timestamp=datetime.utcnow()
+        )
+        run.saved = True
+        await results_store.save(result, self.user.id)
+        await self.emit({"type": "summary", **result.model_dump(mode="json")})
+    
+    async def _cancel(self, message: Dict[str, Any]) -> None:
+        run = await self._find_run(message)
+        if run is None:
+            return
+        model = message.get("model")
+        if model is not None and model not in run.streams:
+            await self.emit({
+                "type": "error",
+                "request_id": run.request_id,
+                "detail": f"Model {model} is not running"
+            })
+            return
+        
+        for name in [model] if model is not None else list(run.streams):
+            run.streams.pop(name).cancel()
+            cancelled = _cancelled_response(name, time.time() - run.started)
+            if run.saved:
+                # A cancelled regenerate keeps the stored (and local) answer
+                await self.emit({
+                    "type": "done",
+                    "request_id": run.request_id,
+                    "model": name,
+                    "response": cancelled.model_dump(mode="json")
+                })
+            else:
+                await self._finish_model(run, cancelled)
+    
+    async def _regenerate(self, message: Dict[str, Any]) -> None:
+        run = await self._find_run(message)
+        if run is None:
+            return
+        model = message.get("model")
+        if model not in run.request.models:
+            await self.emit({
+                "type": "error",
+                "request_id": run.request_id,
+                "detail": f"Model {model} is not part of this run"
+            })
+            return
+        
+        stream = run.streams.pop(model, None)
+        if stream is not None:
+            stream.cancel()
+        if not run.saved:
+            run.responses.pop(model, None)
+        await self.emit({"type": "regenerate", "request_id": run.request_id, "model": model})
+        # Like the HTTP retry, skip the cached answer (and store the new one
+        # unless the run bypasses the cache)
+        self._launch(run, model, CACHE_BYPASS if run.request.cache_mode == CACHE_BYPASS else CACHE_REFRESH)
@@ -0,0 +1,142 @@
+"""
+Cached, indexed catalog of OpenRouter models
+"""
+import asyncio
+import bisect
+import hashlib
+import json
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+
+class CatalogSnapshot:
+    """Immutable view of the model list with lookup indexes"""
+    
+    def __init__(self, raw_models: List[Dict[str, Any]]):
+        self.raw_models = raw_models
+        self.models: List[Dict[str, Any]] = [
+            {
+                "id": model.get("id"),
+                "name": model.get("name", model.get("id")),
+                "description": model.get("description", ""),
+                "context_length": model.get("context_length") or 0,
+                "pricing": model.get("pricing", {})
+            }
+            for model in raw_models
+            if model.get("id")
+        ]
+        self.fetched_at = time.monotonic()
+        
+        self.by_id: Dict[str, Dict[str, Any]] = {}
+        self.by_provider: Dict[str, List[int]] = {}
+        self._search_text: List[str] = []
+        for index, model in enumerate(self.models):
+            self.by_id[model["id"]] = model
+            self.by_provider.setdefault(self.provider_of(model["id"]), []).append(index)
+            self._search_text.append(f"{model['id']} {model['name']}".lower())
+        
+        # (context_length, index) pairs sorted for range queries
+        self._by_context = sorted(
+            (model["context_length"], index) for index, model in enumerate(self.models)
+        )
+        self._context_keys = [context for context, _ in self._by_context]
+        
+        digest = hashlib.sha1(json.dumps(self.models, sort_keys=True).encode("utf-8"))
+        self.etag = digest.hexdigest()
+    
+    @staticmethod
+    def provider_of(model_id: str) -> str:
+        """Provider prefix of an OpenRouter model id ("openai/gpt-4" -> "openai")"""
+        return model_id.split("/", 1)[0] if "/" in model_id else ""
+    
+    @property
+    def providers(self) -> List[str]:
+        return sorted(p for p in self.by_provider if p)
+    
+    def query(
+        self,
+        search: Optional[str] = None,
+        provider: Optional[str] = None,
+        min_context: Optional[int] = None,
+        max_context: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
+        """Return models matching all given filters, in catalog order"""
+        candidates: Optional[set] = None
+        
+        if provider:
+            candidates = set(self.by_provider.get(provider.lower(), []))
+        
+        if min_context is not None or max_context is not None:
+            lo = 0 if min_context is None else bisect.bisect_left(self._context_keys, min_context)
+            hi = len(self._context_keys) if max_context is None else bisect.bisect_right(self._context_keys, max_context)
+            in_range = {index for _, index in self._by_context[lo:hi]}
+            candidates = in_range if candidates is None else candidates & in_range
+        
+        indexes = range(len(self.models)) if candidates is None else sorted(candidates)
+        
+        if search:
+            needle = search.lower()
+            indexes = [i for i in indexes if needle in self._search_text[i]]
+        
+        return [self.models[i] for i in indexes]
+
+
+class ModelCatalog:
+    """
+    TTL cache around the upstream model list with stale-while-revalidate
+    
+    Fresh snapshots are served directly. Once older than `ttl` the current
+    snapshot is still served while one background refresh runs. Only when
+    there is no snapshot, or it is older than `max_stale`, do callers wait
+    for the upstream fetch. A failed refresh keeps the previous snapshot.
+    """
+    
+    def __init__(
+        self,
+        fetch: Callable[[], Awaitable[List[Dict[str, Any]]]],
+        ttl: float,
+        max_stale: float
+    ):
+        self._fetch = fetch
+        self.ttl = ttl
+        self.max_stale = max_stale
+        self._snapshot: Optional[CatalogSnapshot] = None
+        self._refresh_task: Optional[asyncio.Task] = None
+    
+    async def _refresh(self) -> Optional[CatalogSnapshot]:
+        try:
+            raw_models = await self._fetch()
+        except Exception as e:
+            print(f"Error refreshing model catalog: {e}")
+            return self._snapshot
+        
+        self._snapshot = CatalogSnapshot(raw_models)
+        return self._snapshot
+    
+    def _start_refresh(self) -> asyncio.Task:
+        """Start a refresh unless one is already running (shared by all waiters)"""
+        if self._refresh_task is None or self._refresh_task.done():
+            self._refresh_task = asyncio.create_task(self._refresh())
+        return self._refresh_task
+    
+    async def get(self) -> Optional[CatalogSnapshot]:
+        """Return the current snapshot, refreshing as needed"""
+        snapshot = self._snapshot
+        if snapshot is not None:
+            age = time.monotonic() - snapshot.fetched_at
+            if age < self.ttl:
+                return snapshot
+            if age < self.max_stale:
+                self._start_refresh()
+                return snapshot
+        
+        return await asyncio.shield(self._start_refresh())
+    
+    @property
+    def current(self) -> Optional[CatalogSnapshot]:
+        """The last fetched snapshot, without refreshing"""
+        return self._snapshot
+    
+    def invalidate(self) -> None:
+        """Force the next get() to fetch from upstream"""
+        self._snapshot = None
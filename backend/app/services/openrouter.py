@@ -3,10 +3,57 @@ OpenRouter API service for interacting with multiple LLM models
 """
 import httpx
 import asyncio
+import json
 import time
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, AsyncIterator, Awaitable, Callable, Tuple
 from ..core.config import settings
+from ..core.state import state_backend
+from ..core.metrics import (
+    MODEL_REQUESTS,
+    MODEL_ERRORS,
+    MODEL_RETRIES,
+    MODEL_CACHE_HITS,
+    MODEL_LATENCY,
+    MODEL_PROMPT_TOKENS,
+    MODEL_TTFT,
+    MODEL_TOKENS_PER_SECOND,
+    MODEL_INFLIGHT,
+    MODEL_HEDGES,
+    MODEL_CIRCUIT_STATE
+)
 from ..schemas.prompt import ModelResponse
+from .rate_limiter import RateLimiter, parse_retry_after, backoff_delay
+from .circuit_breaker import CircuitBreaker, CircuitBreakerRegistry, CLOSED, HALF_OPEN, OPEN
+from .hedging import LatencyTracker, parse_model_map
+from .admission import AdmissionController
+from .scheduler import FairScheduler, UsageQuota, QuotaExceeded, PRIORITY_INTERACTIVE, PRIORITY_BATCH
+from .model_catalog import ModelCatalog, CatalogSnapshot
+from .response_cache import response_cache_service, CACHE_USE, CACHE_BYPASS
+
+
+# Error categories that count against a model's circuit breaker
+CIRCUIT_FAILURE_CATEGORIES = {"upstream_5xx", "timeout", "connection", "stream_error"}
+
+# Numeric value of each circuit state for the circuit state gauge
+CIRCUIT_STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+# Metrics label and state key shared by model ids the catalog doesn't list
+OTHER_MODEL = "other"
+
+# Upstream statuses worth retrying: rate limited or transient server errors
+RETRYABLE_STATUS_CODES = {408, 429, 500, 502, 503, 504}
+
+# Transport errors raised before the request reached upstream, so retrying
+# can't duplicate a generation (read timeouts and dropped connections can)
+RETRYABLE_EXCEPTIONS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+
+
+class UpstreamRetryError(Exception):
+    """Raised when an upstream request still fails after all retries"""
+    
+    def __init__(self, message: str, retries: int):
+        super().__init__(message)
+        self.retries = retries
 
 
 class OpenRouterService:
@@ -21,12 +68,257 @@ class OpenRouterService:
             "HTTP-Referer": "http://localhost:8000",
             "X-Title": settings.APP_NAME
         }
+        self._client: Optional[httpx.AsyncClient] = None
+        self.rate_limiter = RateLimiter(
+            global_rate=settings.OPENROUTER_RATE_LIMIT_RPS,
+            global_burst=settings.OPENROUTER_RATE_LIMIT_BURST,
+            model_rate=settings.OPENROUTER_MODEL_RATE_LIMIT_RPS,
+            model_burst=settings.OPENROUTER_MODEL_RATE_LIMIT_BURST,
+            backend=state_backend
+        )
+        self.catalog = ModelCatalog(
+            fetch=self.fetch_models,
+            ttl=settings.MODEL_CATALOG_TTL_SECONDS,
+            max_stale=settings.MODEL_CATALOG_MAX_STALE_SECONDS
+        )
+        self.latency_tracker = LatencyTracker(
+            min_samples=settings.HEDGE_MIN_SAMPLES,
+            quantile=settings.HEDGE_QUANTILE,
+            default_delay=settings.HEDGE_DEFAULT_DELAY_SECONDS,
+            min_delay=settings.HEDGE_MIN_DELAY_SECONDS
+        )
+        self.fallback_models = parse_model_map(settings.HEDGE_FALLBACK_MODELS)
+        self.prompt_cache_models = tuple(
+            prefix.strip() for prefix in settings.PROMPT_CACHE_MODELS.split(",") if prefix.strip()
+        )
+        self.circuit_breakers = CircuitBreakerRegistry(
+            failure_threshold=settings.CIRCUIT_BREAKER_FAILURE_THRESHOLD,
+            recovery_timeout=settings.CIRCUIT_BREAKER_RECOVERY_SECONDS,
+            half_open_max_calls=settings.CIRCUIT_BREAKER_HALF_OPEN_MAX_CALLS,
+            on_change=lambda model, state: MODEL_CIRCUIT_STATE.set(CIRCUIT_STATE_VALUES[state], model=model)
+        )
+        self.scheduler = FairScheduler(
+            max_concurrency=settings.SCHEDULER_MAX_CONCURRENCY,
+            user_max_concurrency=settings.USER_MAX_CONCURRENCY,
+            weights={
+                PRIORITY_INTERACTIVE: settings.SCHEDULER_INTERACTIVE_WEIGHT,
+                PRIORITY_BATCH: settings.SCHEDULER_BATCH_WEIGHT
+            }
+        )
+        self.admission = AdmissionController(
+            scheduler=self.scheduler,
+            adaptive=settings.ADMISSION_ADAPTIVE,
+            min_limit=settings.ADMISSION_MIN_CONCURRENCY,
+            max_limit=settings.SCHEDULER_MAX_CONCURRENCY,
+            max_queue=settings.ADMISSION_MAX_QUEUE,
+            tolerance=settings.ADMISSION_LATENCY_TOLERANCE,
+            backoff=settings.ADMISSION_BACKOFF
+        )
+        self.quotas = UsageQuota(
+            backend=state_backend,
+            token_quota=settings.USER_TOKEN_QUOTA,
+            cost_quota=settings.USER_COST_QUOTA,
+            window=settings.USER_QUOTA_WINDOW_SECONDS
+        )
+        # Upstream calls in flight, keyed like the response cache (single-flight)
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._waiters: Dict[str, int] = {}
+    
+    def _build_client(self) -> httpx.AsyncClient:
+        """Create the pooled HTTP client from connection settings"""
+        http2 = settings.OPENROUTER_HTTP2
+        if http2:
+            try:
+                import h2  # noqa: F401
+            except ImportError:
+                print("HTTP/2 requested but 'h2' is not installed, falling back to HTTP/1.1")
+                http2 = False
+        
+        return httpx.AsyncClient(
+            base_url=self.base_url,
+            headers=self.headers,
+            http2=http2,
+            limits=httpx.Limits(
+                max_connections=settings.OPENROUTER_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.OPENROUTER_MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=settings.OPENROUTER_KEEPALIVE_EXPIRY
+            ),
+            timeout=httpx.Timeout(
+                connect=settings.OPENROUTER_CONNECT_TIMEOUT,
+                read=settings.OPENROUTER_READ_TIMEOUT,
+                write=settings.OPENROUTER_WRITE_TIMEOUT,
+                pool=settings.OPENROUTER_POOL_TIMEOUT
+            )
+        )
+    
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """Shared HTTP client, created on first use if startup() was not called"""
+        if self._client is None or self._client.is_closed:
+            self._client = self._build_client()
+        return self._client
+    
+    async def startup(self) -> None:
+        """Open the shared HTTP client (called on application startup)"""
+        if self._client is None or self._client.is_closed:
+            self._client = self._build_client()
+    
+    async def warm_connections(self, count: int) -> int:
+        """
+        Open up to `count` pooled connections to OpenRouter ahead of traffic
+        
+        Sends concurrent HEAD requests so DNS, TCP and TLS setup happen now
+        rather than on the first user request; any HTTP response counts.
+        
+        Returns:
+            Number of requests that reached the server
+        """
+        async def touch() -> bool:
+            try:
+                await self.client.head("/models")
+                return True
+            except httpx.HTTPError:
+                return False
+        
+        results = await asyncio.gather(*(touch() for _ in range(count)))
+        return sum(results)
+    
+    async def shutdown(self) -> None:
+        """Close the shared HTTP client and its pooled connections"""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+    
+    def prompt_cache_applies(self, model: str, system_prompt: str) -> bool:
+        """
+        Whether to mark the system prompt as a provider prompt-cache breakpoint
+        
+        Only models listed in PROMPT_CACHE_MODELS accept explicit breakpoints
+        (others cache automatically or not at all), and providers ignore
+        prefixes shorter than about 1024 tokens.
+        """
+        return (
+            settings.PROMPT_CACHE_ENABLED
+            and len(system_prompt) >= settings.PROMPT_CACHE_MIN_CHARS
+            and model.startswith(self.prompt_cache_models)
+        )
+    
+    def model_key(self, model: str) -> str:
+        """
+        Metrics label and per-model state key of a model id
+        
+        Model ids come from clients, so ids missing from the catalog share
+        one key: made-up ids can't add metric series, circuit breakers,
+        rate-limit buckets or latency stats without bound. Until the catalog
+        has been fetched once every id is its own key.
+        """
+        snapshot = self.catalog.current
+        if snapshot is None or model in snapshot.by_id:
+            return model
+        return OTHER_MODEL
+    
+    def _build_payload(
+        self,
+        model: str,
+        system_prompt: str,
+        user_message: str,
+        stream: bool = False
+    ) -> Dict[str, Any]:
+        """Build the chat completions request body"""
+        system_content: Any = system_prompt
+        if self.prompt_cache_applies(model, system_prompt):
+            system_content = [
+                {"type": "text", "text": system_prompt, "cache_control": {"type": "ephemeral"}}
+            ]
+        payload = {
+            "model": model,
+            "messages": [
+                {"role": "system", "content": system_content},
+                {"role": "user", "content": user_message}
+            ]
+        }
+        if stream:
+            payload["stream"] = True
+            payload["stream_options"] = {"include_usage": True}
+        return payload
+    
+    async def _send(
+        self,
+        model: str,
+        payload: Dict[str, Any],
+        stream: bool = False
+    ) -> Tuple[httpx.Response, int]:
+        """
+        POST a chat completion with rate limiting and retries
+        
+        429 and transient 5xx responses as well as failures to connect are
+        retried with jittered exponential backoff, waiting at least as long as
+        the provider's Retry-After header asks. Errors after the request was
+        sent (read timeouts, dropped connections) are not retried: the
+        completion isn't idempotent and may already be generating.
+        
+        Args:
+            model: Model identifier, used for the per-model rate limit
+            payload: Request body
+            stream: Return the response unread (caller must close it)
+            
+        Returns:
+            Tuple of (final response, number of retries performed)
+        """
+        max_retries = settings.OPENROUTER_MAX_RETRIES
+        retries = 0
+        key = self.model_key(model)
+        
+        while True:
+            await self.rate_limiter.acquire(key)
+            request = self.client.build_request("POST", "/chat/completions", json=payload)
+            
+            try:
+                response = await self.client.send(request, stream=stream)
+            except RETRYABLE_EXCEPTIONS as e:
+                if retries >= max_retries:
+                    raise UpstreamRetryError(str(e) or type(e).__name__, retries) from e
+                await asyncio.sleep(backoff_delay(
+                    retries,
+                    settings.OPENROUTER_RETRY_BASE_DELAY,
+                    settings.OPENROUTER_RETRY_MAX_DELAY
+                ))
+                retries += 1
+                continue
+            except (httpx.TransportError, httpx.TimeoutException) as e:
+                raise UpstreamRetryError(str(e) or type(e).__name__, retries) from e
+            
+            if response.status_code not in RETRYABLE_STATUS_CODES or retries >= max_retries:
+                return response, retries
+            
+            if stream:
+                await response.aclose()
+            
+            delay = backoff_delay(
+                retries,
+                settings.OPENROUTER_RETRY_BASE_DELAY,
+                settings.OPENROUTER_RETRY_MAX_DELAY
+            )
+            retry_after = parse_retry_after(response.headers.get("Retry-After"))
+            if retry_after is not None:
+                delay = max(delay, min(retry_after, settings.OPENROUTER_RETRY_MAX_DELAY))
+            if response.status_code == 429:
+                # Hold back every caller of this model, not just this one
+                await self.rate_limiter.pause(key, delay)
+            
+            await asyncio.sleep(delay)
+            retries += 1
     
     async def call_model(
         self, 
         model: str, 
         system_prompt: str, 
-        user_message: str
+        user_message: str,
+        cache_mode: str = CACHE_USE,
+        hedge: bool = False,
+        fallback_model: Optional[str] = None,
+        user_id: Optional[int] = None,
+        priority: str = PRIORITY_INTERACTIVE
     ) -> ModelResponse:
         """
         Call a single model with the given prompt
@@ -35,73 +327,499 @@ class OpenRouterService:
             model: Model identifier (e.g., "openai/gpt-4")
             system_prompt: System prompt to set context
             user_message: User message/question
+            cache_mode: "use" the response cache, "refresh" it, or "bypass" it
+            hedge: Send a backup request if the model is slower than its p95
+            fallback_model: Model to use for the backup request (defaults to
+                HEDGE_FALLBACK_MODELS, then to the same model)
+            user_id: User the call is made for (per-user limits and quotas)
+            priority: Scheduler class, "interactive" or "batch"
             
         Returns:
             ModelResponse with the model's response and metadata
         """
         start_time = time.time()
+        cache_key = response_cache_service.make_key(model, system_prompt, user_message)
+        
+        if cache_mode == CACHE_USE:
+            cached = await response_cache_service.get(cache_key)
+            if cached is not None:
+                MODEL_CACHE_HITS.inc(model=self.model_key(model))
+                return cached.model_copy(update={
+                    "cached": True,
+                    "retries": 0,
+                    "time_taken": time.time() - start_time
+                })
+        
+        if user_id is not None:
+            try:
+                await self.quotas.check(user_id)
+            except QuotaExceeded as e:
+                return self._quota_response(model, e)
+        
+        if hedge:
+            response = await self._call_scheduled(user_id, priority, lambda: self._call_hedged(
+                model,
+                system_prompt,
+                user_message,
+                fallback_model or self.fallback_models.get(model)
+            ))
+            # A fallback model's answer must not be cached under this model
+            leader = response.model == model
+        else:
+            # Identical concurrent calls share one upstream request
+            future = self._inflight.get(cache_key)
+            leader = future is None
+            if leader:
+                future = asyncio.ensure_future(self._call_scheduled(
+                    user_id,
+                    priority,
+                    lambda: self._call_upstream(model, system_prompt, user_message)
+                ))
+                self._inflight[cache_key] = future
+                future.add_done_callback(lambda f: self._forget_inflight(cache_key, f))
+            
+            # Shield so one caller going away doesn't cancel the others' request,
+            # but stop the upstream call once nobody is waiting for it
+            self._waiters[cache_key] = self._waiters.get(cache_key, 0) + 1
+            try:
+                response = await asyncio.shield(future)
+            except asyncio.CancelledError:
+                if self._waiters[cache_key] == 1 and not future.done():
+                    self._forget_inflight(cache_key, future)
+                    future.cancel()
+                raise
+            finally:
+                remaining = self._waiters.pop(cache_key) - 1
+                if remaining:
+                    self._waiters[cache_key] = remaining
         
+        if leader and cache_mode != CACHE_BYPASS:
+            await response_cache_service.set(cache_key, response)
+        return response.model_copy(update={"time_taken": time.time() - start_time})
+    
+    async def _call_scheduled(
+        self,
+        user_id: Optional[int],
+        priority: str,
+        call: Callable[[], Awaitable[ModelResponse]]
+    ) -> ModelResponse:
+        """Run an upstream call in a scheduler slot and count it against the user's quota"""
+        async with self.scheduler.slot(user_id, priority):
+            response = await call()
+        if user_id is not None:
+            await self.quotas.record(user_id, response.tokens_used, self._estimate_cost(response))
+        return response
+    
+    def _estimate_cost(self, response: ModelResponse) -> float:
+        """Cost reported upstream, else priced from the model catalog"""
+        if response.cost is not None:
+            return response.cost
+        snapshot = self.catalog.current
+        model = snapshot.by_id.get(response.model) if snapshot is not None else None
+        if model is None:
+            return 0.0
+        pricing = model.get("pricing") or {}
         try:
-            async with httpx.AsyncClient(timeout=120.0) as client:
-                payload = {
-                    "model": model,
-                    "messages": [
-                        {"role": "system", "content": system_prompt},
-                        {"role": "user", "content": user_message}
-                    ]
-                }
-                
-                response = await client.post(
-                    f"{self.base_url}/chat/completions",
-                    headers=self.headers,
-                    json=payload
+            return (
+                response.prompt_tokens * float(pricing.get("prompt") or 0)
+                + response.completion_tokens * float(pricing.get("completion") or 0)
+            )
+        except (TypeError, ValueError):
+            return 0.0
+    
+    @staticmethod
+    def _quota_response(model: str, error: QuotaExceeded) -> ModelResponse:
+        return ModelResponse(
+            model=model,
+            response="",
+            tokens_used=0,
+            prompt_tokens=0,
+            completion_tokens=0,
+            time_taken=0.0,
+            finish_reason="quota",
+            error=f"Quota exceeded: {error}, retry in {error.retry_after:.0f}s"
+        )
+    
+    def _forget_inflight(self, cache_key: str, future: asyncio.Future) -> None:
+        if self._inflight.get(cache_key) is future:
+            del self._inflight[cache_key]
+    
+    async def _call_hedged(
+        self,
+        model: str,
+        system_prompt: str,
+        user_message: str,
+        fallback_model: Optional[str] = None
+    ) -> ModelResponse:
+        """
+        Call a model, racing a backup request once it is slower than usual
+        
+        If the primary call hasn't finished within the model's observed p95
+        latency, a duplicate request (or one to fallback_model) is sent. The
+        first successful response wins and the other request is cancelled.
+        A primary that fails before the deadline is only backed up when a
+        fallback model is configured; retrying the same model is left to
+        the retry logic.
+        
+        Returns:
+            The winning ModelResponse with `attempt` set to "primary",
+            "hedge" or "fallback"
+        """
+        primary = asyncio.ensure_future(self._call_upstream(model, system_prompt, user_message))
+        backup: Optional[asyncio.Future] = None
+        
+        try:
+            key = self.model_key(model)
+            done, _ = await asyncio.wait({primary}, timeout=self.latency_tracker.hedge_delay(key))
+            if done and (not primary.result().error or not fallback_model):
+                return primary.result().model_copy(update={"attempt": "primary"})
+            
+            attempt = "fallback" if fallback_model else "hedge"
+            MODEL_HEDGES.inc(model=key, attempt=attempt)
+            backup = asyncio.ensure_future(
+                self._call_upstream(fallback_model or model, system_prompt, user_message)
+            )
+            
+            labels = {primary: "primary", backup: attempt}
+            pending = {backup} if done else {primary, backup}
+            last: Optional[ModelResponse] = primary.result() if done else None
+            last_label = "primary"
+            
+            while pending:
+                finished, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in finished:
+                    last, last_label = task.result(), labels[task]
+                    if not last.error:
+                        MODEL_HEDGES.inc(model=key, attempt=f"{last_label}_won")
+                        return last.model_copy(update={"attempt": last_label})
+            
+            # Everything failed: report the last error
+            return last.model_copy(update={"attempt": last_label})
+        finally:
+            for task in (primary, backup):
+                if task is not None and not task.done():
+                    task.cancel()
+    
+    async def _call_upstream(
+        self,
+        model: str,
+        system_prompt: str,
+        user_message: str
+    ) -> ModelResponse:
+        """Call the model on OpenRouter, without consulting the response cache"""
+        key = self.model_key(model)
+        breaker = self.circuit_breakers.get(key)
+        if not breaker.allow():
+            result = self._circuit_open_response(model, breaker)
+            self._observe(result, "circuit_open")
+            return result
+        
+        start_time = time.time()
+        retries = 0
+        error_category: Optional[str] = None
+        MODEL_INFLIGHT.inc(model=key)
+        
+        try:
+            payload = self._build_payload(model, system_prompt, user_message)
+            
+            response, retries = await self._send(model, payload)
+            
+            time_taken = time.time() - start_time
+            
+            if response.status_code != 200:
+                error_category = self._status_category(response.status_code)
+                result = ModelResponse(
+                    model=model,
+                    response="",
+                    tokens_used=0,
+                    prompt_tokens=0,
+                    completion_tokens=0,
+                    time_taken=time_taken,
+                    retries=retries,
+                    error=f"API Error: {response.status_code} - {response.text}"
                 )
-                
-                time_taken = time.time() - start_time
-                
-                if response.status_code != 200:
-                    return ModelResponse(
-                        model=model,
-                        response="",
-                        tokens_used=0,
-                        prompt_tokens=0,
-                        completion_tokens=0,
-                        time_taken=time_taken,
-                        error=f"API Error: {response.status_code} - {response.text}"
-                    )
-                
+            else:
                 data = response.json()
                 usage = data.get("usage", {})
                 choice = data.get("choices", [{}])[0]
                 
-                return ModelResponse(
+                result = ModelResponse(
                     model=model,
                     response=choice.get("message", {}).get("content", ""),
-                    tokens_used=usage.get("total_tokens", 0),
-                    prompt_tokens=usage.get("prompt_tokens", 0),
-                    completion_tokens=usage.get("completion_tokens", 0),
+                    **self._usage_fields(usage),
                     time_taken=time_taken,
+                    retries=retries,
                     finish_reason=choice.get("finish_reason"),
                     cost=None  # OpenRouter doesn't always provide cost in response
                 )
-                
+            
         except Exception as e:
             time_taken = time.time() - start_time
-            return ModelResponse(
+            error_category = self._exception_category(e)
+            result = ModelResponse(
                 model=model,
                 response="",
                 tokens_used=0,
                 prompt_tokens=0,
                 completion_tokens=0,
                 time_taken=time_taken,
+                retries=getattr(e, "retries", retries),
                 error=f"Exception: {str(e)}"
             )
+        except asyncio.CancelledError:
+            breaker.release()
+            raise
+        finally:
+            MODEL_INFLIGHT.dec(model=key)
+        
+        self._record_circuit(breaker, error_category)
+        self._observe(result, error_category)
+        return result
+    
+    @staticmethod
+    def _usage_fields(usage: Dict[str, Any]) -> Dict[str, int]:
+        """Token counts from an OpenRouter usage block, including prompt cache reads"""
+        details = usage.get("prompt_tokens_details") or {}
+        return {
+            "tokens_used": usage.get("total_tokens", 0),
+            "prompt_tokens": usage.get("prompt_tokens", 0),
+            "completion_tokens": usage.get("completion_tokens", 0),
+            "cached_prompt_tokens": details.get("cached_tokens") or 0
+        }
+    
+    @staticmethod
+    def _circuit_open_response(model: str, breaker: CircuitBreaker) -> ModelResponse:
+        retry_after = breaker.retry_after()
+        return ModelResponse(
+            model=model,
+            response="",
+            tokens_used=0,
+            prompt_tokens=0,
+            completion_tokens=0,
+            time_taken=0,
+            error=f"Circuit open: {model} is failing upstream, retry in {retry_after:.0f}s"
+        )
+    
+    @staticmethod
+    def _record_circuit(breaker: CircuitBreaker, error_category: Optional[str]) -> None:
+        """Count an upstream outcome; errors that aren't the provider's fault count as success"""
+        if error_category in CIRCUIT_FAILURE_CATEGORIES:
+            breaker.record_failure()
+        else:
+            breaker.record_success()
+    
+    @staticmethod
+    def _status_category(status_code: int) -> str:
+        """Error category of a non-200 upstream status"""
+        if status_code == 429:
+            return "rate_limited"
+        if status_code >= 500:
+            return "upstream_5xx"
+        return "upstream_4xx"
+    
+    @staticmethod
+    def _exception_category(error: Exception) -> str:
+        """Error category of an exception raised while calling upstream"""
+        cause = error.__cause__ if isinstance(error, UpstreamRetryError) else error
+        if isinstance(cause, httpx.TimeoutException):
+            return "timeout"
+        if isinstance(cause, httpx.TransportError):
+            return "connection"
+        return "exception"
+    
+    def _observe(self, response: ModelResponse, error_category: Optional[str]) -> None:
+        """Record metrics for one finished upstream call"""
+        model = self.model_key(response.model)
+        MODEL_REQUESTS.inc(model=model)
+        if response.error:
+            error_category = error_category or "exception"
+        if error_category != "circuit_open":
+            self.admission.record(model, response.time_taken, error_category)
+        if response.retries:
+            MODEL_RETRIES.inc(response.retries, model=model)
+        if response.error:
+            MODEL_ERRORS.inc(model=model, category=error_category)
+            return
+        
+        MODEL_LATENCY.observe(response.time_taken, model=model)
+        self.latency_tracker.record(model, response.time_taken)
+        if response.prompt_tokens:
+            cached = min(response.cached_prompt_tokens, response.prompt_tokens)
+            MODEL_PROMPT_TOKENS.inc(cached, model=model, cache="cached")
+            MODEL_PROMPT_TOKENS.inc(response.prompt_tokens - cached, model=model, cache="uncached")
+        if response.time_to_first_token is not None:
+            MODEL_TTFT.observe(response.time_to_first_token, model=model)
+        generation_time = response.time_taken - (response.time_to_first_token or 0)
+        if response.completion_tokens and generation_time > 0:
+            MODEL_TOKENS_PER_SECOND.observe(response.completion_tokens / generation_time, model=model)
+    
+    async def stream_model(
+        self,
+        model: str,
+        system_prompt: str,
+        user_message: str,
+        cache_mode: str = CACHE_USE,
+        user_id: Optional[int] = None,
+        priority: str = PRIORITY_INTERACTIVE
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Stream a single model's completion token by token
+        
+        Args:
+            model: Model identifier (e.g., "openai/gpt-4")
+            system_prompt: System prompt to set context
+            user_message: User message/question
+            cache_mode: "use" the response cache, "refresh" it, or "bypass" it
+            user_id: User the call is made for (per-user limits and quotas)
+            priority: Scheduler class, "interactive" or "batch"
+            
+        Yields:
+            {"type": "token", "model", "content"} events as tokens arrive, then a
+            final {"type": "done", "model", "response"} event with the assembled
+            ModelResponse
+        """
+        start_time = time.time()
+        cache_key = response_cache_service.make_key(model, system_prompt, user_message)
+        
+        if cache_mode == CACHE_USE:
+            cached = await response_cache_service.get(cache_key)
+            if cached is not None:
+                MODEL_CACHE_HITS.inc(model=self.model_key(model))
+                elapsed = time.time() - start_time
+                if cached.response:
+                    yield {"type": "token", "model": model, "content": cached.response}
+                yield {
+                    "type": "done",
+                    "model": model,
+                    "response": cached.model_copy(update={
+                        "cached": True,
+                        "retries": 0,
+                        "time_taken": elapsed,
+                        "time_to_first_token": elapsed
+                    })
+                }
+                return
+        
+        if user_id is not None:
+            try:
+                await self.quotas.check(user_id)
+            except QuotaExceeded as e:
+                yield {"type": "done", "model": model, "response": self._quota_response(model, e)}
+                return
+        
+        final: Optional[ModelResponse] = None
+        async with self.scheduler.slot(user_id, priority):
+            async for event in self._stream_upstream(model, system_prompt, user_message, start_time):
+                if event["type"] == "done":
+                    final = event["response"]
+                else:
+                    yield event
+        
+        if user_id is not None:
+            await self.quotas.record(user_id, final.tokens_used, self._estimate_cost(final))
+        if cache_mode != CACHE_BYPASS:
+            await response_cache_service.set(cache_key, final)
+        
+        yield {"type": "done", "model": model, "response": final}
+    
+    async def _stream_upstream(
+        self,
+        model: str,
+        system_prompt: str,
+        user_message: str,
+        start_time: float
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """Stream from OpenRouter, without consulting the response cache (events as stream_model)"""
+        key = self.model_key(model)
+        breaker = self.circuit_breakers.get(key)
+        if not breaker.allow():
+            final = self._circuit_open_response(model, breaker)
+            self._observe(final, "circuit_open")
+            yield {"type": "done", "model": model, "response": final}
+            return
+        
+        first_token_time: Optional[float] = None
+        chunks: List[str] = []
+        usage: Dict[str, Any] = {}
+        finish_reason: Optional[str] = None
+        error: Optional[str] = None
+        error_category: Optional[str] = None
+        retries = 0
+        MODEL_INFLIGHT.inc(model=key)
+        
+        try:
+            payload = self._build_payload(model, system_prompt, user_message, stream=True)
+            response, retries = await self._send(model, payload, stream=True)
+            
+            try:
+                if response.status_code != 200:
+                    error_category = self._status_category(response.status_code)
+                    body = await response.aread()
+                    error = f"API Error: {response.status_code} - {body.decode('utf-8', 'replace')}"
+                else:
+                    async for line in response.aiter_lines():
+                        # SSE: skip keep-alive comments and blank separators
+                        if not line.startswith("data:"):
+                            continue
+                        data = line[len("data:"):].strip()
+                        if data == "[DONE]":
+                            break
+                        
+                        chunk = json.loads(data)
+                        if "error" in chunk:
+                            error_category = "stream_error"
+                            error = f"API Error: {chunk['error']}"
+                            break
+                        if chunk.get("usage"):
+                            usage = chunk["usage"]
+                        
+                        for choice in chunk.get("choices", []):
+                            content = (choice.get("delta") or {}).get("content")
+                            if content:
+                                if first_token_time is None:
+                                    first_token_time = time.time() - start_time
+                                chunks.append(content)
+                                yield {"type": "token", "model": model, "content": content}
+                            if choice.get("finish_reason"):
+                                finish_reason = choice["finish_reason"]
+            finally:
+                await response.aclose()
+                
+        except Exception as e:
+            retries = getattr(e, "retries", retries)
+            error_category = self._exception_category(e)
+            error = f"Exception: {str(e)}"
+        except BaseException:
+            # Cancelled or closed by the consumer before finishing
+            breaker.release()
+            raise
+        finally:
+            MODEL_INFLIGHT.dec(model=key)
+        
+        self._record_circuit(breaker, error_category)
+        final = ModelResponse(
+            model=model,
+            response="".join(chunks),
+            **self._usage_fields(usage),
+            time_taken=time.time() - start_time,
+            time_to_first_token=first_token_time,
+            retries=retries,
+            finish_reason=finish_reason,
+            error=error
+        )
+        self._observe(final, error_category)
+        yield {"type": "done", "model": model, "response": final}
     
     async def call_models_parallel(
         self,
         models: List[str],
         system_prompt: str,
-        user_message: str
+        user_message: str,
+        cache_mode: str = CACHE_USE,
+        hedge: bool = False,
+        fallback_models: Optional[Dict[str, str]] = None,
+        user_id: Optional[int] = None,
+        priority: str = PRIORITY_INTERACTIVE
     ) -> List[ModelResponse]:
         """
         Call multiple models in parallel
@@ -110,40 +828,117 @@ class OpenRouterService:
             models: List of model identifiers
             system_prompt: System prompt to set context
             user_message: User message/question
+            cache_mode: "use" the response cache, "refresh" it, or "bypass" it
+            hedge: Hedge slow calls with a backup request
+            fallback_models: Per-model fallback used for hedged requests
+            user_id: User the calls are made for (per-user limits and quotas)
+            priority: Scheduler class, "interactive" or "batch"
             
         Returns:
             List of ModelResponse objects
         """
+        fallback_models = fallback_models or {}
         tasks = [
-            self.call_model(model, system_prompt, user_message)
+            self.call_model(
+                model,
+                system_prompt,
+                user_message,
+                cache_mode,
+                hedge=hedge,
+                fallback_model=fallback_models.get(model),
+                user_id=user_id,
+                priority=priority
+            )
             for model in models
         ]
         
         responses = await asyncio.gather(*tasks)
         return list(responses)
     
+    async def call_models_until(
+        self,
+        models: List[str],
+        system_prompt: str,
+        user_message: str,
+        deadline: float,
+        cache_mode: str = CACHE_USE,
+        hedge: bool = False,
+        fallback_models: Optional[Dict[str, str]] = None,
+        user_id: Optional[int] = None,
+        priority: str = PRIORITY_INTERACTIVE
+    ) -> Tuple[List[ModelResponse], Dict[str, asyncio.Task]]:
+        """
+        Call multiple models in parallel, returning once a deadline passes
+        
+        Args:
+            models: List of model identifiers
+            system_prompt: System prompt to set context
+            user_message: User message/question
+            deadline: Seconds to wait for the models
+            cache_mode: "use" the response cache, "refresh" it, or "bypass" it
+            hedge: Hedge slow calls with a backup request
+            fallback_models: Per-model fallback used for hedged requests
+            user_id: User the calls are made for (per-user limits and quotas)
+            priority: Scheduler class, "interactive" or "batch"
+            
+        Returns:
+            Responses of the models that finished in time (in request order)
+            and the still running tasks of the others, keyed by model. The
+            caller owns those tasks and must await or cancel them.
+        """
+        fallback_models = fallback_models or {}
+        tasks = {
+            model: asyncio.ensure_future(self.call_model(
+                model,
+                system_prompt,
+                user_message,
+                cache_mode,
+                hedge=hedge,
+                fallback_model=fallback_models.get(model),
+                user_id=user_id,
+                priority=priority
+            ))
+            for model in dict.fromkeys(models)
+        }
+        
+        try:
+            await asyncio.wait(tasks.values(), timeout=deadline)
+        except asyncio.CancelledError:
+            for task in tasks.values():
+                task.cancel()
+            raise
+        
+        responses = [task.result() for task in tasks.values() if task.done()]
+        pending = {model: task for model, task in tasks.items() if not task.done()}
+        return responses, pending
+    
+    async def fetch_models(self) -> List[Dict[str, Any]]:
+        """
+        Fetch the model list from OpenRouter, bypassing the catalog cache
+        
+        Returns:
+            List of available models with their metadata
+            
+        Raises:
+            httpx.HTTPError: If the request fails or returns a non-200 status
+        """
+        response = await self.client.get("/models", timeout=30.0)
+        response.raise_for_status()
+        return response.json().get("data", [])
+    
+    async def get_model_catalog(self) -> Optional[CatalogSnapshot]:
+        """Get the cached, indexed model catalog (None if it was never fetched)"""
+        return await self.catalog.get()
+    
     async def get_available_models(self) -> List[Dict[str, Any]]:
         """
-        Fetch available models from OpenRouter
+        Get available models from the cached catalog
         
         Returns:
             List of available models with their metadata
         """
-        try:
-            async with httpx.AsyncClient(timeout=30.0) as client:
-                response = await client.get(
-                    f"{self.base_url}/models",
-                    headers=self.headers
-                )
-                
-                if response.status_code == 200:
-                    data = response.json()
-                    return data.get("data", [])
-                return []
-                
-        except Exception as e:
-            print(f"Error fetching models: {e}")
-            return []
+        snapshot = await self.catalog.get()
+        return snapshot.raw_models if snapshot is not None else []
 
 
 # Create service instance
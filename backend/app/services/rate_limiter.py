@@ -0,0 +1,186 @@
+"""
+Token-bucket rate limiting and retry backoff helpers for upstream calls
+"""
+import asyncio
+import random
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Dict, Optional, Union
+from ..core.state import StateBackend, StateBackendError
+
+
+class TokenBucket:
+    """
+    Async token bucket
+    
+    Refills at `rate` tokens per second up to `capacity`. A rate of 0 or less
+    disables limiting. pause() blocks all acquirers until a deadline, which is
+    used when the provider tells us to back off with Retry-After.
+    """
+    
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self.rate = rate
+        self.capacity = capacity if capacity and capacity > 0 else max(rate, 1.0)
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+        self.paused_until = 0.0
+        self._lock = asyncio.Lock()
+    
+    @property
+    def enabled(self) -> bool:
+        return self.rate > 0
+    
+    def _refill(self, now: float) -> None:
+        elapsed = now - self.updated_at
+        self.tokens = min(self.capacity, self.tokens + elapsed * self.rate)
+        self.updated_at = now
+    
+    async def acquire(self) -> None:
+        """Wait until a token is available and take it"""
+        if not self.enabled:
+            return
+        
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self.paused_until:
+                    await asyncio.sleep(self.paused_until - now)
+                    continue
+                
+                self._refill(now)
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+    
+    async def pause(self, seconds: float) -> None:
+        """Stop handing out tokens for the given number of seconds"""
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+
+class SharedTokenBucket:
+    """
+    Rate limit shared by all workers through a StateBackend
+    
+    Approximates a token bucket with fixed windows of `capacity / rate`
+    seconds that each admit `capacity` calls, counted in the backend. A
+    pause is stored as a deadline key every worker checks before acquiring.
+    If the backend is unavailable calls are let through rather than failed.
+    """
+    
+    def __init__(self, backend: StateBackend, key: str, rate: float, capacity: Optional[float] = None):
+        self.backend = backend
+        self.key = key
+        self.rate = rate
+        self.capacity = capacity if capacity and capacity > 0 else max(rate, 1.0)
+        self.window = self.capacity / rate if rate > 0 else 0.0
+    
+    @property
+    def enabled(self) -> bool:
+        return self.rate > 0
+    
+    async def acquire(self) -> None:
+        """Wait until the current window has room and count this call"""
+        if not self.enabled:
+            return
+        
+        while True:
+            try:
+                paused = await self.backend.get(f"{self.key}:pause")
+                now = time.time()
+                if paused is not None and float(paused) > now:
+                    await asyncio.sleep(float(paused) - now)
+                    continue
+                
+                window = int(now // self.window)
+                count = await self.backend.incr(f"{self.key}:{window}", ttl=self.window * 2)
+            except StateBackendError as e:
+                print(f"Shared rate limit unavailable, not limiting: {e}")
+                return
+            if count <= self.capacity:
+                return
+            # Jitter so waiting workers don't all retry at the window edge
+            await asyncio.sleep((window + 1) * self.window - now + random.uniform(0, self.window / 10))
+    
+    async def pause(self, seconds: float) -> None:
+        """Stop all workers from acquiring for the given number of seconds"""
+        until = time.time() + seconds
+        try:
+            paused = await self.backend.get(f"{self.key}:pause")
+            if paused is None or float(paused) < until:
+                await self.backend.set(f"{self.key}:pause", str(until).encode(), ttl=seconds)
+        except StateBackendError as e:
+            print(f"Shared rate limit unavailable, not pausing: {e}")
+
+
+Bucket = Union[TokenBucket, SharedTokenBucket]
+
+
+class RateLimiter:
+    """
+    Global token bucket plus one bucket per model
+    
+    With a shared state backend the limits apply to all workers together,
+    otherwise to this process.
+    """
+    
+    def __init__(
+        self,
+        global_rate: float,
+        global_burst: float,
+        model_rate: float,
+        model_burst: float,
+        backend: Optional[StateBackend] = None
+    ):
+        self.backend = backend if backend is not None and backend.shared else None
+        self.global_bucket = self._bucket("global", global_rate, global_burst)
+        self.model_rate = model_rate
+        self.model_burst = model_burst
+        self.model_buckets: Dict[str, Bucket] = {}
+    
+    def _bucket(self, name: str, rate: float, capacity: float) -> Bucket:
+        if self.backend is not None:
+            return SharedTokenBucket(self.backend, f"ratelimit:{name}", rate, capacity)
+        return TokenBucket(rate, capacity)
+    
+    def _model_bucket(self, model: str) -> Bucket:
+        bucket = self.model_buckets.get(model)
+        if bucket is None:
+            bucket = self._bucket(f"model:{model}", self.model_rate, self.model_burst)
+            self.model_buckets[model] = bucket
+        return bucket
+    
+    async def acquire(self, model: str) -> None:
+        """Wait for both the per-model and the global bucket"""
+        await self._model_bucket(model).acquire()
+        await self.global_bucket.acquire()
+    
+    async def pause(self, model: str, seconds: float) -> None:
+        """Back off calls to a model after the provider rate-limited it"""
+        await self._model_bucket(model).pause(seconds)
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Parse a Retry-After header (delta-seconds or HTTP date) into seconds"""
+    if not value:
+        return None
+    
+    value = value.strip()
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+
+
+def backoff_delay(attempt: int, base: float, cap: float) -> float:
+    """Exponential backoff with full jitter for the given (0-based) retry attempt"""
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
@@ -0,0 +1,105 @@
+"""
+Content-addressed cache for model responses
+"""
+import hashlib
+import json
+from datetime import datetime, timedelta
+from typing import Optional
+from sqlalchemy import delete
+from ..core.config import settings
+from ..core.state import StateCache, state_backend
+from ..core.database import AsyncSessionLocal, SessionLocal
+from ..models.response_cache import CachedResponse
+from ..schemas.prompt import ModelResponse
+
+
+# Cache modes accepted per request
+CACHE_USE = "use"          # read and write the cache
+CACHE_REFRESH = "refresh"  # skip reading, store the fresh response
+CACHE_BYPASS = "bypass"    # neither read nor write
+
+
+class ResponseCacheService:
+    """
+    Two-tier cache of successful model responses
+    
+    A hot tier (a per-process LRU, or the shared state backend) sits in front
+    of the `response_cache` table. Entries are keyed by a hash of (model,
+    system prompt, user message).
+    """
+    
+    def __init__(self):
+        self.enabled = settings.RESPONSE_CACHE_ENABLED
+        self.ttl = settings.RESPONSE_CACHE_TTL_SECONDS
+        self.memory: StateCache[ModelResponse] = StateCache(
+            state_backend,
+            "response",
+            encode=lambda response: response.model_dump_json().encode("utf-8"),
+            decode=ModelResponse.model_validate_json,
+            max_entries=settings.RESPONSE_CACHE_MAX_ENTRIES,
+            ttl=min(self.ttl, settings.STATE_CACHE_TTL_SECONDS) if state_backend.shared else self.ttl
+        )
+    
+    @staticmethod
+    def make_key(model: str, system_prompt: str, user_message: str) -> str:
+        """Hash the request content into a cache key"""
+        raw = json.dumps([model, system_prompt, user_message], ensure_ascii=False)
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+    
+    async def get(self, key: str) -> Optional[ModelResponse]:
+        """Look up a response, promoting durable hits into memory"""
+        if not self.enabled:
+            return None
+        
+        response = await self.memory.get(key)
+        if response is not None:
+            return response
+        
+        response = await self._db_get(key)
+        if response is not None:
+            await self.memory.set(key, response)
+        return response
+    
+    async def set(self, key: str, response: ModelResponse) -> None:
+        """Store a successful response in both tiers"""
+        if not self.enabled or response.error:
+            return
+        
+        await self.memory.set(key, response)
+        await self._db_set(key, response)
+    
+    async def _db_get(self, key: str) -> Optional[ModelResponse]:
+        async with AsyncSessionLocal() as db:
+            row = await db.get(CachedResponse, key)
+            if row is None:
+                return None
+            if row.expires_at <= datetime.utcnow():
+                await db.delete(row)
+                await db.commit()
+                return None
+            return ModelResponse.model_validate_json(row.response_json)
+    
+    async def _db_set(self, key: str, response: ModelResponse) -> None:
+        async with AsyncSessionLocal() as db:
+            now = datetime.utcnow()
+            await db.merge(CachedResponse(
+                key=key,
+                model=response.model,
+                response_json=response.model_dump_json(),
+                created_at=now,
+                expires_at=now + timedelta(seconds=self.ttl)
+            ))
+            await db.commit()
+    
+    def purge_expired(self) -> int:
+        """Delete expired rows from the durable tier"""
+        with SessionLocal() as db:
+            result = db.execute(
+                delete(CachedResponse).where(CachedResponse.expires_at <= datetime.utcnow())
+            )
+            db.commit()
+            return result.rowcount
+
+
+# Create service instance
+response_cache_service = ResponseCacheService()
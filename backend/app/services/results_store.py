@@ -0,0 +1,164 @@
+"""
+Store for prompt test results, shared across workers
+"""
+import asyncio
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy import delete, select
+from ..core.config import settings
+from ..core.state import StateCache, state_backend
+from ..core.database import AsyncSessionLocal, SessionLocal
+from ..models.stored_result import StoredResult
+from ..schemas.prompt import ModelResponse, PromptTestResponse
+
+
+def _encode_owned(item: Tuple[int, PromptTestResponse]) -> bytes:
+    user_id, result = item
+    return f"{user_id}\n{result.model_dump_json()}".encode("utf-8")
+
+
+def _decode_owned(raw: bytes) -> Tuple[int, PromptTestResponse]:
+    user_id, _, result_json = raw.partition(b"\n")
+    return int(user_id), PromptTestResponse.model_validate_json(result_json)
+
+
+class ResultsStore:
+    """
+    Two-tier store of PromptTestResponse objects owned by users
+    
+    A hot tier serves recent results: a bounded per-process LRU, or the
+    shared state backend so all workers see updates (e.g. late responses of
+    deadline-bounded tests). Every result is also written to the
+    `test_results` table, so any worker can serve a download and results
+    survive restarts until their retention expires.
+    """
+    
+    def __init__(self):
+        self.retention = timedelta(days=settings.RESULTS_RETENTION_DAYS)
+        self.memory: StateCache[Tuple[int, PromptTestResponse]] = StateCache(
+            state_backend,
+            "result",
+            encode=_encode_owned,
+            decode=_decode_owned,
+            max_entries=settings.RESULTS_CACHE_MAX_ENTRIES,
+            ttl=settings.STATE_CACHE_TTL_SECONDS if state_backend.shared else self.retention.total_seconds()
+        )
+        # Per-request locks of attach() with their number of holders and waiters
+        self._attach_locks: Dict[str, Tuple[asyncio.Lock, int]] = {}
+    
+    async def save(self, result: PromptTestResponse, user_id: int) -> None:
+        """Store (or replace) a result owned by the given user"""
+        await self.memory.set(result.request_id, (user_id, result))
+        await self._db_save(result, user_id)
+    
+    async def get(self, request_id: str, user_id: int) -> Optional[PromptTestResponse]:
+        """Get a result if it exists and belongs to the given user"""
+        item = await self.memory.get(request_id)
+        if item is None:
+            item = await self._db_get(request_id)
+            if item is None:
+                return None
+            await self.memory.set(request_id, item)
+        
+        owner_id, result = item
+        return result if owner_id == user_id else None
+    
+    async def attach(self, request_id: str, user_id: int, responses: List[ModelResponse]) -> Optional[PromptTestResponse]:
+        """
+        Add late or regenerated model responses to a stored result
+        
+        A response replaces any earlier one from the same model; finished
+        models are cleared from pending_models. Attaches to one result are
+        serialized so concurrent ones don't overwrite each other; they all
+        come from the worker that ran the test, so a per-process lock is
+        enough even with a shared backend.
+        """
+        lock, users = self._attach_locks.get(request_id, (asyncio.Lock(), 0))
+        self._attach_locks[request_id] = (lock, users + 1)
+        try:
+            async with lock:
+                return await self._attach(request_id, user_id, responses)
+        finally:
+            lock, users = self._attach_locks[request_id]
+            if users > 1:
+                self._attach_locks[request_id] = (lock, users - 1)
+            else:
+                del self._attach_locks[request_id]
+    
+    async def _attach(self, request_id: str, user_id: int, responses: List[ModelResponse]) -> Optional[PromptTestResponse]:
+        result = await self.get(request_id, user_id)
+        if result is None:
+            return None
+        
+        finished = {response.model: response for response in responses}
+        updated = [finished.get(response.model, response) for response in result.responses]
+        replaced = {response.model for response in result.responses}
+        result = result.model_copy(update={
+            "responses": updated + [response for response in responses if response.model not in replaced],
+            "pending_models": [model for model in result.pending_models if model not in finished]
+        })
+        await self.save(result, user_id)
+        return result
+    
+    async def list_for_user(self, user_id: int, offset: int = 0, limit: int = 20) -> List[PromptTestResponse]:
+        """Most recent results of a user, newest first"""
+        return await self._db_list(user_id, offset, limit)
+    
+    async def owned_ids(self, request_ids: List[str], user_id: int) -> List[str]:
+        """Subset of request_ids that exist and belong to the user, in input order"""
+        found = set(await self._db_owned_ids(request_ids, user_id))
+        return [request_id for request_id in request_ids if request_id in found]
+    
+    async def _db_owned_ids(self, request_ids: List[str], user_id: int) -> List[str]:
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(
+                select(StoredResult.request_id).where(
+                    StoredResult.request_id.in_(request_ids),
+                    StoredResult.user_id == user_id,
+                    StoredResult.expires_at > datetime.utcnow()
+                )
+            )
+            return list(result.scalars())
+    
+    async def _db_save(self, result: PromptTestResponse, user_id: int) -> None:
+        async with AsyncSessionLocal() as db:
+            now = datetime.utcnow()
+            await db.merge(StoredResult(
+                request_id=result.request_id,
+                user_id=user_id,
+                result_json=result.model_dump_json(),
+                created_at=now,
+                expires_at=now + self.retention
+            ))
+            await db.commit()
+    
+    async def _db_get(self, request_id: str) -> Optional[Tuple[int, PromptTestResponse]]:
+        async with AsyncSessionLocal() as db:
+            row = await db.get(StoredResult, request_id)
+            if row is None or row.expires_at <= datetime.utcnow():
+                return None
+            return row.user_id, PromptTestResponse.model_validate_json(row.result_json)
+    
+    async def _db_list(self, user_id: int, offset: int, limit: int) -> List[PromptTestResponse]:
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(
+                select(StoredResult)
+                .where(StoredResult.user_id == user_id, StoredResult.expires_at > datetime.utcnow())
+                .order_by(StoredResult.created_at.desc())
+                .offset(offset)
+                .limit(limit)
+            )
+            return [PromptTestResponse.model_validate_json(row.result_json) for row in result.scalars()]
+    
+    def purge_expired(self) -> int:
+        """Delete results past their retention"""
+        with SessionLocal() as db:
+            result = db.execute(
+                delete(StoredResult).where(StoredResult.expires_at <= datetime.utcnow())
+            )
+            db.commit()
+            return result.rowcount
+
+
+# Create store instance
+results_store = ResultsStore()
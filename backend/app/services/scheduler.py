@@ -0,0 +1,234 @@
+"""
+Fair-share scheduling and per-user quotas for upstream model calls
+
+Every upstream call takes a slot from the FairScheduler first. Slots are
+capped globally and per user; when none is free, callers queue by priority
+class. Classes share the slots by weighted fair queuing (stride scheduling)
+and users within a class take turns, so one user's large fan-out can't push
+everyone else's interactive tests into timeouts.
+"""
+import asyncio
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Deque, Dict, Hashable, Optional, Tuple
+from ..core.metrics import QUOTA_REJECTIONS, SCHEDULER_ACTIVE, SCHEDULER_QUEUE_DEPTH, SCHEDULER_WAIT
+from ..core.state import StateBackend, StateBackendError
+
+PRIORITY_INTERACTIVE = "interactive"
+PRIORITY_BATCH = "batch"
+
+# Cost is counted in millionths of a dollar so the backend can INCR it
+MICRODOLLARS = 1_000_000
+
+
+class _PriorityClass:
+    """Waiters of one priority class, queued per user"""
+    
+    def __init__(self, name: str, weight: float):
+        self.name = name
+        self.weight = weight
+        self.pass_value = 0.0
+        self.waiting: "OrderedDict[Hashable, Deque[asyncio.Future]]" = OrderedDict()
+        self.depth = 0
+        self.active = 0
+
+
+class FairScheduler:
+    """
+    Concurrency slots shared fairly between priority classes and users
+    
+    Each admission advances the chosen class's pass by 1/weight and the class
+    with the lowest pass goes next, so with weights 4:1 interactive calls get
+    four slots for every batch call while both are queued, and an idle class
+    gets its share back as soon as it has work. Within a class, users with
+    queued calls are served round-robin, skipping any at their own limit.
+    """
+    
+    def __init__(self, max_concurrency: int, user_max_concurrency: int, weights: Dict[str, float]):
+        """
+        Args:
+            max_concurrency: Slots across all users (0 = unlimited)
+            user_max_concurrency: Slots per user (0 = unlimited)
+            weights: Relative share of each priority class
+        """
+        self.limit = max_concurrency
+        self.user_limit = user_max_concurrency
+        self.classes = {name: _PriorityClass(name, weight) for name, weight in weights.items()}
+        self.active = 0
+        self._user_active: Dict[Hashable, int] = {}
+        self._virtual_time = 0.0
+    
+    def queue_depth(self, priority: Optional[str] = None) -> int:
+        """Calls waiting for a slot, in one class or all of them"""
+        if priority is not None:
+            return self.classes[priority].depth
+        return sum(cls.depth for cls in self.classes.values())
+    
+    def set_limit(self, limit: int) -> None:
+        """Change the global limit; calls above a lowered limit finish normally"""
+        self.limit = limit
+        self._dispatch()
+    
+    @asynccontextmanager
+    async def slot(self, user_id: Optional[Hashable], priority: str = PRIORITY_INTERACTIVE) -> AsyncIterator[None]:
+        """Hold a slot for the duration of the block"""
+        await self.acquire(user_id, priority)
+        try:
+            yield
+        finally:
+            self.release(user_id, priority)
+    
+    async def acquire(self, user_id: Optional[Hashable], priority: str = PRIORITY_INTERACTIVE) -> None:
+        """Wait for a slot (user_id None is only subject to the global limit)"""
+        cls = self.classes[priority]
+        future = asyncio.get_running_loop().create_future()
+        if not cls.depth:
+            # No credit for time spent idle
+            cls.pass_value = max(cls.pass_value, self._virtual_time)
+        cls.waiting.setdefault(user_id, deque()).append(future)
+        cls.depth += 1
+        self._dispatch()
+        if future.done():
+            return
+        
+        SCHEDULER_QUEUE_DEPTH.set(cls.depth, priority=priority)
+        start = time.monotonic()
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # Granted just before the cancellation landed
+                self.release(user_id, priority)
+            else:
+                self._discard(cls, user_id, future)
+            raise
+        SCHEDULER_WAIT.observe(time.monotonic() - start, priority=priority)
+    
+    def release(self, user_id: Optional[Hashable], priority: str = PRIORITY_INTERACTIVE) -> None:
+        """Return a slot and admit the next waiters"""
+        cls = self.classes[priority]
+        self.active -= 1
+        cls.active -= 1
+        SCHEDULER_ACTIVE.set(cls.active, priority=priority)
+        if user_id is not None:
+            remaining = self._user_active.pop(user_id) - 1
+            if remaining:
+                self._user_active[user_id] = remaining
+        self._dispatch()
+    
+    def _discard(self, cls: _PriorityClass, user_id: Optional[Hashable], future: asyncio.Future) -> None:
+        queue = cls.waiting.get(user_id)
+        if queue is not None and future in queue:
+            queue.remove(future)
+            if not queue:
+                del cls.waiting[user_id]
+            cls.depth -= 1
+            SCHEDULER_QUEUE_DEPTH.set(cls.depth, priority=cls.name)
+    
+    def _has_room(self, user_id: Optional[Hashable]) -> bool:
+        return user_id is None or self.user_limit <= 0 or self._user_active.get(user_id, 0) < self.user_limit
+    
+    def _dispatch(self) -> None:
+        while self.limit <= 0 or self.active < self.limit:
+            chosen = None
+            for cls in self.classes.values():
+                if not cls.depth or (chosen is not None and cls.pass_value >= chosen[0].pass_value):
+                    continue
+                for user_id in cls.waiting:
+                    if self._has_room(user_id):
+                        chosen = (cls, user_id)
+                        break
+            if chosen is None:
+                return
+            
+            cls, user_id = chosen
+            queue = cls.waiting[user_id]
+            future = queue.popleft()
+            if queue:
+                cls.waiting.move_to_end(user_id)
+            else:
+                del cls.waiting[user_id]
+            cls.depth -= 1
+            self._virtual_time = cls.pass_value
+            cls.pass_value += 1 / cls.weight
+            
+            self.active += 1
+            cls.active += 1
+            if user_id is not None:
+                self._user_active[user_id] = self._user_active.get(user_id, 0) + 1
+            SCHEDULER_QUEUE_DEPTH.set(cls.depth, priority=cls.name)
+            SCHEDULER_ACTIVE.set(cls.active, priority=cls.name)
+            future.set_result(None)
+
+
+class QuotaExceeded(Exception):
+    """Raised when a user has used up a quota for the current window"""
+    
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class UsageQuota:
+    """
+    Per-user token and cost budgets over fixed windows
+    
+    Usage is counted in the state backend, so with a shared backend the
+    budget covers all workers. Calls already running when a budget runs out
+    are not stopped; the next one is refused. If the backend is unavailable
+    usage is not enforced.
+    """
+    
+    def __init__(self, backend: StateBackend, token_quota: int, cost_quota: float, window: int):
+        """
+        Args:
+            backend: Where usage counters are kept
+            token_quota: Tokens per user per window (0 = unlimited)
+            cost_quota: Dollars per user per window (0 = unlimited)
+            window: Window length in seconds
+        """
+        self.backend = backend
+        self.token_quota = token_quota
+        self.cost_quota = cost_quota
+        self.window = window
+    
+    @property
+    def enabled(self) -> bool:
+        return self.token_quota > 0 or self.cost_quota > 0
+    
+    def _keys(self, user_id: Hashable, now: float) -> Tuple[str, str]:
+        window = int(now // self.window)
+        return f"quota:{user_id}:{window}:tokens", f"quota:{user_id}:{window}:cost"
+    
+    async def check(self, user_id: Hashable) -> None:
+        """Raise QuotaExceeded if the user has no budget left in this window"""
+        if not self.enabled:
+            return
+        now = time.time()
+        try:
+            tokens, cost = await self.backend.get_many(self._keys(user_id, now))
+        except StateBackendError as e:
+            print(f"Usage quotas unavailable, not enforcing: {e}")
+            return
+        
+        retry_after = self.window - now % self.window
+        if self.token_quota > 0 and int(tokens or 0) >= self.token_quota:
+            QUOTA_REJECTIONS.inc(kind="tokens")
+            raise QuotaExceeded(f"Token quota of {self.token_quota} per {self.window}s exceeded", retry_after)
+        if self.cost_quota > 0 and int(cost or 0) >= self.cost_quota * MICRODOLLARS:
+            QUOTA_REJECTIONS.inc(kind="cost")
+            raise QuotaExceeded(f"Cost quota of ${self.cost_quota:g} per {self.window}s exceeded", retry_after)
+    
+    async def record(self, user_id: Hashable, tokens: int, cost: float) -> None:
+        """Add one call's usage to the user's counters"""
+        if not self.enabled or (not tokens and not cost):
+            return
+        token_key, cost_key = self._keys(user_id, time.time())
+        try:
+            if tokens:
+                await self.backend.incr(token_key, tokens, ttl=self.window * 2)
+            if cost:
+                await self.backend.incr(cost_key, round(cost * MICRODOLLARS), ttl=self.window * 2)
+        except StateBackendError as e:
+            print(f"Could not record usage of user {user_id}: {e}")
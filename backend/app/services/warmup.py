@@ -0,0 +1,119 @@
+"""
+Startup warmup and readiness tracking
+"""
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional
+from ..core.config import settings
+from ..core.database import ping_db
+from ..core.state import state_backend
+from .openrouter import openrouter_service
+
+
+class WarmupService:
+    """
+    Runs the startup warmup in the background and reports readiness
+    
+    Steps: verify the database and the state backend (required), pre-open
+    upstream connections and preload the model catalog. Upstream steps are
+    best effort unless WARMUP_REQUIRE_UPSTREAM is set, so a provider outage
+    doesn't mark every instance unready. The instance is ready once all
+    steps have finished and the required ones passed.
+    """
+    
+    def __init__(self):
+        self.checks: Dict[str, Dict[str, Any]] = {}
+        self.finished = False
+        self.stopping = False
+        self._task: Optional[asyncio.Task] = None
+    
+    @property
+    def ready(self) -> bool:
+        if not self.finished or self.stopping:
+            return False
+        return all(check["ok"] or not check["required"] for check in self.checks.values())
+    
+    def start(self) -> None:
+        """Start warming up (called on application startup)"""
+        self.checks = {}
+        self.finished = False
+        self.stopping = False
+        if not settings.WARMUP_ENABLED:
+            self.finished = True
+            return
+        self._task = asyncio.create_task(self.run())
+    
+    def stop(self) -> None:
+        """Mark the instance unready and cancel a running warmup (called on shutdown)"""
+        self.stopping = True
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+    
+    async def run(self) -> None:
+        require_upstream = settings.WARMUP_REQUIRE_UPSTREAM
+        await asyncio.gather(
+            self._check("database", self._verify_database, required=True),
+            self._check("state_backend", self._verify_state_backend, required=True),
+            self._check("upstream_connections", self._warm_connections, required=require_upstream),
+            self._check("model_catalog", self._preload_catalog, required=require_upstream)
+        )
+        self.finished = True
+        print(f"🔥 Warmup finished: {'ready' if self.ready else 'not ready'}")
+    
+    async def _check(self, name: str, step: Callable[[], Awaitable[Optional[str]]], required: bool) -> None:
+        start = time.perf_counter()
+        try:
+            detail = await asyncio.wait_for(step(), timeout=settings.WARMUP_TIMEOUT_SECONDS)
+            ok = True
+        except asyncio.TimeoutError:
+            ok, detail = False, f"timed out after {settings.WARMUP_TIMEOUT_SECONDS:g}s"
+        except Exception as e:
+            ok, detail = False, str(e)
+        
+        self.checks[name] = {
+            "ok": ok,
+            "required": required,
+            "detail": detail,
+            "duration": round(time.perf_counter() - start, 3)
+        }
+    
+    @staticmethod
+    async def _verify_database() -> str:
+        await ping_db()
+        return "connected"
+    
+    @staticmethod
+    async def _verify_state_backend() -> str:
+        await state_backend.set("warmup:ping", b"1", ttl=60)
+        await state_backend.get("warmup:ping")
+        return settings.STATE_BACKEND
+    
+    @staticmethod
+    async def _warm_connections() -> str:
+        count = settings.WARMUP_UPSTREAM_CONNECTIONS
+        opened = await openrouter_service.warm_connections(count)
+        if count and not opened:
+            raise RuntimeError("could not reach OpenRouter")
+        return f"{opened}/{count} connections"
+    
+    @staticmethod
+    async def _preload_catalog() -> str:
+        snapshot = await openrouter_service.get_model_catalog()
+        if snapshot is None:
+            raise RuntimeError("model catalog unavailable")
+        return f"{len(snapshot.models)} models"
+    
+    def status(self) -> Dict[str, Any]:
+        if self.ready:
+            state = "ready"
+        elif self.stopping:
+            state = "stopping"
+        elif not self.finished:
+            state = "warming_up"
+        else:
+            state = "not_ready"
+        return {"status": state, "checks": self.checks}
+
+
+# Create service instance
+warmup_service = WarmupService()
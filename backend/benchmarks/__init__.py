@@ -0,0 +1,23 @@
+"""
+Micro-benchmarks and load tests
+
+Run from the backend directory, e.g. `python -m benchmarks.auth_cache`.
+"""
+import os
+import tempfile
+
+
+def configure_environment() -> str:
+    """
+    Point settings at a throwaway database before the app is imported
+    
+    Returns:
+        Path of the temporary directory holding the database
+    """
+    workdir = tempfile.mkdtemp(prefix="prompt_optimizer_bench_")
+    os.environ.setdefault("SECRET_KEY", "benchmark")
+    os.environ.setdefault("JWT_SECRET_KEY", "benchmark")
+    os.environ.setdefault("OPENROUTER_API_KEY", "benchmark")
+    os.environ.setdefault("UPLOAD_DIR", os.path.join(workdir, "uploads"))
+    os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(workdir, 'bench.db')}")
+    return workdir
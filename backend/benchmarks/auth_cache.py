@@ -0,0 +1,59 @@
+"""
+Micro-benchmark: cost of resolving the current user per request
+
+Compares get_current_user_dependency with the auth cache disabled (decode
+JWT + DB lookup on every call) against the cached path.
+
+Usage:
+    python -m benchmarks.auth_cache [iterations]
+"""
+import asyncio
+import sys
+import time
+
+from . import configure_environment
+
+configure_environment()
+
+from fastapi.security import HTTPAuthorizationCredentials  # noqa: E402
+from app.core.database import SessionLocal, init_db  # noqa: E402
+from app.core.security import create_access_token  # noqa: E402
+from app.api.auth import get_current_user_dependency  # noqa: E402
+from app.models.user import User  # noqa: E402
+from app.services.auth import authenticated_user_cache  # noqa: E402
+
+
+async def run(iterations: int, cached: bool) -> float:
+    """Resolve the same token `iterations` times; returns seconds per call"""
+    token = create_access_token({"sub": "bench"})
+    credentials = HTTPAuthorizationCredentials(scheme="Bearer", credentials=token)
+    authenticated_user_cache.clear()
+    
+    start = time.perf_counter()
+    for _ in range(iterations):
+        if not cached:
+            authenticated_user_cache.clear()
+        await get_current_user_dependency(credentials)
+    return (time.perf_counter() - start) / iterations
+
+
+def main() -> None:
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    
+    init_db()
+    db = SessionLocal()
+    db.add(User(username="bench", email="bench@example.com", hashed_password="x"))
+    db.commit()
+    db.close()
+    
+    uncached = asyncio.run(run(iterations, cached=False))
+    cached = asyncio.run(run(iterations, cached=True))
+    
+    print(f"iterations:       {iterations}")
+    print(f"uncached per call: {uncached * 1e6:9.1f} us")
+    print(f"cached per call:   {cached * 1e6:9.1f} us")
+    print(f"speedup:           {uncached / cached:9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+"""
+End-to-end load benchmark
+
+Simulates N concurrent users, each logging in once and then repeatedly
+uploading a question file, running POST /api/prompt/test and downloading
+the result. Reports throughput and p50/p95/p99 latency per endpoint.
+
+By default the app and the mock OpenRouter run in-process, so no server or
+API key is needed. With --target, an already running deployment is driven
+instead (point its OPENROUTER_BASE_URL at benchmarks.mock_openrouter).
+
+Usage:
+    python -m benchmarks.load_test --users 20 --iterations 10 --latency 0.3
+    python -m benchmarks.load_test --target http://localhost:8000 --users 50
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+import uuid
+from collections import defaultdict
+from typing import Dict, List, Optional
+
+from . import configure_environment
+from . import mock_openrouter
+
+import httpx
+
+MOCK_BASE_URL = "http://mock-openrouter/api/v1"
+
+
+def percentile(values: List[float], pct: float) -> float:
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+class LoadTest:
+    """Runs the user scenario and collects per-endpoint latencies"""
+    
+    def __init__(self, client: httpx.AsyncClient, args: argparse.Namespace):
+        self.client = client
+        self.args = args
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, int] = defaultdict(int)
+    
+    async def timed(self, name: str, method: str, url: str, **kwargs) -> Optional[httpx.Response]:
+        start = time.perf_counter()
+        try:
+            response = await self.client.request(method, url, **kwargs)
+        except httpx.HTTPError:
+            self.errors[name] += 1
+            return None
+        self.latencies[name].append(time.perf_counter() - start)
+        if response.status_code >= 400:
+            self.errors[name] += 1
+            return None
+        return response
+    
+    async def user(self, index: int) -> None:
+        name = f"load_{uuid.uuid4().hex[:8]}_{index}"
+        password = "load-test-password"
+        await self.client.post("/api/auth/register", json={
+            "username": name, "email": f"{name}@example.com", "password": password
+        })
+        response = await self.timed("login", "POST", "/api/auth/login", json={"username": name, "password": password})
+        if response is None:
+            return
+        headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+        
+        questions = [f"Question {i} from {name}?" for i in range(self.args.questions)]
+        upload_body = json.dumps(questions).encode("utf-8")
+        models = [f"mock-{i}/model-{i}" for i in range(self.args.models)]
+        
+        for iteration in range(self.args.iterations):
+            await self.timed(
+                "upload", "POST", "/api/prompt/upload",
+                headers=headers, files={"file": ("questions.json", upload_body, "application/json")}
+            )
+            response = await self.timed(
+                "test", "POST", "/api/prompt/test",
+                headers=headers,
+                json={
+                    "system_prompt": "You are a helpful assistant.",
+                    "question": questions[iteration % len(questions)],
+                    "models": models,
+                    "cache_mode": "bypass"
+                }
+            )
+            if response is None:
+                continue
+            request_id = response.json()["request_id"]
+            await self.timed("download", "GET", f"/api/prompt/download/{request_id}?format=json", headers=headers)
+    
+    async def run(self) -> float:
+        start = time.perf_counter()
+        await asyncio.gather(*(self.user(i) for i in range(self.args.users)))
+        return time.perf_counter() - start
+    
+    def report(self, elapsed: float) -> None:
+        print(f"users={self.args.users} iterations={self.args.iterations} models={self.args.models} elapsed={elapsed:.2f}s")
+        print(f"{'endpoint':>10} {'count':>7} {'errors':>7} {'req/s':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+        for name in ("login", "upload", "test", "download"):
+            values = self.latencies.get(name, [])
+            print(
+                f"{name:>10} {len(values):>7} {self.errors.get(name, 0):>7} {len(values) / elapsed:>8.1f} "
+                f"{statistics.median(values) * 1000 if values else 0:>9.1f} "
+                f"{percentile(values, 95) * 1000:>9.1f} {percentile(values, 99) * 1000:>9.1f}"
+            )
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--target", help="base URL of a running app (default: run in-process)")
+    parser.add_argument("--users", type=int, default=10)
+    parser.add_argument("--iterations", type=int, default=5)
+    parser.add_argument("--models", type=int, default=3)
+    parser.add_argument("--questions", type=int, default=20, help="questions per uploaded file")
+    mock_openrouter.add_arguments(parser)
+    args = parser.parse_args()
+    
+    timeout = httpx.Timeout(300.0)
+    if args.target:
+        async with httpx.AsyncClient(base_url=args.target, timeout=timeout) as client:
+            test = LoadTest(client, args)
+            test.report(await test.run())
+        return
+    
+    # In-process: the app talks to the mock through an ASGI transport
+    configure_environment()
+    import os
+    os.environ["OPENROUTER_BASE_URL"] = MOCK_BASE_URL
+    mock_openrouter.apply_arguments(args)
+    
+    from app.main import app
+    from app.services.openrouter import openrouter_service
+    
+    async with app.router.lifespan_context(app):
+        upstream = openrouter_service.client
+        openrouter_service._client = httpx.AsyncClient(
+            base_url=MOCK_BASE_URL,
+            headers=upstream.headers,
+            timeout=upstream.timeout,
+            transport=httpx.ASGITransport(app=mock_openrouter.app)
+        )
+        await upstream.aclose()
+        
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://app", timeout=timeout) as client:
+            test = LoadTest(client, args)
+            test.report(await test.run())
+        print(f"mock upstream: {mock_openrouter.config.stats}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
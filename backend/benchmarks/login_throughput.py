@@ -0,0 +1,110 @@
+"""
+Login throughput benchmark under concurrent load
+
+Fires concurrent POST /api/auth/login requests at the app in-process while a
+probe measures event-loop lag (how late a short sleep wakes up) and /health
+latency, once with bcrypt inline on the event loop and once with the password
+hashing pool. The lag shows how much logins stall everything else running in
+the worker.
+
+Usage:
+    python -m benchmarks.login_throughput [logins] [concurrency]
+"""
+import asyncio
+import statistics
+import sys
+import time
+
+from . import configure_environment
+
+configure_environment()
+
+import httpx  # noqa: E402
+from app.main import app  # noqa: E402
+from app.core.config import settings  # noqa: E402
+from app.core.database import init_db  # noqa: E402
+from app.core.security import password_hasher  # noqa: E402
+
+
+# How often the probe wakes up to measure the event loop
+PROBE_INTERVAL = 0.01
+
+
+def percentile(values, pct: float) -> float:
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+async def run(client: httpx.AsyncClient, logins: int, concurrency: int) -> dict:
+    semaphore = asyncio.Semaphore(concurrency)
+    loop_lags = []
+    health_latencies = []
+    done = asyncio.Event()
+    
+    async def login():
+        async with semaphore:
+            response = await client.post(
+                "/api/auth/login",
+                json={"username": "bench", "password": "benchmark-password"}
+            )
+            response.raise_for_status()
+    
+    async def probe():
+        # Any time past the expected wake-up was spent blocked behind other
+        # work on the loop (inline bcrypt)
+        while not done.is_set():
+            expected_wake = time.perf_counter() + PROBE_INTERVAL
+            await asyncio.sleep(PROBE_INTERVAL)
+            start = time.perf_counter()
+            loop_lags.append(start - expected_wake)
+            await client.get("/health")
+            health_latencies.append(time.perf_counter() - start)
+    
+    probe_task = asyncio.create_task(probe())
+    start = time.perf_counter()
+    await asyncio.gather(*(login() for _ in range(logins)))
+    elapsed = time.perf_counter() - start
+    done.set()
+    await probe_task
+    
+    return {
+        "logins_per_sec": logins / elapsed,
+        "lag_p50_ms": statistics.median(loop_lags) * 1000 if loop_lags else 0.0,
+        "lag_p99_ms": percentile(loop_lags, 99) * 1000,
+        "lag_max_ms": max(loop_lags, default=0.0) * 1000,
+        "health_p99_ms": percentile(health_latencies, 99) * 1000
+    }
+
+
+async def main() -> None:
+    logins = int(sys.argv[1]) if len(sys.argv) > 1 else 40
+    concurrency = int(sys.argv[2]) if len(sys.argv) > 2 else 8
+    
+    init_db()
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        await client.post("/api/auth/register", json={
+            "username": "bench",
+            "email": "bench@example.com",
+            "password": "benchmark-password"
+        })
+        
+        print(f"bcrypt rounds: {settings.BCRYPT_ROUNDS}, logins: {logins}, concurrency: {concurrency}")
+        pool_workers = password_hasher.workers or 4
+        for label, workers in (("inline", 0), (f"pool({pool_workers})", pool_workers)):
+            password_hasher.workers = workers
+            result = await run(client, logins, concurrency)
+            print(
+                f"{label:>10}: {result['logins_per_sec']:7.1f} logins/s | "
+                f"loop lag p50 {result['lag_p50_ms']:7.1f} ms, "
+                f"p99 {result['lag_p99_ms']:7.1f} ms, max {result['lag_max_ms']:7.1f} ms | "
+                f"/health p99 {result['health_p99_ms']:7.1f} ms"
+            )
+    
+    password_hasher.shutdown()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,224 @@
+"""
+Local stand-in for the OpenRouter API
+
+Implements GET /models and POST /chat/completions (streaming and
+non-streaming) with configurable latency, error and rate-limit behaviour, so
+the app can be load-tested without spending API credits. Message parts with a
+cache_control breakpoint emulate provider prompt caching: a prefix seen within
+the cache TTL is reported in usage.prompt_tokens_details.cached_tokens and
+shortens the time to first token.
+
+Run it and point the app at it:
+    python -m benchmarks.mock_openrouter --port 9000 --latency 0.8 --error-rate 0.02
+    OPENROUTER_BASE_URL=http://localhost:9000/api/v1 python -m app.main
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import math
+import random
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Tuple
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+
+@dataclass
+class MockConfig:
+    """Behaviour of the mock upstream"""
+    latency: float = 0.5               # mean time to first token, seconds
+    latency_distribution: str = "lognormal"  # fixed, uniform or lognormal
+    latency_sigma: float = 0.5         # lognormal shape / uniform spread factor
+    token_interval: float = 0.01       # seconds between streamed tokens
+    completion_tokens: int = 50
+    error_rate: float = 0.0            # fraction of calls answered with 500
+    rate_limit_rate: float = 0.0       # fraction of calls answered with 429
+    rate_limit_rps: float = 0.0        # hard requests/second limit (0 = off)
+    retry_after: float = 1.0           # Retry-After sent with 429s
+    prompt_cache_ttl: float = 300.0    # lifetime of a cached prompt prefix, seconds
+    cache_speedup: float = 0.5         # time to first token saved for a fully cached prompt
+    model_count: int = 50
+    stats: Dict[str, int] = field(default_factory=lambda: {
+        "requests": 0, "errors": 0, "rate_limited": 0, "prompt_tokens": 0, "cached_prompt_tokens": 0
+    })
+
+
+config = MockConfig()
+app = FastAPI(title="Mock OpenRouter")
+_window: List[float] = []
+# Prompt cache: (model, prefix digest) -> expiry
+_prompt_cache: Dict[Tuple[str, str], float] = {}
+
+
+def sample_latency() -> float:
+    if config.latency_distribution == "fixed":
+        return config.latency
+    if config.latency_distribution == "uniform":
+        spread = config.latency * config.latency_sigma
+        return max(0.0, random.uniform(config.latency - spread, config.latency + spread))
+    # lognormal with the configured mean
+    mu = math.log(max(config.latency, 1e-6)) - config.latency_sigma ** 2 / 2
+    return random.lognormvariate(mu, config.latency_sigma)
+
+
+def _rate_limited() -> bool:
+    """Sliding one-second window for the hard rate limit"""
+    now = time.monotonic()
+    while _window and _window[0] < now - 1:
+        _window.pop(0)
+    if config.rate_limit_rps > 0 and len(_window) >= config.rate_limit_rps:
+        return True
+    _window.append(now)
+    return random.random() < config.rate_limit_rate
+
+
+def _parts(content: Any) -> List[dict]:
+    """Message content as a list of parts (plain strings are one text part)"""
+    if isinstance(content, list):
+        return [part for part in content if isinstance(part, dict)]
+    return [{"type": "text", "text": content or ""}]
+
+
+def _usage(body: dict) -> dict:
+    """Token usage, with the prefix up to the last cache_control breakpoint served from cache if seen before"""
+    digest = hashlib.sha256()
+    prompt_tokens = 0
+    breakpoint = None
+    for message in body.get("messages", []):
+        for part in _parts(message.get("content")):
+            text = part.get("text", "")
+            digest.update(f"{message.get('role')}\0{text}\0".encode("utf-8"))
+            # Roughly four characters per token
+            prompt_tokens += len(text) // 4 + 1
+            if part.get("cache_control"):
+                breakpoint = (digest.hexdigest(), prompt_tokens)
+    
+    cached_tokens = 0
+    if breakpoint is not None:
+        key = (body.get("model", ""), breakpoint[0])
+        now = time.monotonic()
+        if _prompt_cache.get(key, 0) > now:
+            cached_tokens = breakpoint[1]
+        _prompt_cache[key] = now + config.prompt_cache_ttl
+    
+    config.stats["prompt_tokens"] += prompt_tokens
+    config.stats["cached_prompt_tokens"] += cached_tokens
+    return {
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": config.completion_tokens,
+        "total_tokens": prompt_tokens + config.completion_tokens,
+        "prompt_tokens_details": {"cached_tokens": cached_tokens}
+    }
+
+
+@app.get("/api/v1/models")
+async def models():
+    return {
+        "data": [
+            {
+                "id": f"mock-{i % 5}/model-{i}",
+                "name": f"Mock Model {i}",
+                "description": "Synthetic model served by the local OpenRouter stand-in",
+                "context_length": 4096 * (1 + i % 8),
+                "pricing": {"prompt": "0.000001", "completion": "0.000002"}
+            }
+            for i in range(config.model_count)
+        ]
+    }
+
+
+@app.post("/api/v1/chat/completions")
+async def chat_completions(request: Request):
+    body = await request.json()
+    config.stats["requests"] += 1
+    
+    if _rate_limited():
+        config.stats["rate_limited"] += 1
+        return JSONResponse(
+            {"error": {"code": 429, "message": "Rate limit exceeded"}},
+            status_code=429,
+            headers={"Retry-After": str(config.retry_after)}
+        )
+    
+    usage = _usage(body)
+    cached_fraction = usage["prompt_tokens_details"]["cached_tokens"] / usage["prompt_tokens"]
+    await asyncio.sleep(sample_latency() * (1 - config.cache_speedup * cached_fraction))
+    
+    if random.random() < config.error_rate:
+        config.stats["errors"] += 1
+        return JSONResponse({"error": {"code": 500, "message": "Mock upstream error"}}, status_code=500)
+    
+    model = body.get("model", "mock/model")
+    words = [f"tok{i} " for i in range(config.completion_tokens)]
+    
+    if not body.get("stream"):
+        await asyncio.sleep(config.token_interval * len(words))
+        return {
+            "id": f"mock-{time.time_ns()}",
+            "model": model,
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": "".join(words)},
+                "finish_reason": "stop"
+            }],
+            "usage": usage
+        }
+    
+    async def events():
+        yield ": OPENROUTER PROCESSING\n\n"
+        for word in words:
+            chunk = {"model": model, "choices": [{"index": 0, "delta": {"content": word}}]}
+            yield f"data: {json.dumps(chunk)}\n\n"
+            await asyncio.sleep(config.token_interval)
+        final = {"model": model, "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}], "usage": usage}
+        yield f"data: {json.dumps(final)}\n\n"
+        yield "data: [DONE]\n\n"
+    
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+
+@app.get("/stats")
+async def stats():
+    """Counters of what the mock has served"""
+    return config.stats
+
+
+def add_arguments(parser: argparse.ArgumentParser) -> None:
+    """CLI options mapping onto MockConfig"""
+    parser.add_argument("--latency", type=float, default=config.latency, help="mean time to first token (s)")
+    parser.add_argument("--latency-distribution", choices=["fixed", "uniform", "lognormal"], default=config.latency_distribution)
+    parser.add_argument("--latency-sigma", type=float, default=config.latency_sigma)
+    parser.add_argument("--token-interval", type=float, default=config.token_interval)
+    parser.add_argument("--completion-tokens", type=int, default=config.completion_tokens)
+    parser.add_argument("--error-rate", type=float, default=config.error_rate)
+    parser.add_argument("--rate-limit-rate", type=float, default=config.rate_limit_rate, help="fraction of calls answered with 429")
+    parser.add_argument("--rate-limit-rps", type=float, default=config.rate_limit_rps, help="hard requests/second limit")
+    parser.add_argument("--retry-after", type=float, default=config.retry_after)
+    parser.add_argument("--prompt-cache-ttl", type=float, default=config.prompt_cache_ttl, help="lifetime of cached prompt prefixes (s)")
+    parser.add_argument("--cache-speedup", type=float, default=config.cache_speedup, help="fraction of time to first token saved by a fully cached prompt")
+
+
+def apply_arguments(args: argparse.Namespace) -> None:
+    for name in ("latency", "latency_distribution", "latency_sigma", "token_interval",
+                 "completion_tokens", "error_rate", "rate_limit_rate", "rate_limit_rps", "retry_after",
+                 "prompt_cache_ttl", "cache_speedup"):
+        setattr(config, name, getattr(args, name))
+
+
+def main() -> None:
+    import uvicorn
+    
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9000)
+    add_arguments(parser)
+    args = parser.parse_args()
+    apply_arguments(args)
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,174 @@
+"""
+Local stand-in for a Redis-protocol server
+
+Implements the subset of RESP commands the redis state backend uses (PING,
+AUTH, SELECT, GET, MGET, SET with EX/PX/NX/XX, DEL, INCR, INCRBY, EXPIRE,
+PEXPIRE, FLUSHDB) in a single asyncio process, so STATE_BACKEND=redis can be
+tried without installing Redis. Not for production use.
+
+Usage:
+    python -m benchmarks.redis_stand_in --port 6390
+    STATE_BACKEND=redis STATE_REDIS_URL=redis://localhost:6390/0 ...
+"""
+import argparse
+import asyncio
+import time
+from typing import Dict, List, Optional, Tuple
+
+
+class StandInStore:
+    """Keyspace with millisecond expiries"""
+    
+    def __init__(self):
+        self.data: Dict[bytes, Tuple[bytes, Optional[float]]] = {}
+    
+    def get(self, key: bytes) -> Optional[bytes]:
+        item = self.data.get(key)
+        if item is None:
+            return None
+        value, expires_at = item
+        if expires_at is not None and expires_at <= time.monotonic():
+            del self.data[key]
+            return None
+        return value
+    
+    def set(self, key: bytes, value: bytes, ttl: Optional[float] = None) -> None:
+        self.data[key] = (value, time.monotonic() + ttl if ttl else None)
+    
+    def expire(self, key: bytes, ttl: float) -> int:
+        value = self.get(key)
+        if value is None:
+            return 0
+        self.data[key] = (value, time.monotonic() + ttl)
+        return 1
+    
+    def incr(self, key: bytes, amount: int) -> int:
+        value = self.get(key)
+        number = int(value or 0) + amount
+        expires_at = self.data[key][1] if value is not None else None
+        self.data[key] = (str(number).encode(), expires_at)
+        return number
+
+
+class Error(Exception):
+    pass
+
+
+def encode(reply) -> bytes:
+    if reply is None:
+        return b"$-1\r\n"
+    if isinstance(reply, Error):
+        return b"-ERR " + str(reply).encode() + b"\r\n"
+    if isinstance(reply, bool):
+        return b"+OK\r\n"
+    if isinstance(reply, int):
+        return b":%d\r\n" % reply
+    if isinstance(reply, str):
+        return b"+" + reply.encode() + b"\r\n"
+    if isinstance(reply, bytes):
+        return b"$%d\r\n%s\r\n" % (len(reply), reply)
+    return b"*%d\r\n" % len(reply) + b"".join(encode(item) for item in reply)
+
+
+def execute(store: StandInStore, args: List[bytes]):
+    command = args[0].upper()
+    if command == b"PING":
+        return "PONG"
+    if command in (b"AUTH", b"SELECT"):
+        return True
+    if command == b"GET":
+        return store.get(args[1])
+    if command == b"MGET":
+        return [store.get(key) for key in args[1:]]
+    if command == b"SET":
+        key, value, ttl, mode = args[1], args[2], None, None
+        options = [arg.upper() for arg in args[3:]]
+        i = 0
+        while i < len(options):
+            if options[i] == b"EX":
+                ttl = float(args[3 + i + 1])
+                i += 2
+            elif options[i] == b"PX":
+                ttl = float(args[3 + i + 1]) / 1000
+                i += 2
+            elif options[i] in (b"NX", b"XX"):
+                mode = options[i]
+                i += 1
+            else:
+                return Error("syntax error")
+        exists = store.get(key) is not None
+        if (mode == b"NX" and exists) or (mode == b"XX" and not exists):
+            return None
+        store.set(key, value, ttl)
+        return True
+    if command == b"DEL":
+        return sum(1 for key in args[1:] if store.data.pop(key, None) is not None)
+    if command in (b"INCR", b"INCRBY"):
+        try:
+            return store.incr(args[1], int(args[2]) if command == b"INCRBY" else 1)
+        except ValueError:
+            return Error("value is not an integer or out of range")
+    if command == b"EXPIRE":
+        return store.expire(args[1], float(args[2]))
+    if command == b"PEXPIRE":
+        return store.expire(args[1], float(args[2]) / 1000)
+    if command == b"FLUSHDB":
+        store.data.clear()
+        return True
+    return Error(f"unknown command '{command.decode()}'")
+
+
+async def read_command(reader: asyncio.StreamReader) -> Optional[List[bytes]]:
+    line = await reader.readline()
+    if not line:
+        return None
+    if not line.startswith(b"*"):
+        # Inline command (e.g. typed into telnet)
+        return line.strip().split()
+    args = []
+    for _ in range(int(line[1:-2])):
+        header = await reader.readline()
+        length = int(header[1:-2])
+        args.append((await reader.readexactly(length + 2))[:-2])
+    return args
+
+
+def make_handler(store: StandInStore):
+    async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                args = await read_command(reader)
+                if args is None:
+                    break
+                if not args:
+                    continue
+                try:
+                    reply = execute(store, args)
+                except (IndexError, ValueError):
+                    reply = Error("wrong number of arguments")
+                writer.write(encode(reply))
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.CancelledError):
+            pass
+        finally:
+            writer.close()
+    return handle
+
+
+async def serve(host: str, port: int) -> None:
+    server = await asyncio.start_server(make_handler(StandInStore()), host, port)
+    print(f"Redis stand-in listening on {host}:{port}")
+    async with server:
+        await server.serve_forever()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=6390)
+    args = parser.parse_args()
+    asyncio.run(serve(args.host, args.port))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""
+Micro-benchmark: response serialization time and bytes on the wire
+
+Renders a large PromptTestResponse and a model catalog page with the stock
+JSONResponse and with the app's orjson-based FastJSONResponse, then
+compresses the body with each coding the compression middleware supports.
+
+Usage:
+    python -m benchmarks.serialization [iterations]
+"""
+import random
+import sys
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, List
+
+from . import configure_environment
+
+configure_environment()
+
+from fastapi.responses import JSONResponse  # noqa: E402
+from pydantic import BaseModel  # noqa: E402
+from app.core.middleware import CompressionMiddleware  # noqa: E402
+from app.core.responses import FastJSONResponse  # noqa: E402
+from app.schemas.prompt import ModelResponse, PromptTestResponse  # noqa: E402
+
+WORDS = (
+    "the model answer context token prompt system user reasoning step result value "
+    "because therefore however example data function cache latency request response "
+    "provider stream output input question explain detail history compute memory"
+).split()
+
+
+def prose(words: int, seed: int) -> str:
+    """Deterministic word salad, less compressible than a repeated sentence"""
+    rng = random.Random(seed)
+    return " ".join(rng.choice(WORDS) for _ in range(words))
+
+
+def sample_result() -> PromptTestResponse:
+    """Three long model answers, like a typical /prompt/test response"""
+    return PromptTestResponse(
+        request_id="550e8400-e29b-41d4-a716-446655440000",
+        system_prompt="You are a helpful assistant. " * 20,
+        question="Explain the history of computing in detail.",
+        responses=[
+            ModelResponse(
+                model=f"provider/model-{i}",
+                response=prose(1500, seed=i),
+                tokens_used=4000,
+                prompt_tokens=300,
+                completion_tokens=3700,
+                time_taken=12.5,
+                finish_reason="stop"
+            )
+            for i in range(3)
+        ],
+        total_time=12.6,
+        timestamp=datetime.utcnow()
+    )
+
+
+def sample_catalog(count: int = 300) -> Dict[str, Any]:
+    """A /prompt/models payload with `count` models"""
+    models: List[Dict[str, Any]] = [
+        {
+            "id": f"provider-{i % 40}/model-{i}",
+            "name": f"Model {i}",
+            "description": prose(40, seed=1000 + i),
+            "context_length": 8192 * (1 + i % 16),
+            "pricing": {"prompt": "0.0000015", "completion": "0.000002"},
+            "circuit_state": "closed"
+        }
+        for i in range(count)
+    ]
+    return {"models": models, "total": count, "offset": 0, "providers": sorted({m["id"].split("/")[0] for m in models})}
+
+
+def time_render(render: Callable[[], bytes], iterations: int) -> float:
+    """Seconds per render"""
+    start = time.perf_counter()
+    for _ in range(iterations):
+        render()
+    return (time.perf_counter() - start) / iterations
+
+
+def compressed_sizes(body: bytes) -> Dict[str, int]:
+    sizes = {"identity": len(body)}
+    for coding, factory in CompressionMiddleware(app=None).encoders:
+        encoder = factory()
+        sizes[coding] = len(encoder.compress(body) + encoder.finish())
+    return sizes
+
+
+def report(name: str, content: Any, iterations: int) -> None:
+    # Same path FastAPI takes for a response_model: dump to JSON-safe data, then render
+    def data():
+        return content.model_dump(mode="json") if isinstance(content, BaseModel) else content
+    
+    stock = time_render(lambda: JSONResponse(data()).body, iterations)
+    fast = time_render(lambda: FastJSONResponse(data()).body, iterations)
+    body = FastJSONResponse(data()).body
+    
+    print(f"{name}")
+    print(f"  JSONResponse:     {stock * 1e6:10.1f} us")
+    print(f"  FastJSONResponse: {fast * 1e6:10.1f} us  ({stock / fast:.1f}x)")
+    for coding, size in compressed_sizes(body).items():
+        print(f"  {coding:<17} {size:10d} bytes  ({size / len(body):6.1%})")
+
+
+def main() -> None:
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    print(f"iterations: {iterations}")
+    report("PromptTestResponse", sample_result(), iterations)
+    report("Model catalog (300 models)", sample_catalog(), iterations)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""
+Tests for the upload body size limit
+"""
+import asyncio
+import httpx
+from fastapi import FastAPI, File, UploadFile
+from backend.app.core.middleware import BodySizeLimitMiddleware
+
+MAX_BYTES = 1024
+
+
+def _make_app() -> FastAPI:
+    app = FastAPI()
+    
+    @app.post("/upload")
+    async def upload(file: UploadFile = File(...)):
+        return {"size": len(await file.read())}
+    
+    app.add_middleware(BodySizeLimitMiddleware, max_bytes=MAX_BYTES, paths=["/upload"])
+    return app
+
+
+def _multipart(size: int) -> bytes:
+    return (
+        b"--boundary\r\n"
+        b'Content-Disposition: form-data; name="file"; filename="q.txt"\r\n'
+        b"Content-Type: text/plain\r\n\r\n"
+        + b"x" * size
+        + b"\r\n--boundary--\r\n"
+    )
+
+
+def _post(body: bytes, chunked: bool) -> httpx.Response:
+    async def chunks():
+        for i in range(0, len(body), 256):
+            yield body[i:i + 256]
+    
+    async def run():
+        transport = httpx.ASGITransport(app=_make_app())
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await client.post(
+                "/upload",
+                content=chunks() if chunked else body,
+                headers={"Content-Type": "multipart/form-data; boundary=boundary"}
+            )
+    
+    return asyncio.run(run())
+
+
+def test_small_upload_passes():
+    response = _post(_multipart(100), chunked=True)
+    assert response.status_code == 200
+    assert response.json() == {"size": 100}
+
+
+def test_oversized_upload_with_content_length():
+    response = _post(_multipart(MAX_BYTES * 4), chunked=False)
+    assert response.status_code == 413
+
+
+def test_oversized_chunked_upload():
+    # No Content-Length: the limit is only hit while the body streams in
+    response = _post(_multipart(MAX_BYTES * 4), chunked=True)
+    assert response.status_code == 413
+    assert response.json()["detail"].startswith("File too large")
@@ -344,7 +344,8 @@ async function retryModel(modelId) {
             body: JSON.stringify({
                 system_prompt: systemPrompt,
                 question: question,
-                models: [modelId]
+                models: [modelId],
+                cache_mode: 'refresh'
             })
         });
         
@@ -394,7 +395,7 @@ function showDetailedInfo(modelName, responseData) {
                 <strong>Total Tokens:</strong> ${responseData.tokens_used}
             </div>
             <div>
-                <strong>Prompt Tokens:</strong> ${responseData.prompt_tokens}
+                <strong>Prompt Tokens:</strong> ${responseData.prompt_tokens}${responseData.cached_prompt_tokens ? ` (${responseData.cached_prompt_tokens} cached)` : ''}
             </div>
             <div>
                 <strong>Completion Tokens:</strong> ${responseData.completion_tokens}
@@ -504,7 +505,7 @@ function createModelCard(response) {
                 </div>
                 <div class="metric">
                     <div class="metric-label">Prompt</div>
-                    <div class="metric-value">${response.prompt_tokens}</div>
+                    <div class="metric-value">${response.prompt_tokens}${response.cached_prompt_tokens ? ` (${response.cached_prompt_tokens} cached)` : ''}</div>
                 </div>
                 <div class="metric">
                     <div class="metric-label">Completion</div>
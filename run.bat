@@ -40,6 +40,18 @@ if not exist ".env" (
     pause
 )
 
+REM Worker processes: run.bat 4 (or WORKERS=4 in .env)
+if not "%~1"=="" (
+    set WORKERS=%~1
+    if %~1 GTR 1 if "%STATE_BACKEND%"=="" (
+        findstr /r /b "STATE_BACKEND=sqlite STATE_BACKEND=redis" .env >nul
+        if errorlevel 1 (
+            echo %~1 workers need shared state, using STATE_BACKEND=sqlite
+            set STATE_BACKEND=sqlite
+        )
+    )
+)
+
 REM Start the application
 echo Starting server...
 echo Application will be available at: http://localhost:8000
@@ -37,6 +37,16 @@ if [ ! -f ".env" ]; then
     read -p "Press Enter after you've configured .env..."
 fi
 
+# Worker processes: ./run.sh 4 (or WORKERS=4 in .env)
+WORKERS="${1:-${WORKERS:-}}"
+if [ -n "$WORKERS" ]; then
+    export WORKERS
+    if [ "$WORKERS" -gt 1 ] && [ -z "$STATE_BACKEND" ] && ! grep -qE "^STATE_BACKEND=(sqlite|redis)" .env; then
+        echo "ℹ️  $WORKERS workers need shared state, using STATE_BACKEND=sqlite"
+        export STATE_BACKEND=sqlite
+    fi
+fi
+
 # Start the application
 echo "🌐 Starting server..."
 echo "Application will be available at: http://localhost:8000"